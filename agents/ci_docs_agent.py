@@ -1,15 +1,16 @@
 import os
 
+from agents.project_assembler_agent import get_output_dir
+from core.output_writer import get_output_writer
+
 def generate_ci_and_docs(state):
-    output_dir = os.getenv("PROJECT_GENERATED_PATH", "./output/generated-project")
+    output_dir = get_output_dir(state)
     os.makedirs(output_dir, exist_ok=True)
+    writer = get_output_writer(output_dir)
 
-    with open(os.path.join(output_dir, "README.md"), "w") as f:
-        f.write("# Auto-Generated iOS App\n\nThis project was initialized via AI.\n")
+    writer.write("README.md", "# Auto-Generated iOS App\n\nThis project was initialized via AI.\n")
 
-    os.makedirs(os.path.join(output_dir, ".github", "workflows"), exist_ok=True)
-    with open(os.path.join(output_dir, ".github", "workflows", "ci.yml"), "w") as f:
-        f.write("""name: CI
+    writer.write(os.path.join(".github", "workflows", "ci.yml"), """name: CI
 on: [push]
 jobs:
   build:
@@ -19,4 +20,5 @@ jobs:
     - name: Build
       run: echo 'Xcode build step here'
 """)
-    return {"status": "docs_and_ci_ready"}
\ No newline at end of file
+    print("📚 [CI_DOCS] README and CI workflow ready.")
+    return {"docs_status": "docs_and_ci_ready"}
@@ -1,80 +1,417 @@
-from openai import OpenAI
 import os
 
 from dotenv import load_dotenv
 
+from agents.project_assembler_agent import FileBlockParser, extract_file_blocks, get_output_dir, write_generated_file
+from core.frame_manifest import load_manifest, match_screen_hashes
+from core.clients import get_openai_client
+from core.llm_cache import cached_completion
+from core.output_writer import open_output_writer
+from core.project_templates import SCAFFOLD_OWNER, screen_files, swift_property_name, swift_type_name
+from core.rate_limiter import get_rate_limiter, estimate_tokens
+from core.retry import call_with_retry
+from core.run_journal import RunJournal
+from core.telemetry import get_tracer
+
 load_dotenv()
 
-client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+CODEGEN_MODEL = "gpt-4o"
+CODEGEN_MAX_CONCURRENCY = int(os.getenv("CODEGEN_MAX_CONCURRENCY", "4"))
+# Stream completions and write each Swift file as soon as its block is complete
+CODEGEN_STREAM = os.getenv("CODEGEN_STREAM", "1") != "0"
+# Expected completion size, used to reserve tokens-per-minute budget up front; boilerplate
+# comes from core.project_templates, so the model only writes screen bodies
+CODEGEN_EXPECTED_COMPLETION_TOKENS = 1200
+# Small screens are packed into one request up to this many expected completion tokens (0 disables packing)
+CODEGEN_PACK_TOKEN_BUDGET = int(os.getenv("CODEGEN_PACK_TOKEN_BUDGET", "3000"))
+CODEGEN_PACK_MAX_SCREENS = int(os.getenv("CODEGEN_PACK_MAX_SCREENS", "6"))
+# Expected completion tokens of a screen: a fixed part plus a share per Figma node
+SCREEN_BASE_COMPLETION_TOKENS = 300
+SCREEN_COMPLETION_TOKENS_PER_NODE = 8
 
-def generate_code(state):
-    print("🧠 [GENERATE_CODE] Generating Swift UIKit + MVVM Clean Architecture files with AI...")
-    structure = state["structure_plan"]
-    screens = structure["screens"]
+def screen_name_of(screen):
+    return screen["name"] if isinstance(screen, dict) and "name" in screen else str(screen)
 
-    swift_files = {}
+def estimate_screen_tokens(node_count=None):
+    if not node_count:
+        return CODEGEN_EXPECTED_COMPLETION_TOKENS
+    return SCREEN_BASE_COMPLETION_TOKENS + SCREEN_COMPLETION_TOKENS_PER_NODE * node_count
 
-    for screen in screens:
-        screen_name = screen["name"] if isinstance(screen, dict) and "name" in screen else str(screen)
-        print(f"🖼️  Generating files for screen: {screen_name}")
-        prompt = f"""
+def pack_screens(screen_names, screen_sizes=None, budget=CODEGEN_PACK_TOKEN_BUDGET, max_screens=CODEGEN_PACK_MAX_SCREENS):
+    """
+    Groups screens, in order, into packs whose expected completion tokens stay within budget.
+    Screens that fill the budget on their own get a pack of one.
+    """
+    screen_sizes = screen_sizes or {}
+    packs, current, current_tokens = [], [], 0
+    for name in screen_names:
+        tokens = estimate_screen_tokens(screen_sizes.get(name))
+        if current and (budget <= 0 or current_tokens + tokens > budget or len(current) >= max_screens):
+            packs.append(current)
+            current, current_tokens = [], 0
+        current.append(name)
+        current_tokens += tokens
+    if current:
+        packs.append(current)
+    return packs
+
+def build_components_section(components):
+    if not components:
+        return ""
+    lines = "\n".join(f'- `{c["name"]}` (`Views/Components/{c["name"]}.swift`, Figma layer "{c.get("layer") or c["name"]}")' for c in components)
+    return f"""
+**Shared components (already generated, do not redefine them):**
+{lines}
+- Use these `UIView` subclasses wherever the screen shows them; configure their texts through their `configure(...)` methods.
+"""
+
+def build_screen_section(screen_name, components=None):
+    screen = swift_type_name(screen_name)
+    file_list = "\n".join(f"- `{path}`: {description}" for path, description in screen_files(screen_name).items())
+    return f"""
+### Screen named "{screen_name}"
+
+**Already generated (do not regenerate or redefine):**
+- `{screen}ViewController: UIViewController` with `let viewModel: {screen}ViewModel` and `var cancellables: Set<AnyCancellable>`; `viewDidLoad()` calls `setupUI()` and `bindViewModel()`.
+- `{screen}ViewModel: ObservableObject` with `@Published var state: {screen}State` and `let container: AppContainer`.
+{build_components_section(components)}
+**Files to write:**
+{file_list}
+"""
+
+def build_prompt(screens, services=None):
+    """
+    Prompt for one or more screens, given as {"screen_name", "components"} dicts. The instructions
+    are shared, so packing small screens into one request pays for them once.
+    """
+    service_list = ", ".join(f"`container.{swift_property_name(service)}`" for service in dict.fromkeys(services or [])) or "none"
+    names = [screen["screen_name"] for screen in screens]
+    task = f'the iOS app screen named "{names[0]}"' if len(names) == 1 else f"{len(names)} iOS app screens"
+    sections = "".join(build_screen_section(screen["screen_name"], screen.get("components")) for screen in screens)
+    file_list = "\n\n".join(f"--- file: {path}\n<swift code>" for name in names for path in screen_files(name))
+    return f"""
 You are a senior iOS engineer and software architect.
 
-Your task is to generate the Xcode project structure and Swift files for a new iOS app screen named "{screen_name}", following **UIKit** and **MVVM Clean Architecture** best practices.
+Your task is to write the screen-specific Swift code for {task}, following **UIKit** and **MVVM Clean Architecture** best practices.
 
-**Project Structure:**
-- App/
-- Core/
-- Models/
-- Resources/
-- Services/
-- Utils/
-- Views/
-- ViewModels/
+`AppDelegate`, `SceneDelegate` and `AppContainer` already exist. Services available through `container`: {service_list}.
+Their protocols (`<Service>Protocol`) are empty: for each service call a screen makes, add one more file `--- file: Services/<Service>+<Screen>.swift` with an `extension <Service>Protocol` that declares the method and gives it a working default implementation (sample data is fine). Start those method names with the screen's type name (e.g. `func {swift_property_name(swift_type_name(names[0]))}LoadItems()`) so two screens never declare the same method.
 
 **Requirements:**
-- Use UIKit (not SwiftUI).
-- Each screen must have:
-    - A `ViewController` in `Views/` (e.g., `{screen_name}ViewController.swift`) using UIKit, with UI built programmatically (no Storyboard/XIB).
-    - A `ViewModel` in `ViewModels/` (e.g., `{screen_name}ViewModel.swift`) conforming to `ObservableObject` or using Combine for bindings.
-    - A `Model` in `Models/` if needed.
-    - Use dependency injection for services.
-    - Use Swift 5.9 syntax.
-    - Scaffold file headers and class/struct names.
-    - Use best practices for folder and file organization.
-    - Add comments for clarity where appropriate.
-
+- Use UIKit (not SwiftUI), with UI built programmatically using Auto Layout (no Storyboard/XIB).
+- Bind the UI to `viewModel.$state` with Combine and route user actions to the view model.
+- Use Swift 5.9 syntax.
+- Add comments for clarity where appropriate.
+{sections}
 **Respond ONLY in this format:**
 
---- file: App/AppDelegate.swift
-<swift code if needed>
+{file_list}
 
---- file: Views/{screen_name}ViewController.swift
-<swift code>
+(Do not output anything except these code blocks.)
+"""
 
---- file: ViewModels/{screen_name}ViewModel.swift
-<swift code>
+def build_component_prompt(component):
+    screens = ", ".join(component.get("screens", [])) or "several screens"
+    definition = component.get("definition") or "Not specified"
+    return f"""
+You are a senior iOS engineer.
 
---- file: Models/{screen_name}Model.swift
-<swift code if needed>
+Generate a reusable UIKit view named "{component["name"]}" for the shared design component "{component.get("layer") or component["name"]}". It appears on: {screens}.
 
---- file: Services/...
-<swift code if needed>
+**Requirements:**
+- A `UIView` subclass built programmatically with Auto Layout (no Storyboard/XIB).
+- Expose a `configure(...)` method for the texts and states that differ between screens.
+- Use Swift 5.9 syntax and add comments for clarity where appropriate.
 
---- file: Resources/...
-<swift code if needed>
+**Figma JSON (compacted; "$s0" style values refer to the top-level "styles" table, COMPONENT_REF nodes are other shared views):**
+{definition}
 
---- file: Utils/...
-<swift code if needed>
+**Respond ONLY in this format:**
 
-(Include only the files relevant for this screen. Do not include placeholder files. Do not output anything except the code blocks above.)
+--- file: Views/Components/{component["name"]}.swift
+<swift code>
 """
-        result = client.chat.completions.create(
-            model="gpt-4o",
-            messages=[{"role": "user", "content": prompt}],
-            temperature=0.2
-        )
-        swift_files[screen_name] = result.choices[0].message.content
-
-    print("✅ [GENERATE_CODE] Generated Swift files for all screens.")
-    return {"generated_files": swift_files}
\ No newline at end of file
+
+def generate_screen(screen_name, on_file=None, components=None, services=None):
+    """
+    Returns the completion for one screen, whose prompt references the shared components it uses.
+    With on_file, the completion is streamed and on_file(rel_path, code) is called as soon as each
+    "--- file:" block closes.
+    """
+    print(f"🖼️  Generating files for screen: {screen_name}")
+    return complete_files(screen_name, build_prompt([{"screen_name": screen_name, "components": components}], services), on_file)
+
+def generate_component(component, on_file=None):
+    """Returns the completion for one shared component view; on_file as in generate_screen."""
+    print(f"🧩 Generating shared component: {component['name']}")
+    return complete_files(component["name"], build_component_prompt(component), on_file)
+
+def complete_files(label, prompt, on_file=None, expected_tokens=CODEGEN_EXPECTED_COMPLETION_TOKENS, validate=None):
+    """
+    Returns the completion for a files prompt; on_file as in generate_screen. Only replies accepted by
+    validate (by default: at least one "--- file:" block) are cached.
+    """
+    messages = [{"role": "user", "content": prompt}]
+    streamed = []
+
+    def request():
+        with get_rate_limiter("openai").request(estimate_tokens(prompt) + expected_tokens):
+            if on_file is None:
+                result = get_openai_client().chat.completions.create(
+                    model=CODEGEN_MODEL,
+                    messages=messages,
+                    temperature=0.2
+                )
+                if result.usage:
+                    get_tracer().record_usage(result.usage.prompt_tokens, result.usage.completion_tokens)
+                return result.choices[0].message.content
+
+            parser = FileBlockParser()
+            parts = []
+            stream = get_openai_client().chat.completions.create(
+                model=CODEGEN_MODEL,
+                messages=messages,
+                temperature=0.2,
+                stream=True,
+                stream_options={"include_usage": True}
+            )
+            for chunk in stream:
+                if chunk.usage:
+                    get_tracer().record_usage(chunk.usage.prompt_tokens, chunk.usage.completion_tokens)
+                delta = chunk.choices[0].delta.content if chunk.choices else None
+                if not delta:
+                    continue
+                parts.append(delta)
+                for rel_path, code in parser.feed(delta):
+                    on_file(rel_path, code)
+            for rel_path, code in parser.close():
+                on_file(rel_path, code)
+            streamed.append(True)
+            return "".join(parts)
+
+    content = cached_completion("openai", CODEGEN_MODEL, 0.2, messages, lambda: call_with_retry(request, f"OpenAI for {label}"),
+                                validate or (lambda reply: bool(extract_file_blocks(reply))))
+    if on_file is not None and not streamed:
+        # Cache hit: replay the stored completion through the same callback
+        for rel_path, code in extract_file_blocks(content):
+            on_file(rel_path, code)
+    return content
+
+def plan_screens(state):
+    """
+    Decides which screens and shared components need generation. Units backed by an unchanged
+    frame or component, or completed by an interrupted run of the same id, are taken as they are;
+    the rest are fanned out as one SCREEN or COMPONENT branch each (see dag_flow.route_screens).
+    """
+    print("🧠 [PLAN_SCREENS] Planning Swift UIKit + MVVM Clean Architecture generation per screen...")
+    structure = state["structure_plan"]
+    screen_names = [screen_name_of(screen) for screen in structure["screens"]]
+    component_names = [component["name"] for component in structure.get("components") or []]
+    unit_names = component_names + screen_names
+    output_dir = get_output_dir(state)
+    # One writer per run so duplicate paths resolve in unit order (templates, shared components, screens)
+    open_output_writer(output_dir, [SCAFFOLD_OWNER] + unit_names)
+
+    swift_files = {}
+    written_files = {}
+
+    # Screens backed by an unchanged frame, and components with an unchanged structure, reuse the previous run's output
+    manifest = load_manifest(state.get("manifest_path"))
+    screen_hashes = match_screen_hashes(screen_names, state.get("frame_hashes") or {})
+    screen_hashes.update({component["name"]: component.get("hash") for component in structure.get("components") or []})
+    reused_screens = []
+    for name in unit_names:
+        previous = manifest["screens"].get(name, {})
+        if not screen_hashes.get(name) or previous.get("hash") != screen_hashes[name]:
+            continue
+        if previous.get("files") and all(os.path.exists(os.path.join(output_dir, p)) for p in previous["files"]):
+            written_files[name] = previous["files"]
+            reused_screens.append(name)
+        elif previous.get("content"):
+            swift_files[name] = previous["content"]
+            reused_screens.append(name)
+    if reused_screens:
+        print(f"♻️  [PLAN_SCREENS] Reusing {len(reused_screens)} unchanged screens and components.")
+
+    # Units completed by an interrupted run of the same id are taken from its journal
+    journal = RunJournal(state["codegen_journal_path"]) if state.get("codegen_journal_path") else None
+    resumed = 0
+    for name in unit_names:
+        record = journal.get(name) if journal is not None and name not in reused_screens else None
+        if not record:
+            continue
+        if record.get("files") and all(os.path.exists(os.path.join(output_dir, p)) for p in record["files"]):
+            written_files[name] = record["files"]
+        elif record.get("content"):
+            swift_files[name] = record["content"]
+        else:
+            continue
+        reused_screens.append(name)
+        resumed += 1
+    if resumed:
+        print(f"⏯️  [PLAN_SCREENS] Resuming: {resumed} screens and components already completed in this run.")
+
+    pending = [name for name in screen_names if name not in reused_screens]
+    pending_components = [name for name in component_names if name not in reused_screens]
+    packs = pack_screens(pending, structure.get("screen_sizes"))
+    packed = f" in {len(packs)} requests" if len(packs) < len(pending) else ""
+    print(f"🔀 [PLAN_SCREENS] Fanning out {len(pending)} screens{packed} and {len(pending_components)} shared components ({len(reused_screens)} reused).")
+    return {
+        "generated_files": swift_files,
+        "written_files": written_files,
+        "reused_screens": reused_screens,
+        "pending_screens": pending,
+        "pending_packs": packs,
+        "pending_components": pending_components,
+        "screen_hashes": screen_hashes,
+    }
+
+def build_screen(state):
+    """
+    One SCREEN branch: generates a pack of screens ({"screen_name", "components"} dicts) and writes
+    their files right away, independently of the other branches. Returns a partial update merged
+    into ProjectState by its reducers.
+    """
+    screens = state["screens"]
+    if len(screens) == 1:
+        return build_single_screen(state, screens[0])
+    return build_pack(state, screens)
+
+def build_single_screen(state, screen):
+    screen_name = screen["screen_name"]
+    return build_unit(state, screen_name, "screen",
+                      lambda on_file=None: generate_screen(screen_name, on_file, screen.get("components"), state.get("services")))
+
+def build_pack(state, screens):
+    """
+    Generates several small screens with one request. The reply is split back per screen by file
+    path; screens whose files are missing or malformed are retried on their own.
+    """
+    output_dir = get_output_dir(state)
+    journal = RunJournal(state["codegen_journal_path"]) if state.get("codegen_journal_path") else None
+    update = {"written_files": {}, "generated_files": {}, "failed_screens": []}
+    pending = []
+    for screen in screens:
+        # A resumed run replays the fan-out; screens that completed before the interruption are journaled
+        record = journal.get(screen["screen_name"]) if journal is not None else None
+        if record and record.get("files") and all(os.path.exists(os.path.join(output_dir, p)) for p in record["files"]):
+            update["written_files"][screen["screen_name"]] = record["files"]
+        else:
+            pending.append(screen)
+
+    retry = pending
+    if len(pending) > 1:
+        names = [screen["screen_name"] for screen in pending]
+        tracer = get_tracer()
+        try:
+            with tracer.context(screen=", ".join(names)), tracer.span(f"codegen: {len(names)} screens", category="pack"):
+                blocks = generate_pack(pending, state.get("services"))
+        except Exception as e:
+            print(f"❌ [SCREEN] Packed request for {', '.join(names)} failed: {type(e).__name__} - {e}")
+            blocks = {}
+        retry = []
+        for screen in pending:
+            name = screen["screen_name"]
+            if not pack_output_complete(name, blocks.get(name)):
+                retry.append(screen)
+                continue
+            paths = [rel_path for rel_path, _ in blocks[name]]
+            for rel_path, code in blocks[name]:
+                write_generated_file(output_dir, rel_path, code, name)
+            content = "\n\n".join(f"--- file: {rel_path}\n{code}" for rel_path, code in blocks[name])
+            if journal is not None:
+                journal.append(name, content=content, files=paths)
+            update["written_files"][name] = paths
+            update["generated_files"][name] = content
+        print(f"✅ [SCREEN] Packed request wrote {len(pending) - len(retry)}/{len(pending)} screens: {', '.join(names)}")
+        if retry:
+            print(f"🔁 [SCREEN] Retrying on their own: {', '.join(screen['screen_name'] for screen in retry)}")
+
+    for screen in retry:
+        result = build_single_screen(state, screen)
+        update["written_files"].update(result.get("written_files", {}))
+        update["generated_files"].update(result.get("generated_files", {}))
+        update["failed_screens"] += result.get("failed_screens", [])
+    return {key: value for key, value in update.items() if value}
+
+def generate_pack(screens, services=None):
+    """Returns {screen name: [(rel_path, code)]} from one completion covering every screen of the pack."""
+    names = [screen["screen_name"] for screen in screens]
+    print(f"📦 Generating {len(names)} packed screens: {', '.join(names)}")
+    expected_tokens = sum(estimate_screen_tokens(screen.get("node_count")) for screen in screens)
+
+    def complete(content):
+        # A pack reply missing any screen is not cached, so the next run asks again
+        return all(pack_output_complete(name, blocks) for name, blocks in split_pack(names, content).items())
+    content = complete_files(", ".join(names), build_prompt(screens, services), expected_tokens=expected_tokens, validate=complete)
+    return split_pack(names, content)
+
+def split_pack(names, content):
+    """Splits a pack reply into {screen name: [(rel_path, code)]} by file path."""
+    owners = {rel_path: name for name in names for rel_path in screen_files(name)}
+    blocks = {name: [] for name in names}
+    for rel_path, code in extract_file_blocks(content):
+        owner = owners.get(rel_path)
+        if owner is None:
+            # Extra files (e.g. a helper model) belong to the screen whose type name they mention
+            matches = [name for name in names if swift_type_name(name) in rel_path]
+            owner = max(matches, key=len) if matches else names[0]
+        blocks[owner].append((rel_path, code))
+    return blocks
+
+def pack_output_complete(screen_name, blocks):
+    """A packed screen is complete when each expected file is present and declares the screen's types."""
+    if not blocks:
+        return False
+    files = dict(blocks)
+    type_name = swift_type_name(screen_name)
+    return all(files.get(rel_path) and type_name in files[rel_path] for rel_path in screen_files(screen_name))
+
+def build_component(state):
+    """One COMPONENT branch: generates a shared component view once for every screen using it."""
+    component = state["component"]
+    return build_unit(state, component["name"], "component",
+                      lambda on_file=None: generate_component(component, on_file))
+
+def build_unit(state, name, kind, generate):
+    output_dir = get_output_dir(state)
+    journal = RunJournal(state["codegen_journal_path"]) if state.get("codegen_journal_path") else None
+    # A resumed run replays the fan-out; branches that completed before the interruption are journaled
+    record = journal.get(name) if journal is not None else None
+    if record and record.get("files") and all(os.path.exists(os.path.join(output_dir, p)) for p in record["files"]):
+        print(f"⏯️  [{kind.upper()}] Already completed in this run: {name}")
+        update = {"written_files": {name: record["files"]}}
+        if record.get("content"):
+            update["generated_files"] = {name: record["content"]}
+        return update
+
+    tracer = get_tracer()
+    try:
+        with tracer.context(screen=name), tracer.span(f"codegen: {name}", category=kind):
+            content, paths = generate_and_assemble(name, output_dir, generate)
+    except Exception as e:
+        print(f"❌ [{kind.upper()}] Failed to generate {name}: {type(e).__name__} - {e}")
+        return {"failed_screens": [name]}
+    print(f"✅ [{kind.upper()}] Wrote {len(paths)} files for {kind}: {name}")
+    if journal is not None:
+        journal.append(name, content=content, files=paths)
+    update = {"written_files": {name: paths}}
+    if content is not None:
+        update["generated_files"] = {name: content}
+    return update
+
+def generate_and_assemble(name, output_dir, generate):
+    """Returns (content, written paths); content is None when the completion was streamed."""
+    paths = []
+    def on_file(rel_path, code):
+        write_generated_file(output_dir, rel_path, code, name)
+        paths.append(rel_path)
+
+    if CODEGEN_STREAM:
+        # Files are written as their blocks close, overlapping generation with assembly
+        generate(on_file)
+        return None, paths
+    content = generate()
+    for rel_path, code in extract_file_blocks(content):
+        on_file(rel_path, code)
+    return content, paths
@@ -1,13 +1,26 @@
+from core.frame_manifest import load_manifest
+
 def plan_structure(state):
     print("🔧 [PLAN_STRUCTURE] Planning folder layout from spec...")
     json_spec = state.get("json_spec")
 
     plan = {
         "screens": json_spec.get("screens", []),
-        "folders": ["Views", "ViewModels", "Models", "Services", "Resources", "Utils"],
+        "components": json_spec.get("shared_components", []),
+        "services": json_spec.get("services", []),
+        "screen_sizes": json_spec.get("screen_sizes", {}),
+        "folders": ["Views", "Views/Components", "ViewModels", "Models", "Services", "Resources", "Utils"],
         "language": "swift",
         "architecture": "MVVM"
     }
 
-    print("✅ [PLAN_STRUCTURE] Generated structure plan:", plan)
+    if state.get("partial"):
+        # Only some frames were fetched: the app shell keeps the screens and services of earlier runs
+        app = load_manifest(state.get("manifest_path")).get("app") or {}
+        screen_names = [screen["name"] if isinstance(screen, dict) and "name" in screen else str(screen) for screen in plan["screens"]]
+        plan["app_screens"] = list(dict.fromkeys(app.get("screens", []) + screen_names))
+        plan["app_services"] = list(dict.fromkeys(app.get("services", []) + plan["services"]))
+
+    # Component definitions are long; the plan printout lists them by name
+    print("✅ [PLAN_STRUCTURE] Generated structure plan:", {**plan, "components": [c["name"] for c in plan["components"]]})
     return {"structure_plan": plan}
\ No newline at end of file
@@ -1,6 +1,11 @@
 import os
 import re
 
+from core.frame_manifest import load_manifest, save_manifest
+from core.output_writer import get_output_writer
+
+FILE_MARKER = "--- file: "
+
 def extract_file_blocks(content):
     """
     Extracts code blocks from the AI response in the format:
@@ -11,20 +16,148 @@ def extract_file_blocks(content):
     matches = re.findall(pattern, content, re.DOTALL)
     return [(filename.strip(), code.strip()) for filename, code in matches]
 
+class FileBlockParser:
+    """
+    Incremental version of extract_file_blocks for streamed completions.
+    feed() returns the blocks closed by the new text (a block closes when the next
+    "--- file: " header starts); close() returns the final block.
+    """
+
+    def __init__(self):
+        self._buffer = ""
+        self._path = None
+        self._scan_from = 0
+
+    def feed(self, chunk):
+        self._buffer += chunk
+        blocks = []
+        while True:
+            if self._path is None:
+                start = self._buffer.find(FILE_MARKER)
+                if start == -1:
+                    # Text outside any block is dropped, except a possibly split marker
+                    self._buffer = self._buffer[-(len(FILE_MARKER) - 1):]
+                    return blocks
+                newline = self._buffer.find("\n", start + len(FILE_MARKER))
+                if newline == -1:
+                    self._buffer = self._buffer[start:]
+                    return blocks
+                self._path = self._buffer[start + len(FILE_MARKER):newline].strip()
+                self._buffer = self._buffer[newline + 1:]
+                self._scan_from = 0
+            else:
+                end = self._buffer.find(FILE_MARKER, self._scan_from)
+                if end == -1:
+                    # Only the tail can still turn into a marker, so skip the rest on the next scan
+                    self._scan_from = max(0, len(self._buffer) - len(FILE_MARKER) + 1)
+                    return blocks
+                blocks.append((self._path, self._buffer[:end].strip()))
+                self._path = None
+                self._buffer = self._buffer[end:]
+
+    def close(self):
+        blocks = []
+        if self._path is not None:
+            blocks.append((self._path, self._buffer.strip()))
+        self._path = None
+        self._buffer = ""
+        self._scan_from = 0
+        return blocks
+
+def get_output_dir(state=None):
+    if state and state.get("output_dir"):
+        return state["output_dir"]
+    return os.getenv("PROJECT_GENERATED_PATH", "./output/generated-project")
+
+def write_generated_file(output_dir, rel_path, code, owner=None):
+    """Writes through the run's OutputWriter: unchanged files are skipped, duplicate paths resolved by policy."""
+    content = code if code.startswith("//") else "// Generated by AI\n\n" + code
+    return get_output_writer(output_dir).write(rel_path, content, owner)
+
 def assemble_project(state):
-    print("📦 [ASSEMBLE_PROJECT] Writing generated files to disk...")
-    output_dir = os.getenv("PROJECT_GENERATED_PATH", "./output/generated-project")
+    """
+    Joins the SCREEN branches: screens generated this run already wrote their files, so only
+    reused screens whose files are missing are written here before the manifest is updated.
+    """
+    print("📦 [ASSEMBLE_PROJECT] Finalizing generated project...")
+    output_dir = get_output_dir(state)
     os.makedirs(output_dir, exist_ok=True)
 
-    files = state["generated_files"]
+    files = state.get("generated_files") or {}
+    # Screens whose files are already on disk (written by their branch, or reused unchanged)
+    written_files = state.get("written_files") or {}
+    screen_hashes = state.get("screen_hashes") or {}
+    manifest_path = state.get("manifest_path")
+    manifest = load_manifest(manifest_path)
+    previous_screens = manifest["screens"]
 
-    for screen, content in files.items():
-        print(f"✅ [ASSEMBLE_PROJECT] Wrote files for screen: {screen}")
+    # Branches finish in any order; the manifest follows the planned order (shared components, then screens)
+    plan = state.get("structure_plan") or {}
+    screen_order = [component["name"] for component in plan.get("components") or []]
+    screen_names = [screen["name"] if isinstance(screen, dict) and "name" in screen else str(screen)
+                    for screen in plan.get("screens", [])]
+    screen_order += screen_names
+    ordered = [name for name in screen_order if name in written_files or name in files]
+    ordered += [name for name in {**files, **written_files} if name not in ordered]
+
+    current_screens = {}
+    for screen in ordered:
+        if screen in written_files:
+            current_screens[screen] = {"hash": screen_hashes.get(screen), "content": files.get(screen), "files": list(written_files[screen])}
+            continue
+        content = files[screen]
         file_blocks = extract_file_blocks(content)
+        current_screens[screen] = {"hash": screen_hashes.get(screen), "content": content, "files": [p for p, _ in file_blocks]}
+
+        print(f"✅ [ASSEMBLE_PROJECT] Wrote files for screen: {screen}")
         for rel_path, code in file_blocks:
-            abs_path = os.path.join(output_dir, rel_path)
-            os.makedirs(os.path.dirname(abs_path), exist_ok=True)
-            with open(abs_path, "w") as f:
-                f.write(code if code.startswith("//") else "// Generated by AI\n\n" + code)
+            write_generated_file(output_dir, rel_path, code, screen)
+
+    # Skeletons rendered from templates belong to their screen, so they are pruned with it
+    for screen, rel_paths in (state.get("scaffold_files") or {}).items():
+        if screen in current_screens:
+            entry = current_screens[screen]
+            entry["files"] = entry["files"] + [p for p in rel_paths if p not in entry["files"]]
 
-    return {"status": "assembled"}
\ No newline at end of file
+    # Screens that failed this run keep their previous entry so their files are not pruned
+    for screen in state.get("failed_screens") or []:
+        if screen in previous_screens:
+            current_screens[screen] = previous_screens[screen]
+
+    if state.get("partial"):
+        # Only some frames were fetched: screens outside them keep their entries and files
+        current_screens = {**previous_screens, **current_screens}
+    else:
+        prune_deleted_screens(output_dir, previous_screens, current_screens)
+
+    if manifest_path:
+        manifest["screens"] = current_screens
+        # What the app shell was rendered from, so a later partial run keeps the other screens in it
+        manifest["app"] = {
+            "screens": plan.get("app_screens") or screen_names,
+            "services": plan.get("app_services") or plan.get("services", []),
+        }
+        save_manifest(manifest, manifest_path)
+
+    failed = state.get("failed_screens") or []
+    if failed:
+        print(f"⚠️ [ASSEMBLE_PROJECT] Generated {len(screen_order) - len(failed)}/{len(screen_order)} screens and components. Failed: {', '.join(failed)}")
+    else:
+        print("✅ [ASSEMBLE_PROJECT] Swift files ready for all screens and components.")
+    print(f"🧾 [ASSEMBLE_PROJECT] Files: {get_output_writer(output_dir).format_stats()}")
+    return {"status": "assembled"}
+
+def prune_deleted_screens(output_dir, previous_screens, current_screens):
+    """Removes files of screens that no longer exist, unless a live screen still emits the same path."""
+    live_paths = {p for entry in current_screens.values() for p in entry.get("files", [])}
+    for screen, entry in previous_screens.items():
+        if screen in current_screens:
+            continue
+        removed = 0
+        for rel_path in entry.get("files", []):
+            abs_path = os.path.join(output_dir, rel_path)
+            if rel_path in live_paths or not os.path.exists(abs_path):
+                continue
+            os.remove(abs_path)
+            removed += 1
+        print(f"🗑️  [ASSEMBLE_PROJECT] Pruned {removed} files of deleted screen: {screen}")
@@ -0,0 +1,30 @@
+import os
+import time
+
+from agents.project_assembler_agent import get_output_dir
+from core.output_writer import get_output_writer
+from core.project_templates import SCAFFOLD_OWNER, render_project
+
+def scaffold_project(state):
+    """
+    Renders the deterministic part of the project from structure_plan: folders, the app shell,
+    the DI container, service protocols and each screen's ViewController/ViewModel skeleton.
+    The model is only asked for the screen-specific bodies.
+    """
+    start = time.perf_counter()
+    structure = state["structure_plan"]
+    output_dir = get_output_dir(state)
+    for folder in structure.get("folders", []):
+        os.makedirs(os.path.join(output_dir, folder), exist_ok=True)
+
+    writer = get_output_writer(output_dir)
+    app_files, screen_files = render_project(structure)
+    for rel_path, content in app_files.items():
+        writer.write(rel_path, content, SCAFFOLD_OWNER)
+    for files in screen_files.values():
+        for rel_path, content in files.items():
+            writer.write(rel_path, content, SCAFFOLD_OWNER)
+
+    count = len(app_files) + sum(len(files) for files in screen_files.values())
+    print(f"🧱 [SCAFFOLD_PROJECT] Rendered {count} files from templates in {(time.perf_counter() - start) * 1000:.0f} ms.")
+    return {"scaffold_files": {screen: list(files) for screen, files in screen_files.items()}}
@@ -1,9 +1,26 @@
-import anthropic
+import json
 import os
 from dotenv import load_dotenv
+
+from core.clients import get_anthropic_client
+from core.llm_cache import cached_completion
+from core.rate_limiter import estimate_tokens, get_rate_limiter
+from core.retry import call_with_retry
+from core.telemetry import get_tracer
+
 load_dotenv()
 
-client = anthropic.Anthropic()
+SPEC_TO_JSON_MODEL = "claude-3-7-sonnet-20250219"
+# Only used when the spec stage's structured JSON spec is unavailable; large specs need room
+SPEC_TO_JSON_MAX_TOKENS = int(os.getenv("SPEC_TO_JSON_MAX_TOKENS", "8192"))
+
+def is_json(text: str) -> bool:
+    """Replies that do not parse are returned to the caller (which reports them) but never cached."""
+    try:
+        json.loads(text)
+    except ValueError:
+        return False
+    return True
 
 def markdown_to_json(markdown: str) -> str:
     prompt = f"""
@@ -27,11 +44,15 @@ Markdown:
 {markdown}
 """
 
-    response = client.messages.create(
-        model="claude-3-7-sonnet-20250219",
-        max_tokens=2048,
-        temperature=0.2,
-        messages=[{"role": "user", "content": prompt}]
-    )
+    def request():
+        with get_rate_limiter("anthropic").request(estimate_tokens(prompt) + SPEC_TO_JSON_MAX_TOKENS):
+            response = get_anthropic_client().messages.create(
+                model=SPEC_TO_JSON_MODEL,
+                max_tokens=SPEC_TO_JSON_MAX_TOKENS,
+                temperature=0.2,
+                messages=[{"role": "user", "content": prompt}]
+            )
+        get_tracer().record_usage(response.usage.input_tokens, response.usage.output_tokens)
+        return response.content[0].text.strip()
 
-    return response.content[0].text.strip()
\ No newline at end of file
+    return cached_completion("anthropic", SPEC_TO_JSON_MODEL, 0.2, prompt, lambda: call_with_retry(request, "Anthropic"), is_json)
\ No newline at end of file
@@ -0,0 +1,152 @@
+"""
+End-to-end pipeline benchmark.
+
+Runs run_pipeline.py against local stub APIs for a grid of synthetic Figma documents
+and records wall time, per-stage time, peak RSS and request counts as JSON.
+
+    python -m benchmarks.run_benchmarks --frames 10,100,1000 --profiles shallow,deep --latency 0.2 --jitter 0.05
+    python -m benchmarks.run_benchmarks --compare benchmarks/results/previous.json
+"""
+import argparse
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+
+from benchmarks.stub_servers import StubServer
+from benchmarks.synthetic_figma import generate_document
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RESULTS_DIR = os.path.join(REPO_ROOT, "benchmarks", "results")
+FILE_KEY = "BENCH"
+
+
+def peak_rss_mb(rusage) -> float:
+    # ru_maxrss is KiB on Linux and bytes on macOS
+    divisor = 1024 * 1024 if sys.platform == "darwin" else 1024
+    return round(rusage.ru_maxrss / divisor, 1)
+
+
+def git_revision() -> str:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=REPO_ROOT, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def run_scenario(frames: int, profile: str, latency: float, jitter: float, extra_args, keep: bool) -> dict:
+    workdir = tempfile.mkdtemp(prefix=f"bench-{frames}-{profile}-")
+    output_dir = os.path.join(workdir, "output")
+    timings_path = os.path.join(workdir, "timings.json")
+    log_path = os.path.join(workdir, "pipeline.log")
+
+    with StubServer({FILE_KEY: generate_document(frames, profile)}, latency=latency, jitter=jitter) as server:
+        env = {
+            **os.environ,
+            **server.env(),
+            "LLM_CACHE_DIR": os.path.join(workdir, "llm_cache"),
+            "FIGMA_CACHE_DIR": os.path.join(workdir, "figma_cache"),
+            "ASSET_CACHE_DIR": os.path.join(workdir, "asset_cache"),
+            "PROJECT_GENERATED_PATH": os.path.join(output_dir, "generated-project"),
+            "PYTHONUNBUFFERED": "1",
+        }
+        command = [sys.executable, "run_pipeline.py", "--figma-key", FILE_KEY, "--output-dir", output_dir,
+                   "--timings-out", timings_path, *extra_args]
+        start = time.perf_counter()
+        with open(log_path, "w", encoding="utf-8") as log:
+            process = subprocess.Popen(command, cwd=REPO_ROOT, env=env, stdout=log, stderr=subprocess.STDOUT)
+            _, status, rusage = os.wait4(process.pid, 0)
+        wall = time.perf_counter() - start
+        counts = dict(server.counts)
+
+    stages = {}
+    if os.path.exists(timings_path):
+        with open(timings_path, "r", encoding="utf-8") as f:
+            stages = json.load(f)
+
+    result = {
+        "frames": frames,
+        "profile": profile,
+        "exit_code": os.waitstatus_to_exitcode(status),
+        "wall_s": round(wall, 3),
+        "stages_s": stages,
+        "peak_rss_mb": peak_rss_mb(rusage),
+        "requests": counts,
+        "log": log_path if keep else None,
+    }
+    if result["exit_code"] != 0:
+        with open(log_path, "r", encoding="utf-8") as f:
+            result["error_tail"] = f.read()[-2000:]
+    if not keep:
+        shutil.rmtree(workdir, ignore_errors=True)
+    return result
+
+
+def print_table(results, baseline=None):
+    baseline_by_key = {(r["frames"], r["profile"]): r for r in (baseline or {}).get("results", [])}
+    print(f"\n{'frames':>7} {'profile':<8} {'wall s':>9} {'fetch':>7} {'analyze':>8} {'assets':>7} {'spec':>8} {'codegen':>8} {'rss MB':>8}  requests")
+    for r in results:
+        stages = r["stages_s"]
+        line = (f"{r['frames']:>7} {r['profile']:<8} {r['wall_s']:>9.2f} {stages.get('fetch', 0):>7.2f} "
+                f"{stages.get('analyze', 0):>8.2f} {stages.get('assets', 0):>7.2f} {stages.get('spec', 0):>8.2f} {stages.get('codegen', 0):>8.2f} "
+                f"{r['peak_rss_mb']:>8.1f}  {json.dumps(r['requests'], sort_keys=True)}")
+        previous = baseline_by_key.get((r["frames"], r["profile"]))
+        if previous and previous["wall_s"]:
+            line += f"  ({(r['wall_s'] - previous['wall_s']) / previous['wall_s']:+.0%} wall vs baseline)"
+        if r["exit_code"] != 0:
+            line += f"  FAILED (exit {r['exit_code']})"
+        print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the pipeline end to end against local stub APIs")
+    parser.add_argument("--frames", default="10,100,1000", help="Comma-separated frame counts")
+    parser.add_argument("--profiles", default="shallow,deep", help="Comma-separated nesting profiles (shallow, medium, deep)")
+    parser.add_argument("--latency", type=float, default=0.1, help="Stub response latency in seconds")
+    parser.add_argument("--jitter", type=float, default=0.02, help="Uniform +/- jitter added to the latency")
+    parser.add_argument("--out", help="Results file (default: benchmarks/results/bench-<timestamp>.json)")
+    parser.add_argument("--compare", help="Previous results file to compare wall times against")
+    parser.add_argument("--keep", action="store_true", help="Keep each scenario's working directory and log")
+    parser.add_argument("pipeline_args", nargs=argparse.REMAINDER, help="Extra arguments passed to run_pipeline.py after --")
+    args = parser.parse_args()
+
+    extra_args = [a for a in args.pipeline_args if a != "--"]
+    results = []
+    for frames in [int(f) for f in args.frames.split(",") if f]:
+        for profile in [p for p in args.profiles.split(",") if p]:
+            print(f"⏱️  {frames} frames / {profile} ...", flush=True)
+            results.append(run_scenario(frames, profile, args.latency, args.jitter, extra_args, args.keep))
+
+    report = {
+        "meta": {
+            "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "revision": git_revision(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "latency_s": args.latency,
+            "jitter_s": args.jitter,
+            "pipeline_args": extra_args,
+        },
+        "results": results,
+    }
+
+    out_path = args.out or os.path.join(RESULTS_DIR, f"bench-{datetime.now().strftime('%Y%m%d-%H%M%S')}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(out_path)), exist_ok=True)
+    with open(out_path, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+
+    baseline = None
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+    print_table(results, baseline)
+    print(f"\n✅ Results saved to: {out_path}")
+
+
+if __name__ == "__main__":
+    main()
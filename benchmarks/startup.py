@@ -0,0 +1,104 @@
+"""
+CLI startup benchmark.
+
+Times `run_pipeline.py` subcommands that do little work (help, analyze on a small synthetic file)
+so import-time regressions show up, and lists which heavy dependencies each command loads.
+
+    python -m benchmarks.startup --runs 10 --budget 1.0
+"""
+import argparse
+import json
+import os
+import re
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+
+from benchmarks.run_benchmarks import REPO_ROOT, RESULTS_DIR, git_revision
+from benchmarks.synthetic_figma import generate_document
+
+HEAVY_MODULES = ("openai", "anthropic", "langgraph", "langchain_core", "crewai", "requests")
+
+
+def imported_heavy_modules(command, env):
+    """Runs the command once under -X importtime and returns {heavy package: seconds spent importing its modules}."""
+    result = subprocess.run([sys.executable, "-X", "importtime", *command], cwd=REPO_ROOT, env=env,
+                            capture_output=True, text=True)
+    loaded = {}
+    for line in result.stderr.splitlines():
+        match = re.match(r"import time:\s+(\d+) \|\s+\d+ \|\s*(\S+)$", line)
+        if match and match.group(2).split(".")[0] in HEAVY_MODULES:
+            package = match.group(2).split(".")[0]
+            loaded[package] = loaded.get(package, 0) + int(match.group(1)) / 1e6
+    return {package: round(seconds, 3) for package, seconds in loaded.items()}
+
+
+def time_command(command, env, runs):
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, *command], cwd=REPO_ROOT, env=env, stdout=subprocess.DEVNULL,
+                       stderr=subprocess.DEVNULL, check=True)
+        timings.append(time.perf_counter() - start)
+    return {"median_s": round(statistics.median(timings), 3), "min_s": round(min(timings), 3)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure run_pipeline.py startup time per subcommand")
+    parser.add_argument("--runs", type=int, default=5, help="Runs per command")
+    parser.add_argument("--frames", type=int, default=10, help="Frames in the synthetic file used by analyze")
+    parser.add_argument("--budget", type=float, default=1.0, help="Fail if analyze's median exceeds this many seconds")
+    parser.add_argument("--out", help="Results file (default: benchmarks/results/startup-<timestamp>.json)")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="startup-")
+    with open(os.path.join(workdir, "figma_design.json"), "w", encoding="utf-8") as f:
+        json.dump(generate_document(args.frames, "shallow"), f)
+    env = dict(os.environ)
+
+    commands = {
+        "help": ["run_pipeline.py", "--help"],
+        "analyze": ["run_pipeline.py", "analyze", "--output-dir", workdir],
+        "import_all_stages": ["-c", "import run_pipeline, core.markdown_generator, crew_runner"],
+    }
+    # Warm the bytecode cache so the first timed run is not penalised
+    time_command(commands["help"], env, 1)
+
+    results = {}
+    for name, command in commands.items():
+        print(f"⏱️  {name} ...", flush=True)
+        results[name] = {**time_command(command, env, args.runs), "heavy_imports": imported_heavy_modules(command, env)}
+    shutil.rmtree(workdir, ignore_errors=True)
+
+    print(f"\n{'command':<20} {'median s':>9} {'min s':>7}  heavy imports")
+    for name, r in results.items():
+        heavy = ", ".join(f"{module} {seconds:.2f}s" for module, seconds in r["heavy_imports"].items()) or "-"
+        print(f"{name:<20} {r['median_s']:>9.3f} {r['min_s']:>7.3f}  {heavy}")
+
+    report = {
+        "meta": {
+            "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "revision": git_revision(),
+            "python": sys.version.split()[0],
+            "runs": args.runs,
+            "frames": args.frames,
+        },
+        "results": results,
+    }
+    out_path = args.out or os.path.join(RESULTS_DIR, f"startup-{datetime.now().strftime('%Y%m%d-%H%M%S')}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(out_path)), exist_ok=True)
+    with open(out_path, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"\n✅ Results saved to: {out_path}")
+
+    if results["analyze"]["median_s"] > args.budget:
+        print(f"❌ analyze startup {results['analyze']['median_s']:.3f}s exceeds the {args.budget:.2f}s budget")
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
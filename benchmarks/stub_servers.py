@@ -0,0 +1,389 @@
+"""
+Local stand-ins for the Figma, OpenAI, Anthropic and Ollama HTTP APIs, used by the benchmark
+harness (and handy for manual end-to-end runs without API keys or network access).
+
+All four APIs are served from one port:
+    Figma      GET  /v1/files/<key>[?depth=N], GET /v1/files/<key>/nodes?ids=...
+               GET  /v1/files/<key>/images, GET /v1/images/<key>?ids=...&format=pdf&scale=N
+               GET  /assets/<name> (image bytes behind the URLs the two image endpoints return)
+    OpenAI     POST /v1/chat/completions (stream and non-stream)
+    Anthropic  POST /v1/messages
+    Ollama     POST /api/generate (NDJSON stream)
+"""
+import argparse
+import json
+import random
+import re
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, Optional
+from urllib.parse import parse_qs, urlparse
+
+
+def _truncate(node: Dict[str, Any], depth: int) -> Dict[str, Any]:
+    copy = {key: value for key, value in node.items() if key != "children"}
+    if "children" in node and depth > 0:
+        copy["children"] = [_truncate(child, depth - 1) for child in node["children"]]
+    return copy
+
+
+def _index_nodes(document: Dict[str, Any]) -> Dict[str, Any]:
+    index = {}
+    stack = [document.get("document", {})]
+    while stack:
+        node = stack.pop()
+        if node.get("id"):
+            index[node["id"]] = node
+        stack.extend(node.get("children", []))
+    return index
+
+
+def _image_refs(document: Dict[str, Any]):
+    refs = []
+    stack = [document.get("document", {})]
+    while stack:
+        node = stack.pop()
+        refs.extend(fill["imageRef"] for fill in node.get("fills", []) if fill.get("type") == "IMAGE" and fill.get("imageRef"))
+        stack.extend(node.get("children", []))
+    return refs
+
+
+def asset_bytes(name: str) -> bytes:
+    """Deterministic stand-in image for an /assets/ URL: a PNG or PDF header plus the name."""
+    if name.endswith(".pdf"):
+        return b"%PDF-1.4\n% stub " + name.encode() + b"\n%%EOF\n"
+    if name.endswith(".svg"):
+        return f'<svg xmlns="http://www.w3.org/2000/svg"><!-- {name} --></svg>\n'.encode()
+    return b"\x89PNG\r\n\x1a\n" + name.encode()
+
+
+def spec_reply(prompt: str) -> str:
+    match = re.search(r"Screen Name: (.+)", prompt)
+    name = match.group(1).strip() if match else "Screen"
+    return (
+        f"### 1. {name}\n- **Size:** 375 x 812 px\n- **Background:** White #FFFFFF\n"
+        f"- **Components:**\n  - Header: title label\n  - Button: primary CTA\n"
+        f"- **Interaction:**\n  - **Trigger:** Button tap\n  - **Action:** Navigate to next screen\n"
+    )
+
+
+def structured_spec_reply(prompt: str) -> str:
+    """spec_reply wrapped in the FRAME_SPEC_SCHEMA object requested when structured output is on."""
+    return json.dumps({
+        "markdown": spec_reply(prompt),
+        "components": ["Header", "Button"],
+        "services": ["NavigationService"],
+    })
+
+
+def component_reply(prompt: str) -> str:
+    name = re.search(r'reusable UIKit view named "([^"]+)"', prompt).group(1)
+    return (
+        f"--- file: Views/Components/{name}.swift\nimport UIKit\n\n"
+        f"final class {name}: UIView {{\n    func configure(title: String) {{}}\n}}\n"
+    )
+
+
+def codegen_reply(prompt: str) -> str:
+    """Screen-specific bodies only; the app shell and skeletons come from core.project_templates."""
+    if "reusable UIKit view named" in prompt:
+        return component_reply(prompt)
+    names = list(dict.fromkeys(re.findall(r'screen named "([^"]+)"', prompt, re.IGNORECASE))) or ["Screen"]
+    blocks = []
+    for name in names:
+        type_name = re.sub(r"[^A-Za-z0-9]", "", name) or "Screen"
+        blocks.append(
+            f"--- file: Models/{type_name}State.swift\nstruct {type_name}State {{\n    var title = \"{name}\"\n}}\n\n"
+            f"--- file: Views/{type_name}ViewController+Layout.swift\nimport UIKit\n\n"
+            f"extension {type_name}ViewController {{\n    func setupUI() {{\n        title = viewModel.state.title\n    }}\n\n"
+            f"    func bindViewModel() {{}}\n}}\n\n"
+            f"--- file: ViewModels/{type_name}ViewModel+Actions.swift\n"
+            f"extension {type_name}ViewModel {{\n    func didTapPrimary() {{}}\n}}\n"
+        )
+    return "\n".join(blocks)
+
+
+def json_spec_reply(prompt: str) -> str:
+    screens = []
+    for heading in re.findall(r"^###\s+\d+\.\s+(.+)$", prompt, re.MULTILINE):
+        name = heading.split(" - ")[-1].strip()
+        if name not in screens:
+            screens.append(name)
+    return json.dumps({
+        "screens": screens,
+        "components": {name: ["Header", "Button"] for name in screens},
+        "services": ["NavigationService"],
+        "ci": True,
+        "docs": True,
+    })
+
+
+class StubServer:
+    """
+    Threaded HTTP server serving every stub API. latency/jitter (seconds) are applied per request,
+    api_latency overrides latency per API (e.g. {"ollama": 2.0}); `counts` records requests per API.
+    """
+
+    def __init__(self, figma_documents: Optional[Dict[str, Dict[str, Any]]] = None, latency: float = 0.0,
+                 jitter: float = 0.0, figma_latency: Optional[float] = None, host: str = "127.0.0.1", port: int = 0,
+                 api_latency: Optional[Dict[str, float]] = None):
+        self.figma_documents = figma_documents or {}
+        self.latency = latency
+        self.jitter = jitter
+        self.figma_latency = latency if figma_latency is None else figma_latency
+        self.api_latency = api_latency or {}
+        self.counts = Counter()
+        self._lock = threading.Lock()
+        self._encoded = {}
+        self._node_index = {}
+        self._httpd = ThreadingHTTPServer((host, port), self._handler_class())
+        self._httpd.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def env(self) -> Dict[str, str]:
+        """Environment variables that point the pipeline at this server."""
+        return {
+            "FIGMA_API_BASE": self.url,
+            "FIGMA_ACCESS_TOKEN": "stub",
+            "OPENAI_BASE_URL": f"{self.url}/v1",
+            "OPENAI_API_KEY": "stub",
+            "ANTHROPIC_BASE_URL": self.url,
+            "ANTHROPIC_API_KEY": "stub",
+            "OLLAMA_URL": f"{self.url}/api/generate",
+        }
+
+    def start(self) -> "StubServer":
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def _count(self, api: str):
+        with self._lock:
+            self.counts[api] += 1
+
+    def _sleep(self, base: float):
+        if base or self.jitter:
+            time.sleep(max(0.0, base + random.uniform(-self.jitter, self.jitter)))
+
+    def _figma_body(self, key: str, depth: Optional[int]) -> Optional[bytes]:
+        document = self.figma_documents.get(key)
+        if document is None:
+            return None
+        cache_key = (key, depth)
+        with self._lock:
+            body = self._encoded.get(cache_key)
+        if body is None:
+            payload = document
+            if depth is not None:
+                payload = {**document, "document": _truncate(document["document"], depth)}
+            body = json.dumps(payload, separators=(",", ":")).encode("utf-8")
+            with self._lock:
+                self._encoded[cache_key] = body
+        return body
+
+    def _figma_nodes(self, key: str, ids, depth: Optional[int]) -> Optional[bytes]:
+        document = self.figma_documents.get(key)
+        if document is None:
+            return None
+        with self._lock:
+            if key not in self._node_index:
+                self._node_index[key] = _index_nodes(document)
+            index = self._node_index[key]
+        nodes = {}
+        for node_id in ids:
+            node = index.get(node_id)
+            if node is not None and depth is not None:
+                node = _truncate(node, depth)
+            nodes[node_id] = {"document": node} if node is not None else None
+        return json.dumps({"nodes": nodes}, separators=(",", ":")).encode("utf-8")
+
+    def _handler_class(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def _send(self, status: int, body: bytes, content_type: str = "application/json"):
+                self.send_response(status)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def _send_chunks(self, chunks, content_type: str):
+                self.send_response(200)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Transfer-Encoding", "chunked")
+                self.end_headers()
+                try:
+                    for chunk in chunks:
+                        self.wfile.write(f"{len(chunk):x}\r\n".encode() + chunk + b"\r\n")
+                    self.wfile.write(b"0\r\n\r\n")
+                except (BrokenPipeError, ConnectionResetError):
+                    # The client closed the stream early (e.g. a cancelled hedge request)
+                    self.close_connection = True
+
+            def _json_body(self) -> Dict[str, Any]:
+                length = int(self.headers.get("Content-Length", 0))
+                return json.loads(self.rfile.read(length) or b"{}")
+
+            def do_GET(self):
+                parsed = urlparse(self.path)
+                query = parse_qs(parsed.query)
+                depth = int(query["depth"][0]) if "depth" in query else None
+                if parsed.path.startswith("/assets/"):
+                    server._count("assets")
+                    server._sleep(server.api_latency.get("assets", server.figma_latency))
+                    return self._send(200, asset_bytes(parsed.path[len("/assets/"):]), "application/octet-stream")
+                render = re.fullmatch(r"/v1/images/([^/]+)", parsed.path)
+                if render:
+                    return self._figma_renders(render.group(1), query)
+                match = re.fullmatch(r"/v1/files/([^/]+)(/nodes|/images)?", parsed.path)
+                if not match:
+                    return self._send(404, b'{"err":"not found"}')
+                if match.group(2) == "/images":
+                    return self._figma_image_fills(match.group(1))
+                server._count("figma")
+                server._sleep(server.figma_latency)
+                key = match.group(1)
+                if match.group(2):
+                    ids = query.get("ids", [""])[0].split(",")
+                    body = server._figma_nodes(key, ids, depth)
+                else:
+                    body = server._figma_body(key, depth)
+                if body is None:
+                    return self._send(404, b'{"status":404,"err":"Not found"}')
+                self._send(200, body)
+
+            def _figma_image_fills(self, key):
+                server._count("figma_images")
+                server._sleep(server.figma_latency)
+                document = server.figma_documents.get(key)
+                if document is None:
+                    return self._send(404, b'{"status":404,"error":true}')
+                images = {ref: f"{server.url}/assets/{ref}.png" for ref in _image_refs(document)}
+                self._send(200, json.dumps({"error": False, "status": 200, "meta": {"images": images}}).encode())
+
+            def _figma_renders(self, key, query):
+                server._count("figma_images")
+                server._sleep(server.figma_latency)
+                document = server.figma_documents.get(key)
+                if document is None:
+                    return self._send(404, b'{"status":404,"err":"Not found"}')
+                with server._lock:
+                    if key not in server._node_index:
+                        server._node_index[key] = _index_nodes(document)
+                    index = server._node_index[key]
+                fmt = query.get("format", ["png"])[0]
+                scale = query.get("scale", ["1"])[0]
+                images = {
+                    node_id: f"{server.url}/assets/{node_id.replace(':', '-')}@{scale}x.{fmt}" if node_id in index else None
+                    for node_id in query.get("ids", [""])[0].split(",")
+                }
+                self._send(200, json.dumps({"err": None, "images": images}).encode())
+
+            def do_POST(self):
+                path = urlparse(self.path).path
+                payload = self._json_body()
+                if path == "/v1/chat/completions":
+                    return self._openai(payload)
+                if path == "/v1/messages":
+                    return self._anthropic(payload)
+                if path == "/api/generate":
+                    return self._ollama(payload)
+                self._send(404, b'{"error":"not found"}')
+
+            def _openai(self, payload):
+                server._count("openai")
+                server._sleep(server.api_latency.get("openai", server.latency))
+                prompt = payload["messages"][-1]["content"]
+                if "Screen Name:" in prompt:
+                    text = structured_spec_reply(prompt) if payload.get("response_format") else spec_reply(prompt)
+                else:
+                    text = codegen_reply(prompt)
+                usage = {"prompt_tokens": len(prompt) // 4, "completion_tokens": len(text) // 4,
+                         "total_tokens": (len(prompt) + len(text)) // 4}
+                if payload.get("stream"):
+                    def events():
+                        for i in range(0, len(text), 64):
+                            chunk = {"id": "stub", "object": "chat.completion.chunk", "created": 0, "model": payload["model"],
+                                     "choices": [{"index": 0, "delta": {"content": text[i:i + 64]}, "finish_reason": None}]}
+                            yield f"data: {json.dumps(chunk)}\n\n".encode()
+                        done = {"id": "stub", "object": "chat.completion.chunk", "created": 0, "model": payload["model"],
+                                "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}], "usage": usage}
+                        yield f"data: {json.dumps(done)}\n\n".encode()
+                        yield b"data: [DONE]\n\n"
+                    return self._send_chunks(events(), "text/event-stream")
+                body = {"id": "stub", "object": "chat.completion", "created": 0, "model": payload["model"],
+                        "choices": [{"index": 0, "message": {"role": "assistant", "content": text}, "finish_reason": "stop"}],
+                        "usage": usage}
+                self._send(200, json.dumps(body).encode())
+
+            def _anthropic(self, payload):
+                server._count("anthropic")
+                server._sleep(server.api_latency.get("anthropic", server.latency))
+                prompt = payload["messages"][-1]["content"]
+                text = json_spec_reply(prompt)
+                body = {"id": "stub", "type": "message", "role": "assistant", "model": payload["model"],
+                        "content": [{"type": "text", "text": text}], "stop_reason": "end_turn",
+                        "usage": {"input_tokens": len(prompt) // 4, "output_tokens": len(text) // 4}}
+                self._send(200, json.dumps(body).encode())
+
+            def _ollama(self, payload):
+                server._count("ollama")
+                server._sleep(server.api_latency.get("ollama", server.latency))
+                prompt = payload.get("prompt", "")
+                text = structured_spec_reply(prompt) if payload.get("format") else spec_reply(prompt)
+
+                def lines():
+                    for i in range(0, len(text), 64):
+                        yield (json.dumps({"response": text[i:i + 64], "done": False}) + "\n").encode()
+                    yield (json.dumps({"response": "", "done": True}) + "\n").encode()
+                self._send_chunks(lines(), "application/x-ndjson")
+
+        return Handler
+
+
+def main():
+    from benchmarks.synthetic_figma import generate_document
+
+    parser = argparse.ArgumentParser(description="Serve stub Figma/OpenAI/Anthropic/Ollama APIs")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--frames", type=int, default=10, help="Frames in the synthetic document served as file key BENCH")
+    parser.add_argument("--profile", default="shallow", help="Nesting profile: shallow, medium or deep")
+    parser.add_argument("--latency", type=float, default=0.0)
+    parser.add_argument("--jitter", type=float, default=0.0)
+    args = parser.parse_args()
+
+    server = StubServer({"BENCH": generate_document(args.frames, args.profile)}, args.latency, args.jitter, port=args.port)
+    print("Export these to point the pipeline at the stubs:")
+    for key, value in server.env().items():
+        print(f"export {key}={value}")
+    try:
+        server._httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
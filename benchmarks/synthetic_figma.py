@@ -0,0 +1,105 @@
+import random
+from typing import Any, Dict
+
+# Nesting profiles: (depth, containers per level, leaves per container)
+PROFILES = {
+    "shallow": (2, 3, 4),
+    "medium": (5, 2, 3),
+    "deep": (25, 1, 2),
+}
+
+FONTS = [("Inter", 14), ("Inter", 17), ("SF Pro Display", 28), ("Roboto", 12)]
+COLORS = [
+    {"r": 1.0, "g": 0.643, "b": 0.318, "a": 1.0},
+    {"r": 1.0, "g": 1.0, "b": 1.0, "a": 1.0},
+    {"r": 0.153, "g": 0.176, "b": 0.251, "a": 1.0},
+    {"r": 0.525, "g": 0.525, "b": 0.588, "a": 1.0},
+]
+
+
+class _Ids:
+    def __init__(self):
+        self.counter = 0
+
+    def next(self, prefix: int) -> str:
+        self.counter += 1
+        return f"{prefix}:{self.counter}"
+
+
+def _leaf(rng: random.Random, ids: _Ids, frame_idx: int, idx: int) -> Dict[str, Any]:
+    kind = rng.random()
+    box = {"x": rng.uniform(0, 300), "y": rng.uniform(0, 700), "width": rng.uniform(20, 300), "height": rng.uniform(10, 60)}
+    if kind < 0.5:
+        family, size = rng.choice(FONTS)
+        return {
+            "id": ids.next(frame_idx), "name": f"Label {idx}", "type": "TEXT",
+            "characters": f"Sample text {idx}", "absoluteBoundingBox": box,
+            "style": {"fontFamily": family, "fontSize": size, "fontWeight": 400},
+            "fills": [{"type": "SOLID", "color": rng.choice(COLORS)}],
+        }
+    if kind < 0.8:
+        return {
+            "id": ids.next(frame_idx), "name": "Button", "type": "INSTANCE", "componentId": "0:100",
+            "absoluteBoundingBox": box, "fills": [{"type": "SOLID", "color": COLORS[0]}],
+            "children": [{
+                "id": ids.next(frame_idx), "name": "Title", "type": "TEXT", "characters": "Continue",
+                "style": {"fontFamily": "Inter", "fontSize": 17, "fontWeight": 600},
+                "fills": [{"type": "SOLID", "color": COLORS[1]}],
+            }],
+        }
+    return {
+        "id": ids.next(frame_idx), "name": f"Icon {idx}", "type": "VECTOR", "absoluteBoundingBox": box,
+        "fills": [{"type": "SOLID", "color": rng.choice(COLORS)}],
+        "fillGeometry": [{"path": "M0 0L24 0L24 24L0 24Z" * 4, "windingRule": "NONZERO"}],
+        "exportSettings": [{"suffix": "", "format": "PDF", "constraint": {"type": "SCALE", "value": 1}}],
+        "relativeTransform": [[1, 0, 0], [0, 1, 0]],
+    }
+
+
+def _frame(rng: random.Random, ids: _Ids, frame_idx: int, profile: str) -> Dict[str, Any]:
+    depth, containers, leaves = PROFILES[profile]
+    frame = {
+        "id": f"1:{frame_idx}", "name": f"Screen {frame_idx:04d}", "type": "FRAME",
+        "absoluteBoundingBox": {"x": frame_idx * 400.0, "y": 0.0, "width": 375.0, "height": 812.0},
+        "fills": [{"type": "SOLID", "color": COLORS[1]}], "children": [],
+    }
+    level = [frame]
+    leaf_idx = 0
+    for _ in range(depth):
+        next_level = []
+        for parent in level:
+            for _ in range(leaves):
+                parent["children"].append(_leaf(rng, ids, frame_idx + 2, leaf_idx))
+                leaf_idx += 1
+            for c in range(containers):
+                group = {"id": ids.next(frame_idx + 2), "name": f"Group {c}", "type": "FRAME", "children": [],
+                         "layoutMode": "VERTICAL", "itemSpacing": 8}
+                parent["children"].append(group)
+                next_level.append(group)
+        level = next_level
+    # A hero image per screen, drawn from a few shared bitmaps (added last so the rng sequence is unchanged)
+    frame["children"].append({
+        "id": ids.next(frame_idx + 2), "name": "Hero Image", "type": "RECTANGLE",
+        "absoluteBoundingBox": {"x": frame_idx * 400.0, "y": 80.0, "width": 375.0, "height": 200.0},
+        "fills": [{"type": "IMAGE", "scaleMode": "FILL", "imageRef": f"{frame_idx % 3:040x}"}],
+    })
+    return frame
+
+
+def generate_document(frames: int, profile: str = "shallow", seed: int = 0, version: str = "1") -> Dict[str, Any]:
+    """Builds a deterministic Figma file response with `frames` top-level FRAMEs on one CANVAS page."""
+    rng = random.Random(seed)
+    ids = _Ids()
+    return {
+        "name": f"Synthetic {frames} {profile}",
+        "version": version,
+        "lastModified": "2024-01-01T00:00:00Z",
+        "document": {
+            "id": "0:0", "name": "Document", "type": "DOCUMENT",
+            "children": [{
+                "id": "0:1", "name": "Design", "type": "CANVAS",
+                "children": [_frame(rng, ids, idx, profile) for idx in range(1, frames + 1)],
+            }],
+        },
+        "components": {"0:100": {"key": "button", "name": "Button"}},
+    }
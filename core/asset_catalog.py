@@ -0,0 +1,180 @@
+import hashlib
+import json
+import re
+from typing import Any, Dict, List, Optional
+
+from core.figma_index import walk_post_order
+
+# Layers made only of these are drawn vectors; a group of them (with at least one path) is an icon
+VECTOR_TYPES = {"VECTOR", "BOOLEAN_OPERATION", "STAR", "REGULAR_POLYGON"}
+SHAPE_TYPES = VECTOR_TYPES | {"ELLIPSE", "RECTANGLE", "LINE"}
+CONTAINER_TYPES = {"GROUP", "FRAME", "INSTANCE", "COMPONENT"}
+EXPORT_FORMATS = {"PDF": "pdf", "SVG": "svg", "PNG": "png", "JPG": "jpg"}
+RASTER_SCALES = (1, 2, 3)
+
+# Position of the icon in its screen; the icon's own size is ignored too, so a 24pt and a 32pt use
+# of the same vector share one (scalable) asset. Layer names do not change the drawing ("Arrow copy")
+ICON_IGNORED_KEYS = {"id", "name", "absoluteBoundingBox", "absoluteRenderBounds", "relativeTransform", "size",
+                     "pluginData", "sharedPluginData", "transitionNodeID", "children"}
+# Within the icon, child geometry is part of the drawing: it is hashed relative to the icon's box
+# (see relative_geometry), so scaled copies still match; only ids, names and render bounds are dropped
+ICON_CHILD_IGNORED_KEYS = {"id", "name", "absoluteRenderBounds", "pluginData", "sharedPluginData", "children"}
+GEOMETRY_PRECISION = 4
+
+
+def asset_name(layer_name: str, fallback: str) -> str:
+    """Asset catalog name for a Figma layer, e.g. "Icon/Arrow Left" -> "icon-arrow-left"."""
+    words = re.findall(r"[A-Za-z0-9]+", layer_name or "")
+    name = "-".join(word.lower() for word in words) or fallback
+    return f"{fallback}-{name}" if name[0].isdigit() else name
+
+
+def image_refs(node: Dict[str, Any]) -> List[str]:
+    return [fill["imageRef"] for fill in node.get("fills", []) or []
+            if fill.get("type") == "IMAGE" and fill.get("imageRef") and fill.get("visible", True)]
+
+
+def export_format(node: Dict[str, Any]) -> str:
+    """Format from the layer's first export setting; vectors default to PDF."""
+    for setting in node.get("exportSettings") or []:
+        if setting.get("format") in EXPORT_FORMATS:
+            return EXPORT_FORMATS[setting["format"]]
+    return "pdf"
+
+
+def relative_geometry(node: Dict[str, Any], box: Optional[Dict[str, float]]) -> Dict[str, Any]:
+    """
+    A child's bounding box, size and translation as fractions of the icon's box; empty when the icon
+    has no usable box, so the child's geometry is left out.
+    """
+    width, height = (box or {}).get("width") or 0, (box or {}).get("height") or 0
+    if width <= 0 or height <= 0:
+        return {}
+    geometry = {}
+    child_box = node.get("absoluteBoundingBox")
+    if child_box:
+        geometry["absoluteBoundingBox"] = {
+            "x": round((child_box.get("x", 0) - box.get("x", 0)) / width, GEOMETRY_PRECISION),
+            "y": round((child_box.get("y", 0) - box.get("y", 0)) / height, GEOMETRY_PRECISION),
+            "width": round(child_box.get("width", 0) / width, GEOMETRY_PRECISION),
+            "height": round(child_box.get("height", 0) / height, GEOMETRY_PRECISION),
+        }
+    size = node.get("size")
+    if size:
+        geometry["size"] = {"x": round(size.get("x", 0) / width, GEOMETRY_PRECISION),
+                            "y": round(size.get("y", 0) / height, GEOMETRY_PRECISION)}
+    transform = node.get("relativeTransform")
+    if transform:
+        # Rotation and scale stay as they are; the translation column is relative to the icon size
+        geometry["relativeTransform"] = [
+            [transform[0][0], transform[0][1], round(transform[0][2] / width, GEOMETRY_PRECISION)],
+            [transform[1][0], transform[1][1], round(transform[1][2] / height, GEOMETRY_PRECISION)],
+        ]
+    return geometry
+
+
+def icon_hash(root: Dict[str, Any]) -> str:
+    """
+    Content hash of an icon subtree: its drawing without ids, placement or its own size, with the
+    children's geometry relative to the icon's box (iterative).
+    """
+    box = root.get("absoluteBoundingBox")
+    h = hashlib.sha256()
+    stack = [(root, ICON_IGNORED_KEYS)]
+    while stack:
+        node, ignored = stack.pop()
+        own = {key: value for key, value in node.items() if key not in ignored}
+        if node is not root:
+            for key in ("absoluteBoundingBox", "size", "relativeTransform"):
+                own.pop(key, None)
+            own.update(relative_geometry(node, box))
+        children = node.get("children") or []
+        own["children"] = len(children)
+        h.update(json.dumps(own, sort_keys=True, ensure_ascii=False, separators=(",", ":"), default=dict).encode("utf-8"))
+        stack.extend((child, ICON_CHILD_IGNORED_KEYS) for child in reversed(children))
+    return h.hexdigest()[:16]
+
+
+class AssetCatalog:
+    """
+    Collects the design's bitmap image fills (by imageRef, Figma's content hash of the image) and
+    its icons: layers marked for export and the outermost subtrees drawn only with vector shapes.
+    Icons are deduplicated by icon_hash, so every copy of an icon is exported once.
+    """
+
+    def __init__(self):
+        self.images: Dict[str, Dict[str, Any]] = {}  # imageRef -> first layer and usage
+        self.icons: Dict[str, Dict[str, Any]] = {}   # icon hash -> first node and usage
+        self._vector_only: Dict[int, tuple] = {}     # id(node) -> (only shapes, has a path) until its parent is visited
+
+    def add_frame(self, screen_name: str, frame: Dict[str, Any]):
+        visit = self.visitor(screen_name, frame)
+        for node in walk_post_order(frame):
+            visit(node, None, None)
+
+    def visitor(self, screen_name: str, frame: Dict[str, Any]):
+        """Per-node callback for FigmaIndex.add_frame, which visits a node's children before it."""
+        return lambda node, fingerprint, node_count: self._add_node(screen_name, frame, node)
+
+    def _add_node(self, screen_name: str, frame: Dict[str, Any], node: Dict[str, Any]):
+        # Children are classified before their parent; _vector_only[id] = (only shapes, has a path)
+        for ref in image_refs(node):
+            self._use(self.images, ref, screen_name, node, {"layer": node.get("name", "")})
+        node_type = node.get("type")
+        children = node.get("children") or []
+        child_states = [self._vector_only.pop(id(child)) for child in children]
+        if children:
+            shapes_only = node_type in CONTAINER_TYPES | VECTOR_TYPES and all(only for only, _ in child_states)
+            has_path = any(path for _, path in child_states)
+        else:
+            shapes_only = node_type in SHAPE_TYPES
+            has_path = node_type in VECTOR_TYPES
+        shapes_only = shapes_only and not image_refs(node)
+        if node is frame:
+            self._vector_only.clear()
+        else:
+            self._vector_only[id(node)] = (shapes_only, has_path)
+            if shapes_only and has_path:
+                # Part of a larger drawing until a parent that is not a pure vector is reached
+                return
+            if node.get("exportSettings"):
+                # Marked for export by the designer: exported as a whole even if not a pure vector
+                self._add_icon(screen_name, node)
+        for child, (only, path) in zip(children, child_states):
+            if only and path:
+                self._add_icon(screen_name, child)
+
+    def _add_icon(self, screen_name: str, node: Dict[str, Any]):
+        self._use(self.icons, icon_hash(node), screen_name, node, {
+            "layer": node.get("name", ""),
+            "format": export_format(node),
+        })
+
+    @staticmethod
+    def _use(entries: Dict[str, Dict[str, Any]], key: str, screen_name: str, node: Dict[str, Any], first: Dict[str, Any]):
+        entry = entries.get(key)
+        if entry is None:
+            entry = entries[key] = {**first, "node_id": node.get("id"), "screens": [], "occurrences": 0}
+        entry["occurrences"] += 1
+        if screen_name not in entry["screens"]:
+            entry["screens"].append(screen_name)
+
+    def assets(self) -> Dict[str, Dict[str, Dict[str, Any]]]:
+        """{"images": {imageRef: entry}, "icons": {hash: entry}}, each entry with a unique asset "name"."""
+        taken = set()
+        result = {"images": {}, "icons": {}}
+        for kind, entries, fallback in (("icons", self.icons, "icon"), ("images", self.images, "image")):
+            for key, entry in entries.items():
+                name = base = asset_name(entry["layer"], fallback)
+                suffix = 2
+                while name in taken:
+                    name = f"{base}-{suffix}"
+                    suffix += 1
+                taken.add(name)
+                result[kind][key] = {"name": name, **entry}
+        return result
+
+
+def load_assets(summary: Optional[Dict[str, Any]]) -> Dict[str, Dict[str, Dict[str, Any]]]:
+    assets = (summary or {}).get("assets") or {}
+    return {"images": assets.get("images") or {}, "icons": assets.get("icons") or {}}
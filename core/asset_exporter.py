@@ -0,0 +1,340 @@
+import json
+import os
+import shutil
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Any, Dict, List, Optional, Tuple
+
+from core.asset_catalog import RASTER_SCALES, load_assets
+from core.clients import get_figma_download_session
+from core.figma_fetcher import fetch_image_fill_urls, render_node_urls
+from core.output_writer import OutputWriter, content_hash, get_output_writer
+from core.rate_limiter import get_rate_limiter
+from core.retry import RETRY_LIMIT, RetryableHTTPError, call_with_retry
+
+ASSET_CACHE_DIR = os.getenv("ASSET_CACHE_DIR", "./.asset_cache")
+# Image downloads (and render requests) in flight at once
+ASSET_DOWNLOAD_CONCURRENCY = int(os.getenv("ASSET_DOWNLOAD_CONCURRENCY", "8"))
+# Node ids per Figma render request; one request renders the whole batch
+ASSET_EXPORT_BATCH_SIZE = int(os.getenv("ASSET_EXPORT_BATCH_SIZE", "100"))
+CATALOG_DIR = os.path.join("Resources", "Assets.xcassets")
+# Owner of the catalog files in the project's OutputWriter
+ASSET_OWNER = "assets"
+CATALOG_INFO = {"info": {"author": "xcode", "version": 1}}
+VECTOR_FORMATS = {"pdf", "svg"}
+DOWNLOAD_TIMEOUT = 60
+
+MAGIC_EXTENSIONS = ((b"\x89PNG", "png"), (b"\xff\xd8", "jpg"), (b"GIF8", "gif"), (b"%PDF", "pdf"), (b"RIFF", "webp"))
+
+
+def sniff_extension(data: bytes, default: str = "png") -> str:
+    for magic, extension in MAGIC_EXTENSIONS:
+        if data.startswith(magic):
+            return extension
+    return default
+
+
+class AssetCache:
+    """
+    Content-addressed store of downloaded assets shared by every run: files live at
+    <directory>/objects/<sha[:2]>/<sha>.<ext>, and index.json maps each source (an imageRef, or an
+    icon hash with format and scale) to its object, so a source is downloaded once.
+    """
+
+    def __init__(self, directory: str = ASSET_CACHE_DIR, enabled: bool = True):
+        self.directory = directory
+        self.enabled = enabled
+        self.index_path = os.path.join(directory, "index.json")
+        self._index: Dict[str, str] = {}
+        self._lock = threading.Lock()
+        if enabled:
+            try:
+                with open(self.index_path, "r", encoding="utf-8") as f:
+                    self._index = json.load(f)
+            except (OSError, ValueError):
+                self._index = {}
+
+    def _object_path(self, name: str) -> str:
+        return os.path.join(self.directory, "objects", name[:2], name)
+
+    def get(self, source: str) -> Optional[str]:
+        """Path of the cached object for a source, or None."""
+        if not self.enabled:
+            return None
+        with self._lock:
+            name = self._index.get(source)
+        path = self._object_path(name) if name else None
+        return path if path and os.path.exists(path) else None
+
+    def put(self, source: str, data: bytes, extension: str) -> str:
+        name = f"{content_hash(data)}.{extension}"
+        path = self._object_path(name)
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            _atomic_write(path, data)
+        with self._lock:
+            self._index[source] = name
+        return path
+
+    def save(self):
+        """Writes the index, merged with entries saved meanwhile by other exports (e.g. batch jobs)."""
+        if not self.enabled:
+            return
+        os.makedirs(self.directory, exist_ok=True)
+        try:
+            with open(self.index_path, "r", encoding="utf-8") as f:
+                index = json.load(f)
+        except (OSError, ValueError):
+            index = {}
+        with self._lock:
+            index.update(self._index)
+        _atomic_write(self.index_path, json.dumps(index, indent=0, sort_keys=True).encode("utf-8"))
+
+
+def plan_asset_files(assets: Dict[str, Dict[str, Dict[str, Any]]]) -> List[Dict[str, Any]]:
+    """
+    One entry per imageset: {"name", "key", "group", "vector", "files": [{"source", "scale", "kind", "key", "format"}]},
+    the imageset key being the asset's identity (its imageRef or icon hash).
+    Vector icons are a single scalable file; raster exports get 1x, 2x and 3x files.
+    """
+    plan = []
+    for ref, entry in assets["images"].items():
+        plan.append({"name": entry["name"], "key": f"image:{ref}", "group": "Images", "vector": False, "files": [
+            {"source": f"image:{ref}", "scale": None, "kind": "image", "key": ref, "format": None},
+        ]})
+    for icon_hash, entry in assets["icons"].items():
+        fmt = entry.get("format") or "pdf"
+        scales = (None,) if fmt in VECTOR_FORMATS else RASTER_SCALES
+        plan.append({"name": entry["name"], "key": f"icon:{icon_hash}", "group": "Icons", "vector": fmt in VECTOR_FORMATS, "files": [
+            {"source": f"icon:{icon_hash}:{fmt}@{scale or 1}x", "scale": scale, "kind": "render",
+             "key": entry["node_id"], "format": fmt}
+            for scale in scales
+        ]})
+    return plan
+
+
+def export_assets(file_key: str, summary: Dict[str, Any], project_dir: str, manifest_path: Optional[str] = None,
+                  use_cache: bool = True, partial_fetch: bool = False) -> Dict[str, int]:
+    """
+    Exports the summary's image fills and icons into <project_dir>/Resources/Assets.xcassets.
+    Missing sources are resolved with one image-fills request plus one render request per format,
+    scale and ASSET_EXPORT_BATCH_SIZE nodes, then downloaded concurrently into the AssetCache.
+    Unchanged files are not rewritten, and imagesets of assets gone from the design are removed.
+    partial_fetch means the summary only covers some frames (--node-ids): its assets are added to the
+    imagesets of earlier runs, which are kept.
+    """
+    assets = load_assets(summary)
+    previous = load_asset_manifest(manifest_path) if partial_fetch else {"imagesets": {}, "keys": {}}
+    plan = keep_previous_names(plan_asset_files(assets), previous)
+    catalog_dir = os.path.join(project_dir, CATALOG_DIR)
+    writer = get_output_writer(project_dir)
+    cache = AssetCache(enabled=use_cache)
+    stats = {"images": len(assets["images"]), "icons": len(assets["icons"]), "cached": 0, "downloaded": 0,
+             "requests": 0, "failed": 0, "written": 0}
+
+    resolved: Dict[str, str] = {}  # source -> cached object path
+    missing: Dict[str, Dict[str, Any]] = {}
+    for imageset in plan:
+        for file in imageset["files"]:
+            path = cache.get(file["source"])
+            if path:
+                resolved[file["source"]] = path
+                stats["cached"] += 1
+            else:
+                missing.setdefault(file["source"], file)
+
+    if missing:
+        print(f"🖼️  Exporting {len(missing)} asset files ({stats['cached']} cached)...")
+        downloaded, failed, requests_made = download_missing(file_key, list(missing.values()), cache)
+        resolved.update(downloaded)
+        stats["downloaded"], stats["failed"], stats["requests"] = len(downloaded), len(failed), requests_made
+        cache.save()
+
+    current_sets, current_keys = {}, {}  # imageset name -> set dir / asset key
+    for imageset in plan:
+        set_dir = os.path.join(imageset["group"], f"{imageset['name']}.imageset")
+        files = [(file, resolved.get(file["source"])) for file in imageset["files"]]
+        if all(path for _, path in files):
+            stats["written"] += write_imageset(writer, os.path.join(CATALOG_DIR, set_dir), imageset, files)
+        elif not os.path.isdir(os.path.join(catalog_dir, set_dir)):
+            # A failed download keeps the imageset exported by an earlier run, if any
+            continue
+        current_sets[imageset["name"]] = set_dir
+        current_keys[imageset["name"]] = imageset["key"]
+
+    if current_sets:
+        for group in {""} | {os.path.dirname(set_dir) for set_dir in current_sets.values()}:
+            writer.write(os.path.join(CATALOG_DIR, group, "Contents.json"), _contents_json(CATALOG_INFO), ASSET_OWNER)
+    if partial_fetch:
+        current_sets = {**previous["imagesets"], **current_sets}
+        current_keys = {**previous["keys"], **current_keys}
+    prune_imagesets(catalog_dir, manifest_path, current_sets, current_keys)
+    if not plan:
+        return stats
+
+    print(f"🖼️  Assets: {stats['images']} images, {stats['icons']} icons → {catalog_dir} "
+          f"({stats['cached']} cached, {stats['downloaded']} downloaded in {stats['requests']} export requests, "
+          f"{stats['written']} files written" + (f", {stats['failed']} failed)" if stats["failed"] else ")"))
+    return stats
+
+
+def download_missing(file_key: str, files: List[Dict[str, Any]], cache: AssetCache) -> Tuple[Dict[str, str], List[str], int]:
+    """
+    Resolves download URLs for files (image fills in one request, renders batched per format and
+    scale) and downloads them into the cache on a bounded pool; downloads start as soon as the
+    request that produced their URL returns. Returns (source -> path, failed sources, export requests).
+    """
+    lookups = []  # (label, fetch URLs, {key: [files]})
+    image_files = {}
+    render_groups: Dict[Tuple[str, float], Dict[str, List[Dict[str, Any]]]] = {}
+    for file in files:
+        if file["kind"] == "image":
+            image_files.setdefault(file["key"], []).append(file)
+        else:
+            render_groups.setdefault((file["format"], file["scale"] or 1), {}).setdefault(file["key"], []).append(file)
+    if image_files:
+        lookups.append(("image fills", lambda: fetch_image_fill_urls(file_key), image_files))
+    for (fmt, scale), by_node in render_groups.items():
+        node_ids = list(by_node)
+        for start in range(0, len(node_ids), ASSET_EXPORT_BATCH_SIZE):
+            batch = node_ids[start:start + ASSET_EXPORT_BATCH_SIZE]
+            lookups.append((f"{fmt} @{scale}x renders", lambda batch=batch, fmt=fmt, scale=scale: render_node_urls(file_key, batch, fmt, scale),
+                            {node_id: by_node[node_id] for node_id in batch}))
+
+    downloaded, failed = {}, []
+
+    def download(url, file):
+        def request():
+            with get_rate_limiter("figma_download").request(), get_figma_download_session().get(url, timeout=DOWNLOAD_TIMEOUT) as response:
+                if response.status_code == 429 or response.status_code >= 500:
+                    raise RetryableHTTPError(f"Asset download failed: {response.status_code}", response)
+                if response.status_code != 200:
+                    raise Exception(f"Asset download failed: {response.status_code}")
+                return response.content
+        data = call_with_retry(request, f"asset {file['source']}", RETRY_LIMIT)
+        return cache.put(file["source"], data, file["format"] or sniff_extension(data))
+
+    with ThreadPoolExecutor(max_workers=max(1, ASSET_DOWNLOAD_CONCURRENCY)) as pool:
+        url_futures = {pool.submit(call_with_retry, fetch, f"Figma {label}", RETRY_LIMIT): (label, by_key)
+                       for label, fetch, by_key in lookups}
+        download_futures = {}
+        for future in as_completed(url_futures):
+            label, by_key = url_futures[future]
+            try:
+                urls = future.result()
+            except Exception as err:
+                print(f"❌ Figma {label}: {err}")
+                failed.extend(file["source"] for files in by_key.values() for file in files)
+                continue
+            for key, key_files in by_key.items():
+                url = urls.get(key)
+                for file in key_files:
+                    if not url:
+                        print(f"⚠️ No download URL from Figma for {file['source']}")
+                        failed.append(file["source"])
+                        continue
+                    download_futures[pool.submit(download, url, file)] = file
+        for future in as_completed(download_futures):
+            file = download_futures[future]
+            try:
+                downloaded[file["source"]] = future.result()
+            except Exception as err:
+                print(f"❌ {file['source']}: {err}")
+                failed.append(file["source"])
+    return downloaded, failed, len(lookups)
+
+
+def write_imageset(writer: OutputWriter, set_dir: str, imageset: Dict[str, Any], files: List[Tuple[Dict[str, Any], str]]) -> int:
+    """
+    Writes one imageset (files copied from the cache plus Contents.json) at set_dir, relative to the
+    writer's output directory; returns the files written.
+    """
+    written, images = 0, []
+    for file, cached_path in files:
+        extension = os.path.splitext(cached_path)[1]
+        scale = file["scale"]
+        filename = f"{imageset['name']}{f'@{scale}x' if scale and scale > 1 else ''}{extension}"
+        with open(cached_path, "rb") as f:
+            written += writer.write(os.path.join(set_dir, filename), f.read(), ASSET_OWNER) == "written"
+        image = {"idiom": "universal", "filename": filename}
+        if scale:
+            image["scale"] = f"{scale}x"
+        images.append(image)
+    contents = {"images": images, **CATALOG_INFO}
+    if imageset["vector"]:
+        contents["properties"] = {"preserves-vector-representation": True}
+    written += writer.write(os.path.join(set_dir, "Contents.json"), _contents_json(contents), ASSET_OWNER) == "written"
+    set_path = os.path.join(writer.output_dir, set_dir)
+    for name in os.listdir(set_path):
+        # Files of a previous export in another format or scale
+        if name != "Contents.json" and name not in {image["filename"] for image in images}:
+            os.remove(os.path.join(set_path, name))
+    return written
+
+
+def load_asset_manifest(manifest_path: Optional[str]) -> Dict[str, Dict[str, str]]:
+    """{"imagesets": {name: set dir}, "keys": {name: asset key}} recorded by the last export."""
+    try:
+        with open(manifest_path, "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+    except (OSError, TypeError, ValueError):
+        manifest = {}
+    return {"imagesets": manifest.get("imagesets") or {}, "keys": manifest.get("keys") or {}}
+
+
+def keep_previous_names(plan: List[Dict[str, Any]], previous: Dict[str, Dict[str, str]]) -> List[Dict[str, Any]]:
+    """
+    Renames planned imagesets so assets exported by an earlier run keep their imageset and new
+    assets do not take the name of one (only matters when previous imagesets are kept).
+    """
+    if not previous["imagesets"]:
+        return plan
+    names_by_key = {key: name for name, key in previous["keys"].items()}
+    known = [imageset for imageset in plan if imageset["key"] in names_by_key]
+    taken = set(previous["imagesets"])
+    for imageset in known:
+        imageset["name"] = names_by_key[imageset["key"]]
+        taken.add(imageset["name"])
+    for imageset in plan:
+        if imageset["key"] in names_by_key:
+            continue
+        name, suffix = imageset["name"], 2
+        while name in taken:
+            name = f"{imageset['name']}-{suffix}"
+            suffix += 1
+        imageset["name"] = name
+        taken.add(name)
+    return plan
+
+
+def prune_imagesets(catalog_dir: str, manifest_path: Optional[str], current: Dict[str, str], keys: Optional[Dict[str, str]] = None):
+    """Removes the imagesets exported last time whose assets are gone, then records the current ones."""
+    if not manifest_path:
+        return
+    previous = load_asset_manifest(manifest_path)["imagesets"]
+    removed = 0
+    for name, set_dir in previous.items():
+        if current.get(name) != set_dir and os.path.isdir(os.path.join(catalog_dir, set_dir)):
+            shutil.rmtree(os.path.join(catalog_dir, set_dir))
+            removed += 1
+    if removed:
+        print(f"🗑️  Removed {removed} imagesets of assets no longer in the design.")
+    os.makedirs(os.path.dirname(os.path.abspath(manifest_path)), exist_ok=True)
+    _atomic_write(manifest_path, json.dumps({"imagesets": current, "keys": keys or {}}, indent=2, sort_keys=True).encode("utf-8"))
+
+
+def _contents_json(contents: Dict[str, Any]) -> bytes:
+    return (json.dumps(contents, indent=2) + "\n").encode("utf-8")
+
+
+def _atomic_write(path: str, data: bytes):
+    """Temp file plus rename for the cache and the manifest, which live outside the project."""
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(path)), prefix=".", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.remove(tmp_path)
+        raise
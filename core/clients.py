@@ -0,0 +1,76 @@
+import os
+import threading
+
+# SDKs are imported on first use so stages that never call a provider (fetch, analyze)
+# start without loading them
+_clients = {}
+_clients_lock = threading.Lock()
+
+
+def _get_client(name, build):
+    with _clients_lock:
+        if name not in _clients:
+            _clients[name] = build()
+        return _clients[name]
+
+
+def get_openai_client():
+    """
+    Process-wide OpenAI client, built on first use and reused by every stage and thread. The SDK's
+    own retries are off: core.retry.call_with_retry is the only retry layer.
+    """
+    def build():
+        from openai import OpenAI
+        return OpenAI(api_key=os.getenv("OPENAI_API_KEY"), max_retries=0)
+    return _get_client("openai", build)
+
+
+def get_anthropic_client():
+    """Process-wide Anthropic client, built on first use and reused by every stage and thread (no SDK retries)."""
+    def build():
+        import anthropic
+        return anthropic.Anthropic(max_retries=0)
+    return _get_client("anthropic", build)
+
+
+def get_ollama_session():
+    """Process-wide requests session for the Ollama server, keeping connections alive across calls and threads."""
+    def build():
+        import requests
+        from requests.adapters import HTTPAdapter
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=16)
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
+        return session
+    return _get_client("ollama", build)
+
+
+def get_figma_session():
+    """Process-wide, connection-pooled session carrying the Figma token and gzip negotiation."""
+    def build():
+        import requests
+        from requests.adapters import HTTPAdapter
+        access_token = os.getenv("FIGMA_ACCESS_TOKEN")
+        if not access_token:
+            raise Exception("❌ FIGMA_ACCESS_TOKEN not set in environment!")
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=16)
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+        session.headers.update({"X-Figma-Token": access_token, "Accept-Encoding": "gzip"})
+        return session
+    return _get_client("figma", build)
+
+
+def get_figma_download_session():
+    """Process-wide, connection-pooled session for image URLs returned by Figma (no Figma token sent)."""
+    def build():
+        import requests
+        from requests.adapters import HTTPAdapter
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=32)
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+        return session
+    return _get_client("figma_download", build)
@@ -0,0 +1,137 @@
+import os
+import re
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from core.figma_index import shape_fingerprint, walk_nodes, walk_post_order
+
+# A subtree becomes a shared component once it appears in this many screens
+COMPONENT_MIN_SCREENS = int(os.getenv("COMPONENT_MIN_SCREENS", "2"))
+# Plain containers need at least this many nodes to count as a component; instances always count
+COMPONENT_MIN_NODES = 3
+CANDIDATE_TYPES = {"INSTANCE", "COMPONENT", "FRAME", "GROUP"}
+
+
+
+def subtree_fingerprints(root: Dict[str, Any]) -> Iterator[Tuple[Dict[str, Any], str, int]]:
+    """
+    Yields (node, fingerprint, node_count) for every node under root (root included), bottom-up.
+    The fingerprint is a structural hash that ignores ids, geometry and text content, so copies of
+    the same header or button match even when placed or labelled differently. Instances hash their
+    componentId with the rest of their properties, so variants with a different structure split.
+    """
+    results = {}
+    for node in walk_post_order(root):
+        child_results = [results.pop(id(child)) for child in node.get("children") or []]
+        fingerprint = shape_fingerprint(node, [child_fingerprint for child_fingerprint, _ in child_results])
+        node_count = 1 + sum(child_count for _, child_count in child_results)
+        results[id(node)] = (fingerprint, node_count)
+        yield node, fingerprint, node_count
+
+
+def is_candidate(node: Dict[str, Any], node_count: int) -> bool:
+    node_type = node.get("type")
+    return node_type == "INSTANCE" or (node_type in CANDIDATE_TYPES and node_count >= COMPONENT_MIN_NODES)
+
+
+def type_name_for(layer_name: str) -> str:
+    """UIKit view type name for a Figma layer, e.g. "primary button" -> "PrimaryButtonView"."""
+    words = re.findall(r"[A-Za-z0-9]+", layer_name or "")
+    name = "".join(word[:1].upper() + word[1:] for word in words) or "Component"
+    if name[0].isdigit():
+        name = "Component" + name
+    return name if name.endswith("View") else name + "View"
+
+
+class ComponentCatalog:
+    """
+    Counts structurally identical subtrees across the frames of a document. Subtrees found in at
+    least COMPONENT_MIN_SCREENS screens are shared components: they are specified and generated
+    once, and screens reference them by type name.
+    """
+
+    def __init__(self, min_screens: int = COMPONENT_MIN_SCREENS):
+        self.min_screens = min_screens
+        self.candidates: Dict[str, Dict[str, Any]] = {}  # fingerprint -> first occurrence and usage, in document order
+
+    def add_frame(self, screen_name: str, frame: Dict[str, Any]):
+        visit = self.visitor(screen_name, frame)
+        for node, fingerprint, node_count in subtree_fingerprints(frame):
+            visit(node, fingerprint, node_count)
+
+    def visitor(self, screen_name: str, frame: Dict[str, Any]):
+        """Per-node callback for FigmaIndex.add_frame, which computes the fingerprints in its own walk."""
+        return lambda node, fingerprint, node_count: self._add_node(screen_name, frame, node, fingerprint, node_count)
+
+    def _add_node(self, screen_name: str, frame: Dict[str, Any], node: Dict[str, Any], fingerprint: str, node_count: int):
+        if node is frame or not is_candidate(node, node_count):
+            return
+        entry = self.candidates.get(fingerprint)
+        if entry is None:
+            entry = self.candidates[fingerprint] = {
+                "layer": node.get("name", ""),
+                "type": node.get("type"),
+                "component_id": node.get("componentId"),
+                "node_id": node.get("id"),
+                "node_count": node_count,
+                "screens": [],
+                "occurrences": 0,
+            }
+        entry["occurrences"] += 1
+        if screen_name not in entry["screens"]:
+            entry["screens"].append(screen_name)
+
+    def shared(self) -> Dict[str, Dict[str, Any]]:
+        """fingerprint -> {"name" (view type), "layer", "type", "component_id", "node_id", "node_count", "screens", "occurrences"}."""
+        shared, taken = {}, set()
+        for fingerprint, entry in self.candidates.items():
+            if len(entry["screens"]) < self.min_screens:
+                continue
+            name = base = type_name_for(entry["layer"])
+            suffix = 2
+            while name in taken:
+                name = f"{base[:-4]}{suffix}View"
+                suffix += 1
+            taken.add(name)
+            shared[fingerprint] = {"name": name, **entry}
+        return shared
+
+
+def with_component_refs(root: Dict[str, Any], shared: Dict[str, str], max_texts: int = 5) -> Dict[str, Any]:
+    """
+    Plain-dict copy of root in which every shared subtree below it (fingerprint -> view type name)
+    is replaced by a COMPONENT_REF stub carrying the layer name, the view type and its texts.
+    """
+    if not shared:
+        return root.to_dict() if hasattr(root, "to_dict") else root
+    fingerprints = {id(node): fingerprint for node, fingerprint, _ in subtree_fingerprints(root)}
+    copy = {}
+    stack = [(root, copy)]
+    while stack:
+        node, out = stack.pop()
+        fingerprint = fingerprints[id(node)]
+        if node is not root and fingerprint in shared:
+            texts = [child.get("characters") for child, _ in walk_nodes(node) if child.get("characters")]
+            out.update({"name": node.get("name"), "type": "COMPONENT_REF", "component": shared[fingerprint]})
+            if texts:
+                out["texts"] = texts[:max_texts]
+            continue
+        out.update((key, value) for key, value in node.items() if key != "children")
+        children = node.get("children")
+        if children is not None:
+            out["children"] = [{} for _ in children]
+            stack.extend(zip(children, out["children"]))
+    return copy
+
+
+def components_by_screen(shared_components: List[Dict[str, Any]]) -> Dict[str, List[Dict[str, Any]]]:
+    """screen name -> shared components it uses, from the json_spec's shared_components list."""
+    by_screen: Dict[str, List[Dict[str, Any]]] = {}
+    for component in shared_components or []:
+        for screen in component.get("screens", []):
+            by_screen.setdefault(screen, []).append(component)
+    return by_screen
+
+
+def load_shared_components(summary: Optional[Dict[str, Any]]) -> Dict[str, str]:
+    """fingerprint -> view type name from the analyzer summary."""
+    return {fingerprint: entry["name"] for fingerprint, entry in ((summary or {}).get("shared_components") or {}).items()}
@@ -1,98 +1,179 @@
 import json
 import os
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Iterator, Optional, Tuple
+
+from core.asset_catalog import AssetCatalog
+from core.component_catalog import ComponentCatalog
+from core.figma_index import FigmaIndex, walk_nodes, node_colors, node_font
+
+try:
+    import ijson
+except ImportError:  # pragma: no cover - streaming is an optimization, not a requirement
+    ijson = None
+
+PAGE_PREFIX = "document.children.item"
+NODE_PREFIX = "document.children.item.children.item"
 
 def load_figma_json(filepath: str) -> Dict[str, Any]:
     with open(filepath, 'r', encoding='utf-8') as f:
         return json.load(f)
 
+def iter_page_nodes(filepath: str) -> Iterator[Tuple[Dict[str, Any], Dict[str, Any]]]:
+    """
+    Yields (page_info, node) for every top-level node of every page, where page_info holds
+    the page "name" and "type". With ijson installed the document is parsed incrementally,
+    so peak memory is bounded by the largest top-level node rather than the whole file.
+    """
+    if ijson is None:
+        yield from iter_json_page_nodes(load_figma_json(filepath))
+        return
+
+    with open(filepath, "rb") as f:
+        page_info = {}
+        pending = []  # nodes seen before the page's name/type keys (unusual key order)
+        builder = None
+        for prefix, event, value in ijson.parse(f, use_float=True):
+            if builder is not None:
+                builder.event(event, value)
+                if prefix == NODE_PREFIX and event == "end_map":
+                    node, builder = builder.value, None
+                    if "name" in page_info and "type" in page_info:
+                        yield page_info, node
+                    else:
+                        pending.append(node)
+                continue
+
+            if prefix == NODE_PREFIX and event == "start_map":
+                builder = ijson.ObjectBuilder()
+                builder.event(event, value)
+            elif prefix == PAGE_PREFIX and event == "start_map":
+                page_info, pending = {}, []
+            elif prefix in (f"{PAGE_PREFIX}.name", f"{PAGE_PREFIX}.type") and event == "string":
+                page_info[prefix.rsplit(".", 1)[1]] = value
+            elif prefix == PAGE_PREFIX and event == "end_map":
+                for node in pending:
+                    yield page_info, node
+                pending = []
+
+def iter_frames(filepath: str, page_name: str = None) -> Iterator[Tuple[str, Dict[str, Any]]]:
+    """Yields (page_name, frame) for FRAME nodes on CANVAS pages, optionally restricted to one page."""
+    for page_info, node in iter_page_nodes(filepath):
+        name = (page_info.get("name") or "").strip()
+        if page_info.get("type") != "CANVAS" or node.get("type") != "FRAME":
+            continue
+        if page_name is not None and name != page_name:
+            continue
+        yield page_info.get("name"), node
+
 def extract_pages(json_data: Dict[str, Any]) -> List[Dict[str, Any]]:
     return json_data.get("document", {}).get("children", [])
 
 def extract_colors(node: Dict[str, Any]) -> set:
-    colors = set()
-    for child in node.get("children", []):
-        fills = child.get("fills", [])
-        for fill in fills:
-            if fill.get("type") == "SOLID":
-                color = fill.get("color")
-                if color:
-                    hex_color = rgba_to_hex(color)
-                    colors.add(hex_color)
-    return colors
-
-def rgba_to_hex(rgba: Dict[str, float]) -> str:
-    r = int(rgba.get("r", 0) * 255)
-    g = int(rgba.get("g", 0) * 255)
-    b = int(rgba.get("b", 0) * 255)
-    return '#{:02X}{:02X}{:02X}'.format(r, g, b)
+    return {color for child, _ in walk_nodes(node) for color in node_colors(child)}
 
 def extract_fonts(node: Dict[str, Any]) -> set:
-    fonts = set()
-    for child in node.get("children", []):
-        if child.get("type") == "TEXT":
-            style = child.get("style", {})
-            family = style.get("fontFamily")
-            size = style.get("fontSize")
-            if family and size:
-                fonts.add(f"{family} {int(size)}pt")
-    return fonts
-
-def analyze_figma_json(json_data: Dict[str, Any]) -> Dict[str, Any]:
-    pages = extract_pages(json_data)
+    return {font for font in (node_font(child) for child, _ in walk_nodes(node)) if font}
+
+def iter_json_page_nodes(json_data: Dict[str, Any]) -> Iterator[Tuple[Dict[str, Any], Dict[str, Any]]]:
+    for page in extract_pages(json_data):
+        page_info = {"name": page.get("name"), "type": page.get("type")}
+        for node in page.get("children", []):
+            yield page_info, node
+
+def analyze_page_nodes(page_nodes: Iterator[Tuple[Dict[str, Any], Dict[str, Any]]], index: Optional[FigmaIndex] = None) -> Dict[str, Any]:
+    """
+    Builds the summary for every CANVAS page from (page_info, node) pairs. Each FRAME is walked
+    once, by the index (colors, fonts, components, lookups, frame stats and hash); the component
+    catalog, which finds the subtrees shared across screens, and the asset catalog, which collects
+    the image fills and icons to export, are fed from that walk.
+    """
+    index = index if index is not None else FigmaIndex()
+    catalog = ComponentCatalog()
+    asset_catalog = AssetCatalog()
     summary = {
         "pages": {}
     }
     seen_screens = set()
-
-    if not pages:
-        print("❌ No pages found in Figma file.")
-        return summary
-
-    # Since you have only 1 screen page, use the first one
-    design_page = pages[0]
-    page_name = design_page.get("name", "UnnamedPage").strip()
-
-    if design_page.get("type") != "CANVAS":
-        print(f"⚠️ Skipping non-canvas page: {page_name}")
-        return summary
-
+    skipped_pages = set()
     screens = []
-    for node in design_page.get("children", []):
+
+    for page_info, node in page_nodes:
+        page_name = (page_info.get("name") or "UnnamedPage").strip()
+        if page_info.get("type") != "CANVAS":
+            if page_name not in skipped_pages:
+                skipped_pages.add(page_name)
+                print(f"⚠️ Skipping non-canvas page: {page_name}")
+            continue
         if node.get("type") != "FRAME":
             continue
 
-        screen_name = node.get("name", "Unnamed Frame").strip()
-        width = node.get("absoluteBoundingBox", {}).get("width")
-        height = node.get("absoluteBoundingBox", {}).get("height")
-        size = f"{int(width)}x{int(height)}" if width and height else "Unknown"
-
-        components = [child.get("name", "Unnamed") for child in node.get("children", [])]
-        colors = extract_colors(node)
-        fonts = extract_fonts(node)
-
-        screen_info = {
-            "name": screen_name,
-            "size": size,
-            "components": components,
-            "colors": list(colors),
-            "fonts": list(fonts)
-        }
-
+        screen_name = screen_name_of(node)
         screen_key = f"{page_name}-{screen_name}"
-        if screen_key not in seen_screens:
+        duplicate = screen_key in seen_screens
+        visitors = () if duplicate else (catalog.visitor(screen_name, node), asset_catalog.visitor(screen_name, node))
+        screen_info = summarize_frame(node, index.add_frame(page_name, node, visitors))
+        if not duplicate:
             seen_screens.add(screen_key)
+            summary["pages"].setdefault(page_name, {"screens": []})["screens"].append(screen_info)
             screens.append(screen_info)
 
-    summary["pages"][page_name] = {"screens": screens}
+    if not summary["pages"] and not skipped_pages:
+        print("❌ No pages found in Figma file.")
+        return summary
+
+    summary["design"] = index.summary()
+    shared = catalog.shared()
+    summary["shared_components"] = shared
+    for screen_info in screens:
+        screen_info["shared_components"] = [entry["name"] for entry in shared.values() if screen_info["name"] in entry["screens"]]
+    if shared:
+        occurrences = sum(entry["occurrences"] for entry in shared.values())
+        print(f"🧩 Found {len(shared)} shared components ({occurrences} occurrences across screens).")
+    summary["assets"] = asset_catalog.assets()
+    if summary["assets"]["images"] or summary["assets"]["icons"]:
+        occurrences = sum(entry["occurrences"] for entries in summary["assets"].values() for entry in entries.values())
+        print(f"🖼️  Found {len(summary['assets']['images'])} images and {len(summary['assets']['icons'])} icons to export ({occurrences} occurrences).")
     return summary
 
+def analyze_figma_json(json_data: Dict[str, Any], index: Optional[FigmaIndex] = None) -> Dict[str, Any]:
+    return analyze_page_nodes(iter_json_page_nodes(json_data), index)
+
+def analyze_document(document, index: Optional[FigmaIndex] = None) -> Dict[str, Any]:
+    """Analyzes an already parsed FigmaDocument (see core.figma_document) without touching the file."""
+    return analyze_page_nodes(document.iter_page_nodes(), index)
+
+def analyze_figma_file(filepath: str, index: Optional[FigmaIndex] = None) -> Dict[str, Any]:
+    """Streaming counterpart of analyze_figma_json: same summary, one frame in memory at a time."""
+    return analyze_page_nodes(iter_page_nodes(filepath), index)
+
+def screen_name_of(node: Dict[str, Any]) -> str:
+    return node.get("name", "Unnamed Frame").strip()
+
+def summarize_frame(node: Dict[str, Any], stats: Dict[str, Any]) -> Dict[str, Any]:
+    screen_name = screen_name_of(node)
+    width = node.get("absoluteBoundingBox", {}).get("width")
+    height = node.get("absoluteBoundingBox", {}).get("height")
+    size = f"{int(width)}x{int(height)}" if width and height else "Unknown"
+
+    components = [child.get("name", "Unnamed") for child in node.get("children", [])]
+
+    return {
+        "id": node.get("id"),
+        "name": screen_name,
+        "hash": stats["hash"],
+        "size": size,
+        "components": components,
+        "colors": sorted(stats["colors"]),
+        "fonts": sorted(stats["fonts"]),
+        "stats": {key: stats[key] for key in ("node_count", "max_depth", "text_count", "instance_count")}
+    }
+
 def save_summary(summary: Dict[str, Any], out_path: str):
     with open(out_path, 'w', encoding='utf-8') as f:
         json.dump(summary, f, indent=2)
 
-def analyze_and_save(input_path: str, output_path: str):
-    json_data = load_figma_json(input_path)
-    summary = analyze_figma_json(json_data)
+def analyze_and_save(input_path: str, output_path: str, document=None) -> Dict[str, Any]:
+    summary = analyze_document(document) if document is not None else analyze_figma_file(input_path)
     save_summary(summary, output_path)
-    print(f"✅ Summary written to: {output_path}")
\ No newline at end of file
+    print(f"✅ Summary written to: {output_path}")
+    return summary
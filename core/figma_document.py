@@ -0,0 +1,283 @@
+import hashlib
+import json
+import os
+import pickle
+import sys
+import tempfile
+from collections.abc import Mapping
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+CACHE_FORMAT = 2
+# Reuse a binary snapshot of the parsed document next to the Figma JSON when the JSON is unchanged
+FIGMA_DOC_CACHE = os.getenv("FIGMA_DOC_CACHE", "1") != "0"
+# Files above this size are parsed incrementally: json.load peaks at ~6x the file size, the
+# incremental parser at the largest frame plus the compact document, but is about 2x slower
+FIGMA_STREAM_PARSE_MB = float(os.getenv("FIGMA_STREAM_PARSE_MB", "16"))
+# Short strings (types, style names, enum values) repeat across nodes and are interned
+INTERN_MAX_LENGTH = 40
+# Style properties that repeat verbatim across nodes; only these are pooled, other dicts (bounding
+# boxes, transforms) are mostly unique and not worth keying
+SHARED_KEYS = frozenset({"fills", "strokes", "effects", "style", "constraints", "background", "exportSettings"})
+
+# Key layout -> {key: slot}; nodes of the same kind share one layout, so each node only
+# stores a tuple of values instead of its own dict
+_shapes: Dict[Tuple[str, ...], Dict[str, int]] = {}
+
+
+def _shape_for(keys: Tuple[str, ...]) -> Dict[str, int]:
+    shape = _shapes.get(keys)
+    if shape is None:
+        shape = _shapes.setdefault(keys, {key: i for i, key in enumerate(keys)})
+    return shape
+
+
+class FigmaNode(Mapping):
+    """
+    Read-only, compact Figma node. Behaves like the node's JSON dict (get, [], in, items), so
+    walkers, hashing and prompt compaction work on it unchanged, but stores its properties as a
+    values tuple against a shared key layout and its children as a tuple.
+    """
+
+    __slots__ = ("_shape", "_values", "children")
+
+    def __init__(self, shape: Dict[str, int], values: tuple, children: Optional[tuple] = None):
+        self._shape = shape
+        self._values = values
+        self.children = children
+
+    @classmethod
+    def from_props(cls, props: Dict[str, Any], pool: Optional[Dict[str, Any]] = None) -> "FigmaNode":
+        keys = tuple(key for key in props if key != "children")
+        if pool is None:
+            return cls(_shape_for(keys), tuple(props[key] for key in keys))
+        return cls(_shape_for(keys), tuple(_share(key, props[key], pool) for key in keys))
+
+    def __getitem__(self, key):
+        if key == "children":
+            if self.children is None:
+                raise KeyError(key)
+            return self.children
+        return self._values[self._shape[key]]
+
+    def get(self, key, default=None):
+        if key == "children":
+            return default if self.children is None else self.children
+        slot = self._shape.get(key)
+        return default if slot is None else self._values[slot]
+
+    def __contains__(self, key):
+        return key in self._shape if key != "children" else self.children is not None
+
+    def __iter__(self):
+        yield from self._shape
+        if self.children is not None:
+            yield "children"
+
+    def __len__(self):
+        return len(self._shape) + (self.children is not None)
+
+    def __repr__(self):
+        return f"FigmaNode(id={self.get('id')!r}, name={self.get('name')!r}, type={self.get('type')!r})"
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Plain JSON-compatible copy of the subtree (iterative)."""
+        root = {}
+        stack = [(self, root)]
+        while stack:
+            node, out = stack.pop()
+            out.update(zip(node._shape, node._values))
+            if node.children is not None:
+                out["children"] = [{} for _ in node.children]
+                stack.extend(zip(node.children, out["children"]))
+        return root
+
+
+class FigmaDocument:
+    """
+    The parsed Figma file, shared in-process by analyze and spec instead of each stage re-reading
+    the JSON. pages holds the page nodes (name, type and their top-level nodes); nodes indexes
+    every node by id.
+
+    Nested property values (fills, styles, constraints) are shared between nodes that have equal
+    values, so they must be treated as read-only.
+    """
+
+    def __init__(self, pages: List[FigmaNode], nodes: Dict[str, FigmaNode]):
+        self.pages = pages
+        self.nodes = nodes
+
+    @classmethod
+    def from_page_nodes(cls, page_nodes: Iterator[Tuple[Dict[str, Any], Dict[str, Any]]]) -> "FigmaDocument":
+        """Builds the document from (page_info, node) pairs, converting one top-level node at a time."""
+        pages, nodes, pool = [], {}, {}
+        current_info = None
+        for page_info, node in page_nodes:
+            if page_info is not current_info:
+                current_info = page_info
+                pages.append(FigmaNode.from_props({"name": page_info.get("name"), "type": page_info.get("type")}))
+                pages[-1].children = []
+            pages[-1].children.append(_compact_tree(node, nodes, pool))
+        for page in pages:
+            page.children = tuple(page.children)
+        return cls(pages, nodes)
+
+    @classmethod
+    def from_json(cls, json_data: Dict[str, Any]) -> "FigmaDocument":
+        """Builds the document from a loaded Figma JSON, releasing each top-level node once converted."""
+        def page_nodes():
+            for page in json_data.get("document", {}).get("children", []):
+                page_info = {"name": page.get("name"), "type": page.get("type")}
+                children = page.get("children", [])
+                for i, node in enumerate(children):
+                    children[i] = None
+                    yield page_info, node
+        return cls.from_page_nodes(page_nodes())
+
+    @classmethod
+    def load(cls, json_path: str, use_cache: bool = FIGMA_DOC_CACHE) -> "FigmaDocument":
+        """Parses the Figma JSON once, or restores the binary cache written for the same JSON."""
+        from core.figma_analyzer import iter_page_nodes
+
+        cache_path = cache_path_for(json_path)
+        if use_cache:
+            document = cls.load_cache(cache_path, json_path)
+            if document is not None:
+                print(f"⚡ Loaded parsed Figma document from cache: {cache_path}")
+                return document
+        document = None
+        if os.path.getsize(json_path) <= FIGMA_STREAM_PARSE_MB * 1024 * 1024:
+            try:
+                with open(json_path, "r", encoding="utf-8") as f:
+                    document = cls.from_json(json.load(f))
+            except RecursionError:
+                # json.load recurses per nesting level; the streaming parser does not
+                document = None
+        if document is None:
+            document = cls.from_page_nodes(iter_page_nodes(json_path))
+        if use_cache:
+            document.save_cache(cache_path, json_path)
+        return document
+
+    def iter_page_nodes(self) -> Iterator[Tuple[Dict[str, Any], FigmaNode]]:
+        """Same (page_info, node) pairs as figma_analyzer.iter_page_nodes, without re-reading the file."""
+        for page in self.pages:
+            page_info = {"name": page.get("name"), "type": page.get("type")}
+            for node in page.children:
+                yield page_info, node
+
+    def iter_frames(self, page_name: str = None) -> Iterator[Tuple[str, FigmaNode]]:
+        """Yields (page_name, frame) for FRAME nodes on CANVAS pages, optionally restricted to one page."""
+        for page in self.pages:
+            name = page.get("name")
+            if page.get("type") != "CANVAS" or (page_name is not None and (name or "").strip() != page_name):
+                continue
+            for node in page.children:
+                if node.get("type") == "FRAME":
+                    yield name, node
+
+    def get(self, node_id: str) -> Optional[FigmaNode]:
+        return self.nodes.get(node_id)
+
+    def save_cache(self, cache_path: str, json_path: str):
+        """
+        Writes a pickle of the document flattened in pre-order (layout id, values, child count per
+        node), so deep trees never hit the recursion limit. Tied to the JSON's size and content hash.
+        """
+        shape_ids, shapes, flat = {}, [], []
+        stack = list(reversed(self.pages))
+        while stack:
+            node = stack.pop()
+            shape_id = shape_ids.get(id(node._shape))
+            if shape_id is None:
+                shape_id = shape_ids[id(node._shape)] = len(shapes)
+                shapes.append(tuple(node._shape))
+            flat.append((shape_id, node._values, -1 if node.children is None else len(node.children)))
+            if node.children:
+                stack.extend(reversed(node.children))
+        payload = {
+            "format": CACHE_FORMAT,
+            "source": _source_stamp(json_path),
+            "pages": len(self.pages),
+            "shapes": shapes,
+            "nodes": flat,
+        }
+        directory = os.path.dirname(os.path.abspath(cache_path))
+        fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+        with os.fdopen(fd, "wb") as f:
+            pickle.dump(payload, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, cache_path)
+
+    @classmethod
+    def load_cache(cls, cache_path: str, json_path: str) -> Optional["FigmaDocument"]:
+        """Returns the cached document, or None when the cache is missing, stale or unreadable."""
+        try:
+            with open(cache_path, "rb") as f:
+                payload = pickle.load(f)
+        except (OSError, pickle.UnpicklingError, EOFError, AttributeError, ValueError):
+            return None
+        if payload.get("format") != CACHE_FORMAT or payload.get("source") != _source_stamp(json_path):
+            return None
+
+        shapes = [_shape_for(keys) for keys in payload["shapes"]]
+        pages, nodes, with_children = [], {}, []
+        # Each stack entry is a parent's child list and how many children it still expects
+        stack = [(pages, payload["pages"])]
+        for shape_id, values, child_count in payload["nodes"]:
+            siblings, remaining = stack.pop()
+            if remaining > 1:
+                stack.append((siblings, remaining - 1))
+            node = FigmaNode(shapes[shape_id], values)
+            siblings.append(node)
+            if node.get("id"):
+                nodes[node["id"]] = node
+            if child_count >= 0:
+                node.children = []
+                with_children.append(node)
+                if child_count:
+                    stack.append((node.children, child_count))
+        for node in with_children:
+            node.children = tuple(node.children)
+        return cls(pages, nodes)
+
+
+def _share(key: str, value: Any, pool: Dict[str, Any]) -> Any:
+    """Returns a shared instance of value: interned for short strings, pooled by repr for style properties."""
+    if isinstance(value, str):
+        return sys.intern(value) if len(value) <= INTERN_MAX_LENGTH else value
+    if key in SHARED_KEYS and value:
+        return pool.setdefault(repr(value), value)
+    return value
+
+
+def _compact_tree(root: Dict[str, Any], index: Dict[str, FigmaNode], pool: Dict[str, Any]) -> FigmaNode:
+    """Converts a JSON node tree into FigmaNodes iteratively, registering every id in index."""
+    converted = []
+    with_children = []
+    stack = [(root, converted)]
+    while stack:
+        data, siblings = stack.pop()
+        node = FigmaNode.from_props(data, pool)
+        siblings.append(node)
+        if data.get("id"):
+            index[data["id"]] = node
+        children = data.get("children")
+        if children is not None:
+            node.children = []
+            with_children.append(node)
+            stack.extend((child, node.children) for child in reversed(children))
+    for node in with_children:
+        node.children = tuple(node.children)
+    return converted[0]
+
+
+def _source_stamp(json_path: str) -> List[Any]:
+    """Size and sha256 of the JSON: fetch re-copies an unchanged version over it, so the mtime is no key."""
+    h = hashlib.sha256()
+    with open(json_path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    return [os.path.getsize(json_path), h.hexdigest()]
+
+
+def cache_path_for(json_path: str) -> str:
+    return os.path.splitext(json_path)[0] + ".doc.pickle"
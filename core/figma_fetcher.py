@@ -1,24 +1,146 @@
 import requests
+import hashlib
 import json
 import os
+import shutil
+import tempfile
+from typing import Any, Dict, List, Optional
 
 from dotenv import load_dotenv
+from core.clients import get_figma_session
+from core.rate_limiter import get_rate_limiter
+from core.retry import RetryableHTTPError
 load_dotenv()
 
-def download_figma_file(file_key: str, output_path: str):
-    access_token = os.getenv("FIGMA_ACCESS_TOKEN")
-    if not access_token:
-        raise Exception("❌ FIGMA_ACCESS_TOKEN not set in environment!")
+CHUNK_SIZE = 1 << 16
+FIGMA_API_BASE = os.getenv("FIGMA_API_BASE", "https://api.figma.com").rstrip("/")
+FIGMA_CACHE_DIR = os.getenv("FIGMA_CACHE_DIR", "./.figma_cache")
 
-    headers = {"X-Figma-Token": access_token}
-    url = f"https://api.figma.com/v1/files/{file_key}"
+def figma_get(path: str, **kwargs) -> requests.Response:
+    """GET on the Figma API within the process-wide FIGMA_MAX_IN_FLIGHT / FIGMA_REQUESTS_PER_MINUTE limits."""
+    with get_rate_limiter("figma").request():
+        return get_figma_session().get(f"{FIGMA_API_BASE}{path}", **kwargs)
 
-    print(f"🌐 Fetching Figma file: {file_key}")
-    response = requests.get(url, headers=headers)
+def _check_images_response(response, what: str):
+    if response.status_code == 429 or response.status_code >= 500:
+        raise RetryableHTTPError(f"Figma {what} failed: {response.status_code}", response)
+    if response.status_code != 200:
+        raise Exception(f"❌ Failed to fetch {what}: {response.status_code}\n{response.text}")
+
+def fetch_image_fill_urls(file_key: str) -> Dict[str, str]:
+    """imageRef -> download URL for every bitmap image fill in the file (a single request)."""
+    response = figma_get(f"/v1/files/{file_key}/images")
+    _check_images_response(response, "image fills")
+    return response.json().get("meta", {}).get("images") or {}
+
+def render_node_urls(file_key: str, node_ids: List[str], fmt: str = "pdf", scale: float = 1) -> Dict[str, Optional[str]]:
+    """Renders node_ids in one request; node id -> download URL, None for nodes Figma could not render."""
+    params = {"ids": ",".join(node_ids), "format": fmt, "scale": scale}
+    response = figma_get(f"/v1/images/{file_key}", params=params)
+    _check_images_response(response, f"{fmt} renders")
+    data = response.json()
+    if data.get("err"):
+        raise Exception(f"❌ Figma could not render {len(node_ids)} nodes: {data['err']}")
+    return data.get("images") or {}
 
+def fetch_file_meta(file_key: str, depth: int = 1) -> Dict[str, Any]:
+    """Cheap shallow request returning version, lastModified and the top levels of the document tree."""
+    response = figma_get(f"/v1/files/{file_key}", params={"depth": depth})
     if response.status_code != 200:
         raise Exception(f"❌ Failed to fetch: {response.status_code}\n{response.text}")
+    return response.json()
+
+def cache_path_for(file_key: str, version: str, node_ids: Optional[List[str]] = None, depth: Optional[int] = None) -> str:
+    name = str(version)
+    if node_ids:
+        selector = json.dumps({"ids": sorted(node_ids), "depth": depth}, sort_keys=True)
+        name += "-nodes-" + hashlib.sha256(selector.encode("utf-8")).hexdigest()[:16]
+    elif depth:
+        name += f"-depth{depth}"
+    return os.path.join(FIGMA_CACHE_DIR, file_key, f"{name}.json")
+
+def download_figma_file(file_key: str, output_path: str, node_ids: Optional[List[str]] = None, depth: Optional[int] = None, use_cache: bool = True):
+    """
+    Downloads the Figma file (or only node_ids, via the nodes endpoint) to output_path.
+    Downloads are cached per file version, so an unchanged file costs a single shallow request.
+    """
+    print(f"🌐 Fetching Figma file: {file_key}")
+    # Partial fetches need the page -> top-level frame layout to rebuild a document around the nodes
+    meta = fetch_file_meta(file_key, depth=2 if node_ids else 1)
+    version = meta.get("version") or meta.get("lastModified")
+    cache_path = cache_path_for(file_key, version, node_ids, depth) if version else None
+
+    if use_cache and cache_path and os.path.exists(cache_path):
+        shutil.copyfile(cache_path, output_path)
+        print(f"✅ Figma file unchanged (version {version}), reused cached copy: {output_path}")
+        return
+
+    if node_ids:
+        download_figma_nodes(file_key, node_ids, depth, meta, output_path)
+    else:
+        params = {"depth": depth} if depth else None
+        # The slot is held while the body streams to disk
+        with get_rate_limiter("figma").request():
+            with get_figma_session().get(f"{FIGMA_API_BASE}/v1/files/{file_key}", params=params, stream=True) as response:
+                if response.status_code != 200:
+                    raise Exception(f"❌ Failed to fetch: {response.status_code}\n{response.text}")
+                stream_to_file(response, output_path)
+
+    if cache_path:
+        os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+        shutil.copyfile(output_path, cache_path)
+    print(f"✅ Figma file saved to: {output_path}")
+
+def download_figma_nodes(file_key: str, node_ids: List[str], depth: Optional[int], meta: Dict[str, Any], output_path: str):
+    """Fetches only node_ids and writes them as a regular file document, grouped under their pages."""
+    params = {"ids": ",".join(node_ids)}
+    if depth:
+        params["depth"] = depth
+    response = figma_get(f"/v1/files/{file_key}/nodes", params=params)
+    if response.status_code != 200:
+        raise Exception(f"❌ Failed to fetch nodes: {response.status_code}\n{response.text}")
+    nodes = response.json().get("nodes", {})
+
+    pages = []
+    placed = set()
+    for page in meta.get("document", {}).get("children", []):
+        page_copy = {key: value for key, value in page.items() if key != "children"}
+        if page.get("id") in nodes:
+            # A whole page was requested
+            page_copy["children"] = (nodes[page["id"]] or {}).get("document", {}).get("children", [])
+            placed.add(page["id"])
+        else:
+            page_copy["children"] = []
+            for child in page.get("children", []):
+                if nodes.get(child.get("id")):
+                    page_copy["children"].append(nodes[child["id"]]["document"])
+                    placed.add(child["id"])
+        if page_copy["children"]:
+            pages.append(page_copy)
+
+    missing = [node_id for node_id in node_ids if node_id not in placed]
+    if missing:
+        print(f"⚠️ Nodes not found or not top-level frames: {', '.join(missing)}")
+
+    document = {key: value for key, value in meta.items() if key != "document"}
+    document["document"] = {**{k: v for k, v in meta.get("document", {}).items() if k != "children"}, "children": pages}
+
+    directory = os.path.dirname(os.path.abspath(output_path))
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    with os.fdopen(fd, "w", encoding="utf-8") as f:
+        json.dump(document, f, ensure_ascii=False, separators=(",", ":"))
+    os.replace(tmp_path, output_path)
 
-    with open(output_path, "w", encoding="utf-8") as f:
-        json.dump(response.json(), f, indent=2)
-    print(f"✅ Figma file saved to: {output_path}")
\ No newline at end of file
+def stream_to_file(response, output_path: str):
+    """Writes the response body to disk chunk by chunk (no parse/re-serialize), replacing the target atomically."""
+    directory = os.path.dirname(os.path.abspath(output_path))
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            for chunk in response.iter_content(chunk_size=CHUNK_SIZE):
+                if chunk:
+                    f.write(chunk)
+        os.replace(tmp_path, output_path)
+    except BaseException:
+        os.remove(tmp_path)
+        raise
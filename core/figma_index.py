@@ -0,0 +1,178 @@
+import hashlib
+import json
+from collections import Counter
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+# Properties that differ between copies of the same component (ids, position, text content)
+SHAPE_IGNORED_KEYS = {
+    "id", "absoluteBoundingBox", "absoluteRenderBounds", "relativeTransform", "size", "characters",
+    "characterStyleOverrides", "styleOverrideTable", "fillGeometry", "strokeGeometry",
+    "transitionNodeID", "pluginData", "sharedPluginData", "children",
+}
+
+
+def rgba_to_hex(rgba: Dict[str, float]) -> str:
+    r = int(rgba.get("r", 0) * 255)
+    g = int(rgba.get("g", 0) * 255)
+    b = int(rgba.get("b", 0) * 255)
+    return '#{:02X}{:02X}{:02X}'.format(r, g, b)
+
+
+def walk_nodes(root: Dict[str, Any]) -> Iterator[Tuple[Dict[str, Any], int]]:
+    """Iterative pre-order walk yielding (node, depth); safe for arbitrarily deep trees."""
+    stack = [(root, 0)]
+    while stack:
+        node, depth = stack.pop()
+        yield node, depth
+        children = node.get("children")
+        if children:
+            for child in reversed(children):
+                stack.append((child, depth + 1))
+
+
+def walk_post_order(root: Dict[str, Any]) -> Iterator[Dict[str, Any]]:
+    """Iterative post-order walk: every node after its children, siblings in document order."""
+    stack = [(root, False)]
+    while stack:
+        node, children_done = stack.pop()
+        children = node.get("children")
+        if not children_done and children:
+            stack.append((node, True))
+            stack.extend((child, False) for child in reversed(children))
+            continue
+        yield node
+
+
+def _canonical_json(value: Dict[str, Any]) -> bytes:
+    return json.dumps(value, sort_keys=True, ensure_ascii=False, separators=(",", ":"), default=dict).encode("utf-8")
+
+
+def merkle_digest(node: Dict[str, Any], child_digests: Iterable[str]) -> str:
+    """Hash of a node's own properties and its children's digests (see frame_manifest.frame_hash)."""
+    h = hashlib.sha256(_canonical_json({key: value for key, value in node.items() if key != "children"}))
+    for digest in child_digests:
+        h.update(digest.encode("ascii"))
+    return h.hexdigest()
+
+
+def shape_fingerprint(node: Dict[str, Any], child_fingerprints: Iterable[str]) -> str:
+    """Structural hash of a node and its children's fingerprints, without SHAPE_IGNORED_KEYS."""
+    own = {key: value for key, value in node.items() if key not in SHAPE_IGNORED_KEYS}
+    if node.get("type") == "TEXT":
+        # Text layers are named after their content by default
+        own.pop("name", None)
+    h = hashlib.sha256(_canonical_json(own))
+    for fingerprint in child_fingerprints:
+        h.update(fingerprint.encode("ascii"))
+    return h.hexdigest()[:16]
+
+
+def node_colors(node: Dict[str, Any]) -> List[str]:
+    return [
+        rgba_to_hex(fill["color"])
+        for fill in node.get("fills", []) or []
+        if fill.get("type") == "SOLID" and fill.get("color")
+    ]
+
+
+def node_font(node: Dict[str, Any]) -> Optional[str]:
+    if node.get("type") != "TEXT":
+        return None
+    style = node.get("style", {})
+    family = style.get("fontFamily")
+    size = style.get("fontSize")
+    if family and size:
+        return f"{family} {int(size)}pt"
+    return None
+
+
+class FigmaIndex:
+    """
+    Collects everything the pipeline needs from the document in a single pass over each frame:
+    colors, fonts, component definitions and usages, node-id lookups, per-frame stats and
+    the frame's Merkle hash. Subtree fingerprints computed on the way are handed to visitors (the
+    component and asset catalogs), so they do not walk the frame again.
+    """
+
+    def __init__(self):
+        self.colors = set()
+        self.fonts = set()
+        self.components: Dict[str, str] = {}          # component id -> name (COMPONENT / COMPONENT_SET)
+        self.component_usage: Counter = Counter()     # component id -> INSTANCE count
+        self.nodes: Dict[str, Tuple[str, str, str]] = {}  # node id -> (name, type, frame id)
+        self.frames: Dict[str, Dict[str, Any]] = {}   # frame id -> stats, in document order
+
+    def add_frame(self, page_name: str, frame: Dict[str, Any],
+                  visitors: Iterable[Callable[[Dict[str, Any], str, int], None]] = ()) -> Dict[str, Any]:
+        """
+        Indexes one frame and returns its stats, including its "hash". Each visitor is called for
+        every node, children first, as visitor(node, structural fingerprint, subtree node count).
+        """
+        frame_id = frame.get("id")
+        colors, fonts = set(), set()
+        node_count = text_count = instance_count = max_depth = 0
+        visitors = list(visitors)
+        finished = {}  # id(node) -> (digest, fingerprint, node count) until its parent consumes it
+
+        stack = [(frame, 0, False)]
+        while stack:
+            node, depth, children_done = stack.pop()
+            children = node.get("children") or []
+            if children_done:
+                results = [finished.pop(id(child)) for child in children]
+                digests, fingerprints, counts = zip(*results) if results else ((), (), ())
+                fingerprint, count = shape_fingerprint(node, fingerprints), 1 + sum(counts)
+                finished[id(node)] = (merkle_digest(node, digests), fingerprint, count)
+                for visit in visitors:
+                    visit(node, fingerprint, count)
+                continue
+            stack.append((node, depth, True))
+            stack.extend((child, depth + 1, False) for child in reversed(children))
+
+            node_count += 1
+            max_depth = max(max_depth, depth)
+            node_id = node.get("id")
+            node_type = node.get("type")
+            name = node.get("name", "")
+            if node_id:
+                self.nodes[node_id] = (name, node_type, frame_id)
+
+            colors.update(node_colors(node))
+            font = node_font(node)
+            if font:
+                fonts.add(font)
+                text_count += 1
+            if node_type in ("COMPONENT", "COMPONENT_SET") and node_id:
+                self.components[node_id] = name
+            elif node_type == "INSTANCE":
+                instance_count += 1
+                if node.get("componentId"):
+                    self.component_usage[node["componentId"]] += 1
+
+        self.colors.update(colors)
+        self.fonts.update(fonts)
+        stats = {
+            "page": page_name,
+            "name": frame.get("name", ""),
+            "colors": colors,
+            "fonts": fonts,
+            "node_count": node_count,
+            "max_depth": max_depth,
+            "text_count": text_count,
+            "instance_count": instance_count,
+            "hash": finished[id(frame)][0],
+        }
+        if frame_id:
+            self.frames[frame_id] = stats
+        return stats
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            "colors": sorted(self.colors),
+            "fonts": sorted(self.fonts),
+            "components": {
+                component_id: {"name": self.components.get(component_id, component_id), "instances": count}
+                for component_id, count in self.component_usage.most_common()
+            },
+            "node_count": len(self.nodes),
+        }
@@ -0,0 +1,93 @@
+import json
+import os
+import re
+import tempfile
+from typing import Any, Dict, Optional
+
+from core.figma_index import merkle_digest, walk_post_order
+
+MANIFEST_VERSION = 1
+
+
+def frame_hash(node: Dict[str, Any]) -> str:
+    """
+    Stable structural hash of a FRAME subtree (key order and whitespace independent).
+    Computed bottom-up as a Merkle hash with an explicit stack, so deep trees never hit the recursion limit.
+    The analyzer gets the same hash from FigmaIndex.add_frame, which computes it during its walk.
+    """
+    digests = {}
+    for current in walk_post_order(node):
+        digests[id(current)] = merkle_digest(current, [digests.pop(id(child)) for child in current.get("children") or []])
+    return digests[id(node)]
+
+
+def empty_manifest() -> Dict[str, Any]:
+    return {"version": MANIFEST_VERSION, "frames": {}, "screens": {}}
+
+
+def load_manifest(path: Optional[str]) -> Dict[str, Any]:
+    """
+    Loads the manifest written by the previous run:
+    frames:  frame id -> {"name", "hash", "spec"}
+    screens: screen or shared component name -> {"hash", "content", "files"}
+    """
+    if not path or not os.path.exists(path):
+        return empty_manifest()
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        print(f"⚠️ Ignoring unreadable manifest: {path}")
+        return empty_manifest()
+    if manifest.get("version") != MANIFEST_VERSION:
+        return empty_manifest()
+    manifest.setdefault("frames", {})
+    manifest.setdefault("screens", {})
+    return manifest
+
+
+def save_manifest(manifest: Dict[str, Any], path: Optional[str]):
+    if not path:
+        return
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    with os.fdopen(fd, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2, ensure_ascii=False)
+    os.replace(tmp_path, path)
+
+
+def normalize_name(name: str) -> str:
+    return re.sub(r"[^a-z0-9]", "", name.lower())
+
+
+def match_screen_hashes(screen_names, frame_hashes: Dict[str, str]) -> Dict[str, str]:
+    """
+    Maps codegen screen names (as produced by the JSON spec) to frame hashes by name.
+    Exact normalized matches win; otherwise a unique containment match is accepted.
+    Unmatched screens are omitted and will always be regenerated.
+    """
+    normalized = {normalize_name(name): h for name, h in frame_hashes.items()}
+    matched = {}
+    for screen_name in screen_names:
+        key = normalize_name(screen_name)
+        if not key:
+            continue
+        if key in normalized:
+            matched[screen_name] = normalized[key]
+            continue
+        candidates = [h for frame_key, h in normalized.items() if frame_key and (key in frame_key or frame_key in key)]
+        if len(candidates) == 1:
+            matched[screen_name] = candidates[0]
+    return matched
+
+
+def invalidate_manifest(path: Optional[str]):
+    """Forces a full regeneration: drops stored hashes but keeps file lists so deleted screens are still pruned."""
+    if not path or not os.path.exists(path):
+        return
+    manifest = load_manifest(path)
+    manifest["frames"] = {}
+    for entry in manifest["screens"].values():
+        entry["hash"] = None
+    save_manifest(manifest, path)
@@ -0,0 +1,181 @@
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+from typing import Any, Callable, Optional
+
+from core.telemetry import get_tracer
+
+CACHE_MODES = ("use", "refresh", "bypass")
+
+
+class LLMCache:
+    """
+    Content-addressed on-disk cache for LLM completions.
+
+    Entries live at <directory>/<sha[:2]>/<sha>.json. Reads bump the file mtime,
+    so eviction by oldest mtime gives LRU order once the size cap is exceeded.
+    mode: "use" reads and writes, "refresh" only writes, "bypass" skips the cache entirely.
+    """
+
+    def __init__(self, directory: str, max_bytes: int = 512 * 1024 * 1024, ttl: Optional[float] = None, mode: str = "use"):
+        if mode not in CACHE_MODES:
+            raise ValueError(f"Unknown cache mode: {mode}")
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.ttl = ttl or None
+        self.mode = mode
+        self.hits = 0
+        self.misses = 0
+        self._size = None
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def make_key(provider: str, model: str, temperature: float, prompt: Any) -> str:
+        material = json.dumps(
+            {"provider": provider, "model": model, "temperature": temperature, "prompt": prompt},
+            sort_keys=True, ensure_ascii=False, separators=(",", ":"),
+        )
+        return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, key[:2], f"{key}.json")
+
+    def get(self, key: str) -> Optional[str]:
+        if self.mode != "use":
+            return None
+        path = self._path(key)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if self.ttl and time.time() - entry.get("created", 0) > self.ttl:
+            self._remove(path)
+            return None
+        try:
+            os.utime(path, None)
+        except OSError:
+            pass
+        return entry.get("response")
+
+    def put(self, key: str, response: str, **metadata):
+        if self.mode == "bypass":
+            return
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        data = json.dumps({"created": time.time(), "response": response, **metadata}, ensure_ascii=False).encode("utf-8")
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+        with self._lock:
+            if self._size is not None:
+                self._size += len(data)
+        self._evict_if_needed()
+
+    def _remove(self, path: str):
+        try:
+            size = os.path.getsize(path)
+            os.remove(path)
+        except OSError:
+            return
+        with self._lock:
+            if self._size is not None:
+                self._size -= size
+
+    def _entries(self):
+        entries = []
+        if not os.path.isdir(self.directory):
+            return entries
+        for shard in os.listdir(self.directory):
+            shard_dir = os.path.join(self.directory, shard)
+            if not os.path.isdir(shard_dir):
+                continue
+            for name in os.listdir(shard_dir):
+                if not name.endswith(".json"):
+                    continue
+                path = os.path.join(shard_dir, name)
+                try:
+                    st = os.stat(path)
+                except OSError:
+                    continue
+                entries.append((st.st_mtime, st.st_size, path))
+        return entries
+
+    def _evict_if_needed(self):
+        if not self.max_bytes:
+            return
+        with self._lock:
+            if self._size is None:
+                self._size = sum(size for _, size, _ in self._entries())
+            if self._size <= self.max_bytes:
+                return
+            entries = sorted(self._entries())
+            total = sum(size for _, size, _ in entries)
+            for _, size, path in entries:
+                if total <= self.max_bytes:
+                    break
+                try:
+                    os.remove(path)
+                    total -= size
+                except OSError:
+                    pass
+            self._size = total
+
+    def cached_completion(self, provider: str, model: str, temperature: float, prompt: Any, compute: Callable[[], str],
+                          validate: Optional[Callable[[str], bool]] = None) -> str:
+        """
+        Returns a cached completion for the request, calling compute() and storing the result on a miss.
+        With validate, only replies it accepts are stored, and a stored reply it rejects counts as a miss.
+        """
+        key = self.make_key(provider, model, temperature, prompt)
+        with get_tracer().llm_call(provider, model) as call:
+            cached = self.get(key)
+            if cached is not None and validate is not None and not validate(cached):
+                cached = None
+            if cached is not None:
+                call["cache"] = "hit"
+                with self._lock:
+                    self.hits += 1
+                return cached
+            call["cache"] = "miss" if self.mode == "use" else self.mode
+            with self._lock:
+                self.misses += 1
+            response = compute()
+        if response and (validate is None or validate(response)):
+            self.put(key, response, provider=provider, model=model)
+        return response
+
+    def stats(self) -> dict:
+        return {"hits": self.hits, "misses": self.misses, "mode": self.mode}
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def configure_llm_cache(mode: Optional[str] = None, directory: Optional[str] = None) -> LLMCache:
+    """(Re)creates the shared cache from LLM_CACHE_* environment variables and explicit overrides."""
+    global _cache
+    with _cache_lock:
+        _cache = LLMCache(
+            directory=directory or os.getenv("LLM_CACHE_DIR", "./.llm_cache"),
+            max_bytes=int(float(os.getenv("LLM_CACHE_MAX_MB", "512")) * 1024 * 1024),
+            ttl=float(os.getenv("LLM_CACHE_TTL", "0")) or None,
+            mode=mode or os.getenv("LLM_CACHE_MODE", "use"),
+        )
+        return _cache
+
+
+def get_llm_cache() -> LLMCache:
+    with _cache_lock:
+        cache = _cache
+    return cache or configure_llm_cache()
+
+
+def cached_completion(provider: str, model: str, temperature: float, prompt: Any, compute: Callable[[], str],
+                      validate: Optional[Callable[[str], bool]] = None) -> str:
+    return get_llm_cache().cached_completion(provider, model, temperature, prompt, compute, validate)
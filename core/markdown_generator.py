@@ -1,19 +1,46 @@
 import json
 import os
-import requests
 import time
-import openai
+from collections import deque
+from functools import partial
+from concurrent.futures import ThreadPoolExecutor
+from core.clients import get_ollama_session, get_openai_client
+from core.component_catalog import load_shared_components, with_component_refs
 from core.figma_analyzer import load_figma_json
+from core.figma_document import FigmaDocument
+from core.rate_limiter import get_rate_limiter, estimate_tokens
+from core.frame_manifest import load_manifest, save_manifest
+from core.llm_cache import cached_completion
+from core.node_compactor import compact_frame
+from core.provider_router import ProviderRouter, check_cancelled, record_latency
+from core.run_journal import RunJournal
+from core.spec_builder import FRAME_SPEC_SCHEMA, build_json_spec, parse_frame_spec, save_json_spec
+from core.telemetry import get_tracer
+from core.retry import call_with_retry, RetryableHTTPError, RETRY_LIMIT
 
 from dotenv import load_dotenv
 load_dotenv()
 
-openai.api_key = os.getenv("OPENAI_API_KEY")
-
-OLLAMA_URL = 'http://localhost:11434/api/generate'
+OLLAMA_URL = os.getenv("OLLAMA_URL", 'http://localhost:11434/api/generate')
 MODEL = 'llama3'
-MAX_CONTEXT_LENGTH = 12000
-RETRY_LIMIT = 3
+OPENAI_SPEC_MODEL = "gpt-4o"
+# Prompt budget for a single frame's JSON (roughly the old 12,000-character cut-off)
+SPEC_TOKEN_BUDGET = int(os.getenv("SPEC_TOKEN_BUDGET", "3000"))
+SPEC_MAX_CONCURRENCY = int(os.getenv("SPEC_MAX_CONCURRENCY", "4"))
+SPEC_EXPECTED_COMPLETION_TOKENS = 1500
+# Prompt budget for one shared component's definition handed to code generation
+COMPONENT_TOKEN_BUDGET = 800
+# Ask for a FRAME_SPEC_SCHEMA object (Markdown plus components and services) so the codegen JSON
+# spec can be built without another LLM call; disable for models without structured output
+SPEC_STRUCTURED_OUTPUT = os.getenv("SPEC_STRUCTURED_OUTPUT", "1") != "0"
+# Providers the spec step routes frames to, preferred first (see core.provider_router)
+SPEC_PROVIDERS = [name.strip() for name in os.getenv("SPEC_PROVIDERS", "openai").split(",") if name.strip()]
+# Also send a frame to the next provider once the first is slower than its p95 latency
+SPEC_HEDGE = os.getenv("SPEC_HEDGE", "0") != "0"
+# Hedge delay (seconds) until a provider has enough latency samples for a p95
+SPEC_HEDGE_DELAY = float(os.getenv("SPEC_HEDGE_DELAY", "20"))
+# Seconds a spec provider that failed is passed over while another one is available
+SPEC_PROVIDER_COOLDOWN = float(os.getenv("SPEC_PROVIDER_COOLDOWN", "30"))
 
 PROMPT_TEMPLATE = """
 You are a senior product designer and business analyst. Your job is to write a single, professional, consolidated Markdown specification for mobile engineers and business stakeholders, based on a full set of Figma screen frames exported as JSON.
@@ -90,106 +117,313 @@ You are a senior product designer and business analyst. Your job is to write a s
 **Now, using the provided Figma JSON, generate the full Markdown specification in this format.**
 """
 
-def call_ollama(screen_name, screen_data):
-    raw_json = json.dumps(screen_data, indent=2, ensure_ascii=False)
-    if len(raw_json) > MAX_CONTEXT_LENGTH:
-        raw_json = raw_json[:MAX_CONTEXT_LENGTH]
+COMPACT_JSON_NOTE = 'The Figma JSON is compacted: style values like "$s0" refer to entries in the top-level "styles" table, and a "summary" field describes a collapsed subtree.'
+
+STRUCTURED_OUTPUT_NOTE = 'Respond with a JSON object: "markdown" holds the Markdown specification above, "components" lists the names of the screen\'s UI components (no status bar or system UI), and "services" lists the app services the screen needs (e.g. "AuthService").'
+
+COMPONENT_REF_NOTE = 'Nodes of type "COMPONENT_REF" are shared components specified once for the whole app; list them by their "component" name and do not describe their contents.'
 
+def build_spec_prompt(screen_name, raw_json):
+    note = f"{COMPACT_JSON_NOTE} {COMPONENT_REF_NOTE}" if '"COMPONENT_REF"' in raw_json else COMPACT_JSON_NOTE
+    prompt = f"{PROMPT_TEMPLATE}\n\nScreen Name: {screen_name}\n\n{note}\n\nFigma JSON:\n{raw_json}"
+    return f"{prompt}\n\n{STRUCTURED_OUTPUT_NOTE}" if SPEC_STRUCTURED_OUTPUT else prompt
+
+def compact_for_prompt(screen_name, screen_data):
+    raw_json, stats = compact_frame(screen_data, SPEC_TOKEN_BUDGET)
+    note = f", subtrees below depth {stats['depth_limit']} summarized" if stats["depth_limit"] is not None else ""
+    print(f"🗜️  {screen_name}: {stats['original_tokens']} → {stats['compact_tokens']} tokens (saved {stats['saved_tokens']}{note})")
+    return raw_json
+
+def ollama_spec_completion(prompt, retry=True):
+    """Spec completion from the local Ollama model; retry=False makes a single attempt (the router retries)."""
     payload = {
         "model": MODEL,
-        "prompt": f"{PROMPT_TEMPLATE}\n\nScreen Name: {screen_name}\n\nFigma JSON:\n{raw_json}",
+        "prompt": prompt,
         "stream": True,
         "temperature": 0.2,
         "max_tokens": 4000
     }
-
-    for attempt in range(RETRY_LIMIT):
-        try:
-            response = requests.post(OLLAMA_URL, json=payload, stream=True)
-            if response.status_code != 200:
-                raise Exception(f"Unexpected response status: {response.status_code} - {response.text}")
-            markdown_output = ""
-            for line in response.iter_lines():
-                if line:
-                    data = json.loads(line.decode("utf-8"))
-                    chunk = data.get("response", "")
-                    markdown_output += chunk
+    if SPEC_STRUCTURED_OUTPUT:
+        payload["format"] = FRAME_SPEC_SCHEMA
+
+    def request():
+        check_cancelled()
+        with get_rate_limiter("ollama").request(estimate_tokens(payload["prompt"]) + SPEC_EXPECTED_COMPLETION_TOKENS):
+            check_cancelled()
+            start = time.perf_counter()
+            with get_ollama_session().post(OLLAMA_URL, json=payload, stream=True) as response:
+                if response.status_code == 429 or response.status_code >= 500:
+                    raise RetryableHTTPError(f"Unexpected response status: {response.status_code} - {response.text}", response)
+                if response.status_code != 200:
+                    raise Exception(f"Unexpected response status: {response.status_code} - {response.text}")
+                markdown_output = ""
+                for line in response.iter_lines():
+                    # Leaving the with block closes the stream, so a cancelled hedge stops generating
+                    check_cancelled()
+                    if line:
+                        data = json.loads(line.decode("utf-8"))
+                        chunk = data.get("response", "")
+                        markdown_output += chunk
+                        if data.get("done"):
+                            get_tracer().record_usage(data.get("prompt_eval_count"), data.get("eval_count"))
+                            if data.get("done_reason") == "length":
+                                raise ValueError("Reply cut off at the completion token limit")
+            record_latency("ollama", time.perf_counter() - start)
             return markdown_output
-        except Exception as e:
-            print(f"⚠️ Error calling Ollama (attempt {attempt+1}/{RETRY_LIMIT}): {type(e).__name__} - {e}")
-            time.sleep(2)
-    raise RuntimeError("❌ Failed to connect to Ollama model after multiple attempts. Please ensure the Ollama server is running and accessible.")
 
-def call_openai(screen_name, screen_data):
-    raw_json = json.dumps(screen_data, indent=2, ensure_ascii=False)
-    if len(raw_json) > MAX_CONTEXT_LENGTH:
-        raw_json = raw_json[:MAX_CONTEXT_LENGTH]
-
-    prompt = f"{PROMPT_TEMPLATE}\n\nScreen Name: {screen_name}\n\nFigma JSON:\n{raw_json}"
-
-    for attempt in range(RETRY_LIMIT):
-        try:
-            response = openai.chat.completions.create(
-                model="gpt-4o",
-                messages=[
-                    {"role": "system", "content": "You are a senior product designer and business analyst. Your job is to write a single, professional, consolidated Markdown specification for mobile engineers and business stakeholders, based on a full set of Figma screen frames exported as JSON."},
-                    {"role": "user", "content": prompt}
-                ],
+    return cached_completion("ollama", MODEL, payload["temperature"], payload["prompt"], lambda: call_with_retry(
+        request, "Ollama", RETRY_LIMIT,
+        "❌ Failed to connect to Ollama model after multiple attempts. Please ensure the Ollama server is running and accessible."
+    ) if retry else request(), usable_spec_reply)
+
+def openai_spec_completion(prompt, retry=True):
+    """Spec completion from OpenAI; retry as in ollama_spec_completion."""
+    messages = [
+        {"role": "system", "content": "You are a senior product designer and business analyst. Your job is to write a single, professional, consolidated Markdown specification for mobile engineers and business stakeholders, based on a full set of Figma screen frames exported as JSON."},
+        {"role": "user", "content": prompt}
+    ]
+
+    options = {}
+    if SPEC_STRUCTURED_OUTPUT:
+        options["response_format"] = {
+            "type": "json_schema",
+            "json_schema": {"name": "frame_spec", "strict": True, "schema": FRAME_SPEC_SCHEMA},
+        }
+
+    def request():
+        check_cancelled()
+        with get_rate_limiter("openai").request(estimate_tokens(prompt) + SPEC_EXPECTED_COMPLETION_TOKENS):
+            check_cancelled()
+            start = time.perf_counter()
+            response = get_openai_client().chat.completions.create(
+                model=OPENAI_SPEC_MODEL,
+                messages=messages,
                 temperature=0.2,
                 max_tokens=4000,
-                stream=False
+                stream=False,
+                **options
             )
+            if response.usage:
+                get_tracer().record_usage(response.usage.prompt_tokens, response.usage.completion_tokens)
+            record_latency("openai", time.perf_counter() - start)
+            if response.choices[0].finish_reason == "length":
+                # A truncated reply is not valid JSON (or is a cut-off Markdown spec); not worth retrying as is
+                raise ValueError("Reply cut off at the completion token limit")
             return response.choices[0].message.content
-        except Exception as e:
-            print(f"⚠️ Error calling OpenAI (attempt {attempt+1}/{RETRY_LIMIT}): {type(e).__name__} - {e}")
-            time.sleep(2)
-    raise RuntimeError("❌ Failed to connect to OpenAI model after multiple attempts. Please ensure your API key is valid and you have network access.")
 
-def generate_spec(summary_path, figma_path, markdown_path):
-    print("🛠 Generating Markdown spec from Figma summary...")
-
-    # Load summary
-    summary = load_figma_json(summary_path)
-    valid_screens = set()
+    return cached_completion("openai", OPENAI_SPEC_MODEL, 0.2, messages, lambda: call_with_retry(
+        request, "OpenAI", RETRY_LIMIT,
+        "❌ Failed to connect to OpenAI model after multiple attempts. Please ensure your API key is valid and you have network access."
+    ) if retry else request(), usable_spec_reply)
 
-    # Dynamically select the first design page
-    page_names = list(summary.get("pages", {}).keys())
-    if not page_names:
-        print("❌ No valid pages found in summary report.")
-        return
+SPEC_COMPLETIONS = {"ollama": ollama_spec_completion, "openai": openai_spec_completion}
 
-    selected_page_name = page_names[0]
-    page_data = summary["pages"].get(selected_page_name)
+def call_ollama(screen_name, screen_data):
+    return ollama_spec_completion(build_spec_prompt(screen_name, compact_for_prompt(screen_name, screen_data)))
 
-    if not page_data:
-        print(f"❌ Page '{selected_page_name}' not found in summary.")
-        return
+def call_openai(screen_name, screen_data):
+    return openai_spec_completion(build_spec_prompt(screen_name, compact_for_prompt(screen_name, screen_data)))
+
+def usable_spec_reply(reply):
+    # With structured output a reply that does not parse is only kept when no provider does better
+    return bool(reply) and (not SPEC_STRUCTURED_OUTPUT or parse_frame_spec(reply)[1] is not None)
+
+_spec_router = None
+
+def get_spec_router():
+    """Process-wide router over SPEC_PROVIDERS, shared by every frame so latency stats accumulate."""
+    global _spec_router
+    if _spec_router is None:
+        unknown = [name for name in SPEC_PROVIDERS if name not in SPEC_COMPLETIONS]
+        if unknown:
+            raise ValueError(f"❌ Unknown SPEC_PROVIDERS entries: {', '.join(unknown)} (expected {', '.join(SPEC_COMPLETIONS)})")
+        # Providers make one attempt each; the router retries and fails over
+        _spec_router = ProviderRouter(
+            {name: partial(SPEC_COMPLETIONS[name], retry=False) for name in SPEC_PROVIDERS or ["openai"]},
+            hedge=SPEC_HEDGE, hedge_delay=SPEC_HEDGE_DELAY, accept=usable_spec_reply,
+            max_workers=2 * SPEC_MAX_CONCURRENCY, retry_limit=RETRY_LIMIT, failure_cooldown=SPEC_PROVIDER_COOLDOWN,
+        )
+    return _spec_router
+
+def call_routed(screen_name, screen_data):
+    """Compacts the frame once and lets the spec router pick the provider (and hedge) for it."""
+    prompt = build_spec_prompt(screen_name, compact_for_prompt(screen_name, screen_data))
+    return get_spec_router().complete(prompt, screen_name)
+
+def generate_frame_specs(frames, call_model=call_routed, max_workers=None):
+    """
+    Runs the spec call for (key, page_name, node) frames concurrently and yields (key, markdown),
+    with markdown None for frames that failed. Frames are pulled from the iterable lazily and at most
+    2 * max_workers are held at once, so a streamed document never has to be fully in memory.
+    """
+    max_workers = max(1, max_workers or SPEC_MAX_CONCURRENCY)
+
+    def run(page_name, node):
+        screen_name = f"{page_name} - {node['name']}"
+        print(f"🔄 Processing {screen_name}...")
+        tracer = get_tracer()
+        with tracer.context(screen=screen_name), tracer.span(f"spec: {screen_name}", category="frame"):
+            return call_model(screen_name, node)
 
-    for screen in page_data.get("screens", []):
-        if screen.get("name"):
-            valid_screens.add(screen["name"])
+    def collect(key, label, future):
+        try:
+            return key, future.result()
+        except Exception as err:
+            print(f"❌ {label}: {err}")
+            return key, None
+
+    in_flight = deque()
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        for key, page_name, node in frames:
+            in_flight.append((key, f"{page_name} - {node['name']}", executor.submit(run, page_name, node)))
+            if len(in_flight) >= 2 * max_workers:
+                yield collect(*in_flight.popleft())
+        while in_flight:
+            yield collect(*in_flight.popleft())
+
+def describe_shared_components(summary, document):
+    """
+    Returns the summary's shared components in document order, each with a compact JSON definition
+    of its first occurrence (nested shared components stay references).
+    """
+    shared = load_shared_components(summary)
+    components = []
+    for fingerprint, entry in (summary.get("shared_components") or {}).items():
+        node = document.get(entry.get("node_id")) if entry.get("node_id") else None
+        definition = None
+        if node is not None:
+            definition, _ = compact_frame(with_component_refs(node, shared), COMPONENT_TOKEN_BUDGET)
+        components.append({
+            "name": entry["name"],
+            "layer": entry.get("layer"),
+            "hash": fingerprint,
+            "screens": entry.get("screens", []),
+            "occurrences": entry.get("occurrences", 0),
+            "definition": definition,
+        })
+    return components
+
+def shared_components_markdown(components):
+    lines = [
+        "## 🧩 Shared Components",
+        "",
+        "| Component | Figma Layer | Used In | Occurrences |",
+        "|-----------|-------------|---------|-------------|",
+    ]
+    for component in components:
+        lines.append(f"| {component['name']} | {component['layer']} | {', '.join(component['screens'])} | {component['occurrences']} |")
+    return "\n".join(lines)
+
+def generate_spec(summary_path, figma_path, markdown_path, manifest_path=None, journal_path=None, document=None, summary=None, json_spec_path=None,
+                  partial_fetch=False):
+    """
+    Writes the Markdown spec for the frames listed in the summary and, with json_spec_path, the
+    codegen JSON spec built from the summary and each frame's structured reply. document (a
+    FigmaDocument) and summary can be passed in by the previous stage to avoid re-reading
+    figma_path and summary_path. Returns the names of the frames whose spec failed.
+
+    partial_fetch means only some frames were fetched (--node-ids): their specs are merged into the
+    manifest, the other frames keep theirs, and the Markdown covers every frame in the manifest.
+    The JSON spec only lists the fetched frames, so code generation regenerates just those.
+    """
+    print("🛠 Generating Markdown spec from Figma summary...")
 
-    # Load figma full JSON
-    figma_data = load_figma_json(figma_path)
-    all_frames = []
-    for page in figma_data.get("document", {}).get("children", []):
-        if page.get("type") == "CANVAS" and page.get("name", "").strip() == selected_page_name:
-            for node in page.get("children", []):
-                if node.get("type") == "FRAME" and node.get("name") in valid_screens:
-                    all_frames.append((page.get("name"), node))
+    # Load summary; its screens carry the frame ids found by the analyzer's index across all pages
+    if summary is None:
+        summary = load_figma_json(summary_path)
+    pages = summary.get("pages", {})
+    if not pages:
+        print("❌ No valid pages found in summary report.")
+        return []
 
+    frame_hashes = {}
+    valid_screens = set()
+    for page_data in pages.values():
+        for screen in page_data.get("screens", []):
+            if screen.get("id"):
+                frame_hashes[screen["id"]] = screen.get("hash")
+            elif screen.get("name"):
+                valid_screens.add(screen["name"])
+
+    manifest = load_manifest(manifest_path)
+    previous_frames = manifest["frames"]
+    # Frames completed by an interrupted run with the same id are picked up from its journal
+    journal = RunJournal(journal_path) if journal_path else None
+    entries = []  # one {"id", "name", "hash", "spec", "structure"} per frame, in document order
+
+    if document is None:
+        document = FigmaDocument.load(figma_path)
+    # Subtrees shared across screens are sent as references and specified once
+    shared = load_shared_components(summary)
+
+    def frames_to_generate():
+        # Frames whose structural hash is unchanged reuse their spec
+        for page_name, node in document.iter_frames():
+            if node.get("id") not in frame_hashes and node.get("name") not in valid_screens:
+                continue
+            entry = {"id": node.get("id"), "name": node.get("name"), "hash": frame_hashes.get(node.get("id")), "spec": None, "structure": None}
+            entries.append(entry)
+            previous = previous_frames.get(entry["id"], {})
+            if entry["hash"] and previous.get("hash") == entry["hash"] and previous.get("spec"):
+                entry["spec"], entry["structure"] = previous["spec"], previous.get("structure")
+                continue
+            journaled = journal.get(entry["id"] or entry["name"]) if journal is not None else None
+            if journaled and journaled.get("hash") == entry["hash"] and journaled.get("spec"):
+                entry["spec"], entry["structure"] = journaled["spec"], journaled.get("structure")
+                continue
+            yield entry, page_name, with_component_refs(node, shared)
+
+    # Frames run concurrently, but sections are joined in frame order so the document is stable
+    regenerated = 0
+    for entry, reply in generate_frame_specs(frames_to_generate()):
+        entry["spec"], entry["structure"] = parse_frame_spec(reply)
+        if SPEC_STRUCTURED_OUTPUT and entry["spec"] is not None and entry["structure"] is None:
+            # The reply is not the requested object, so it is not a spec either
+            print(f"❌ {entry['name']}: reply is not a structured spec")
+            entry["spec"] = None
+        regenerated += 1
+        if journal is not None and entry["spec"]:
+            journal.append(entry["id"] or entry["name"], hash=entry["hash"], spec=entry["spec"], structure=entry["structure"])
+
+    if manifest_path:
+        print(f"♻️  Reused {len(entries) - regenerated} unchanged frames, regenerated {regenerated}.")
+
+    current = {
+        entry["id"]: {"name": entry["name"], "hash": entry["hash"], "spec": entry["spec"], "structure": entry["structure"]}
+        for entry in entries
+        if entry["spec"] and entry["id"]
+    }
+    if partial_fetch:
+        # Frames outside the fetched nodes were not looked at, so they are not deleted
+        manifest["frames"] = {**previous_frames, **current}
+    else:
+        current_ids = {entry["id"] for entry in entries}
+        deleted = [frame_id for frame_id in previous_frames if frame_id not in current_ids]
+        if deleted and manifest_path:
+            print(f"🗑️  Dropping {len(deleted)} deleted frames from the manifest.")
+        manifest["frames"] = current
+    save_manifest(manifest, manifest_path)
+
+    sections = [entry for entry in entries if entry["spec"]]
+    if partial_fetch and manifest_path:
+        sections = [frame for frame in manifest["frames"].values() if frame.get("spec")] + [entry for entry in sections if not entry["id"]]
     combined_output = ""
-    for idx, (page_name, node) in enumerate(all_frames, start=1):
-        screen_name = f"{page_name} - {node['name']}"
-        print(f"🔄 Processing {screen_name}...")
-        try:
-            markdown = call_openai(screen_name, node)
-            combined_output += f"\n\n{markdown.strip()}\n\n"
-        except RuntimeError as err:
-            print(f"❌ {err}")
-            break
-        time.sleep(1)
+    for entry in sections:
+        combined_output += f"\n\n{entry['spec'].strip()}\n\n"
+    shared_components = describe_shared_components(summary, document)
+    if shared_components:
+        combined_output += "\n\n" + shared_components_markdown(shared_components)
+
+    failed = [entry["name"] for entry in entries if entry["spec"] is None]
+    if failed:
+        print(f"⚠️ {len(failed)}/{len(entries)} frames failed and are missing from the spec.")
 
     with open(markdown_path, 'w', encoding='utf-8') as f:
         f.write(combined_output.strip())
-    print(f"✅ Markdown spec saved to: {markdown_path}")
\ No newline at end of file
+    print(f"✅ Markdown spec saved to: {markdown_path}")
+
+    if json_spec_path:
+        structures = {entry["id"] or entry["name"]: entry["structure"] for entry in entries if entry["structure"]}
+        save_json_spec(build_json_spec(summary, structures, shared_components), json_spec_path)
+        print(f"✅ JSON spec saved to: {json_spec_path} ({len(structures)}/{len(entries)} frames with structured output)")
+    return failed
\ No newline at end of file
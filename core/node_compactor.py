@@ -0,0 +1,218 @@
+import json
+from collections import Counter
+from typing import Any, Dict, Optional, Tuple
+
+from core.figma_index import walk_nodes
+from core.rate_limiter import estimate_tokens
+
+DEFAULT_TOKEN_BUDGET = 3000
+
+# Properties that carry no information for a written spec (geometry, export and plugin noise)
+PRUNED_KEYS = {
+    "fillGeometry", "strokeGeometry", "vectorPaths", "vectorNetwork", "exportSettings",
+    "relativeTransform", "absoluteRenderBounds", "absoluteTransform", "size", "pluginData",
+    "sharedPluginData", "boundVariables", "componentPropertyReferences", "styles",
+    "characterStyleOverrides", "styleOverrideTable", "lineTypes", "lineIndentations",
+    "scrollBehavior", "isFixed", "preserveRatio", "layoutVersion", "rectangleCornerRadii",
+    "strokeJoin", "strokeCap", "strokeMiterAngle", "handleMirroring", "arcData",
+}
+
+# Values equal to Figma's defaults are dropped
+DEFAULTS = {
+    "visible": True, "locked": False, "opacity": 1, "blendMode": "PASS_THROUGH",
+    "clipsContent": False, "layoutAlign": "INHERIT", "layoutGrow": 0,
+    "effects": [], "strokes": [], "exportSettings": [], "isMask": False,
+    "layoutPositioning": "AUTO", "strokeAlign": "INSIDE",
+}
+
+# Property values that repeat across nodes and are moved into a shared lookup table
+STYLE_KEYS = ("fills", "strokes", "effects", "style")
+
+
+def _round(value: Any) -> Any:
+    if isinstance(value, float):
+        rounded = round(value, 2)
+        return int(rounded) if rounded.is_integer() else rounded
+    if isinstance(value, dict):
+        return {k: _round(v) for k, v in value.items()}
+    if isinstance(value, list):
+        return [_round(v) for v in value]
+    return value
+
+
+def _color_hex(color: Dict[str, float]) -> str:
+    channels = [int(round(color.get(c, 0) * 255)) for c in ("r", "g", "b")]
+    alpha = color.get("a", 1)
+    if alpha < 1:
+        channels.append(int(round(alpha * 255)))
+    return "#" + "".join(f"{c:02X}" for c in channels)
+
+
+def _simplify_paints(paints: Any) -> Any:
+    simplified = []
+    for paint in paints or []:
+        if not isinstance(paint, dict) or paint.get("visible") is False:
+            continue
+        entry = {"type": paint.get("type")}
+        if paint.get("color"):
+            entry["color"] = _color_hex(paint["color"])
+        if paint.get("opacity", 1) != 1:
+            entry["opacity"] = _round(paint["opacity"])
+        if paint.get("imageRef"):
+            entry["imageRef"] = paint["imageRef"]
+        if paint.get("gradientStops"):
+            entry["stops"] = [_color_hex(stop["color"]) for stop in paint["gradientStops"] if stop.get("color")]
+        simplified.append(entry)
+    return simplified
+
+
+def _simplify(key: str, value: Any) -> Any:
+    if key in ("fills", "strokes", "background"):
+        return _simplify_paints(value)
+    if key == "backgroundColor" and isinstance(value, dict):
+        return _color_hex(value)
+    if key == "absoluteBoundingBox" and isinstance(value, dict):
+        return {"x": _round(value.get("x", 0)), "y": _round(value.get("y", 0)),
+                "w": _round(value.get("width", 0)), "h": _round(value.get("height", 0))}
+    if key == "effects" and isinstance(value, list):
+        return _simplify_effects(value)
+    return _round(value)
+
+
+def _simplify_effects(effects: Any) -> Any:
+    simplified = []
+    for effect in effects:
+        if not isinstance(effect, dict) or not effect.get("visible", True):
+            continue
+        entry = _round({k: v for k, v in effect.items() if k not in ("color", "visible")})
+        if effect.get("color"):
+            entry["color"] = _color_hex(effect["color"])
+        simplified.append(entry)
+    return simplified
+
+
+def prune_tree(root: Dict[str, Any]) -> Dict[str, Any]:
+    """Copies the tree without noise properties, default values and invisible nodes (iteratively)."""
+    out_root = {}
+    stack = [(root, out_root)]
+    while stack:
+        node, out = stack.pop()
+        for key, value in node.items():
+            if key == "children" or key in PRUNED_KEYS:
+                continue
+            if key in DEFAULTS and DEFAULTS[key] == value:
+                continue
+            value = _simplify(key, value)
+            if value in ([], {}, None, ""):
+                continue
+            out[key] = value
+        children = [child for child in node.get("children") or [] if child.get("visible", True)]
+        if children:
+            out["children"] = [{} for _ in children]
+            stack.extend(zip(children, out["children"]))
+    return out_root
+
+
+def summarize_subtree(node: Dict[str, Any], max_texts: int = 5) -> str:
+    counts = Counter()
+    texts = []
+    for child, depth in walk_nodes(node):
+        if depth == 0:
+            continue
+        counts[child.get("type", "NODE")] += 1
+        if child.get("characters") and len(texts) < max_texts:
+            texts.append(child["characters"][:40])
+    parts = [", ".join(f"{count} {node_type}" for node_type, count in counts.most_common())]
+    if texts:
+        parts.append("texts: " + " | ".join(texts))
+    return "; ".join(parts)
+
+
+def limit_depth(root: Dict[str, Any], max_depth: int) -> Dict[str, Any]:
+    """Copies the tree, replacing the children of nodes at max_depth with a one-line summary."""
+    out_root = {}
+    stack = [(root, out_root, 0)]
+    while stack:
+        node, out, depth = stack.pop()
+        out.update({key: value for key, value in node.items() if key != "children"})
+        children = node.get("children")
+        if not children:
+            continue
+        if depth >= max_depth:
+            out["summary"] = summarize_subtree(node)
+            continue
+        out["children"] = [{} for _ in children]
+        stack.extend((child, child_out, depth + 1) for child, child_out in zip(children, out["children"]))
+    return out_root
+
+
+def tree_depth(root: Dict[str, Any]) -> int:
+    return max(depth for _, depth in walk_nodes(root))
+
+
+def dedupe_styles(root: Dict[str, Any]) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+    """Moves style values used more than once into a lookup table, replacing them with "$sN" refs."""
+    def canonical(value):
+        return json.dumps(value, sort_keys=True, separators=(",", ":"))
+
+    counts = Counter()
+    for node, _ in walk_nodes(root):
+        for key in STYLE_KEYS:
+            if key in node:
+                counts[canonical(node[key])] += 1
+
+    table, refs = {}, {}
+    for node, _ in walk_nodes(root):
+        for key in STYLE_KEYS:
+            if key not in node:
+                continue
+            value_key = canonical(node[key])
+            if counts[value_key] < 2:
+                continue
+            if value_key not in refs:
+                refs[value_key] = f"$s{len(refs)}"
+                table[refs[value_key]] = node[key]
+            node[key] = refs[value_key]
+    return root, table
+
+
+def serialize(tree: Dict[str, Any]) -> str:
+    tree, styles = dedupe_styles(tree)
+    payload = {"styles": styles, "frame": tree} if styles else {"frame": tree}
+    return json.dumps(payload, ensure_ascii=False, separators=(",", ":"))
+
+
+def compact_frame(node: Dict[str, Any], token_budget: Optional[int] = None) -> Tuple[str, Dict[str, Any]]:
+    """
+    Returns minified, valid JSON for a frame that fits token_budget, plus stats about the savings.
+    Deep subtrees are summarized (deepest first) instead of cutting the text off mid-document.
+    """
+    token_budget = token_budget or DEFAULT_TOKEN_BUDGET
+    # default=dict lets shared FigmaDocument nodes (read-only mappings) serialize like plain dicts
+    original_tokens = estimate_tokens(json.dumps(node, indent=2, ensure_ascii=False, default=dict))
+    pruned = prune_tree(node)
+
+    # serialize() rewrites style values in place, so always hand it a copy from limit_depth
+    text = serialize(limit_depth(pruned, tree_depth(pruned)))
+    depth_limit = None
+    if estimate_tokens(text) > token_budget:
+        # Largest depth that still fits; token count is monotonic in depth so binary search it
+        low, high = 0, tree_depth(pruned) - 1
+        best = serialize(limit_depth(pruned, 0))
+        depth_limit = 0
+        while low <= high:
+            mid = (low + high) // 2
+            candidate = serialize(limit_depth(pruned, mid))
+            if estimate_tokens(candidate) <= token_budget:
+                best, depth_limit, low = candidate, mid, mid + 1
+            else:
+                high = mid - 1
+        text = best
+
+    compact_tokens = estimate_tokens(text)
+    return text, {
+        "original_tokens": original_tokens,
+        "compact_tokens": compact_tokens,
+        "saved_tokens": original_tokens - compact_tokens,
+        "depth_limit": depth_limit,
+    }
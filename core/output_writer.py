@@ -0,0 +1,138 @@
+import hashlib
+import os
+import tempfile
+import threading
+from typing import Dict, List, Optional, Union
+
+DUPLICATE_POLICIES = ("first", "last", "error")
+OUTPUT_DUPLICATE_POLICY = os.getenv("OUTPUT_DUPLICATE_POLICY", "first")
+
+
+def content_hash(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+class OutputConflictError(Exception):
+    pass
+
+
+class OutputWriter:
+    """
+    Writes generated files under one output directory without touching files whose content
+    is unchanged, so their mtimes stay put and incremental builds only recompile what changed.
+
+    Files go through a temp file plus rename, so a reader never sees a half-written file.
+    When several screens emit the same path with different content, `policy` decides:
+    "first" keeps the screen that comes first in `owner_order`, "last" keeps the last one,
+    and "error" raises OutputConflictError. The outcome does not depend on which screen
+    finishes first. Identical duplicates (e.g. AppDelegate.swift from every screen) are
+    written once.
+    """
+
+    def __init__(self, output_dir: str, owner_order: Optional[List[str]] = None, policy: str = OUTPUT_DUPLICATE_POLICY):
+        if policy not in DUPLICATE_POLICIES:
+            raise ValueError(f"Unknown duplicate policy: {policy}")
+        self.output_dir = output_dir
+        self.policy = policy
+        self._rank = {owner: i for i, owner in enumerate(owner_order or [])}
+        self._claims: Dict[str, tuple] = {}  # rel_path -> (rank, owner, digest)
+        self._dirs = set()
+        self._lock = threading.Lock()
+        self.written: List[str] = []
+        self.skipped: List[str] = []
+        self.conflicts: List[str] = []
+
+    def _owner_rank(self, owner: Optional[str]) -> int:
+        return self._rank.get(owner, len(self._rank))
+
+    def _wins(self, rank: int, claimed_rank: int) -> bool:
+        return rank < claimed_rank if self.policy == "first" else rank >= claimed_rank
+
+    def _ensure_dir(self, directory: str):
+        if directory not in self._dirs:
+            os.makedirs(directory, exist_ok=True)
+            self._dirs.add(directory)
+
+    def _unchanged_on_disk(self, abs_path: str, data: bytes, digest: str) -> bool:
+        try:
+            if os.path.getsize(abs_path) != len(data):
+                return False
+            with open(abs_path, "rb") as f:
+                return content_hash(f.read()) == digest
+        except OSError:
+            return False
+
+    def _replace(self, abs_path: str, data: bytes):
+        directory = os.path.dirname(abs_path)
+        self._ensure_dir(directory)
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".", suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, abs_path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    def write(self, rel_path: str, content: Union[str, bytes], owner: Optional[str] = None) -> str:
+        """
+        Writes one file (text as UTF-8, bytes as is) and returns "written", "skipped" (unchanged or
+        lost a duplicate) or "conflict".
+        """
+        data = content.encode("utf-8") if isinstance(content, str) else content
+        digest = content_hash(data)
+        rank = self._owner_rank(owner)
+        abs_path = os.path.join(self.output_dir, rel_path)
+        with self._lock:
+            claim = self._claims.get(rel_path)
+            if claim is not None and claim[1] != owner:
+                if claim[2] == digest:
+                    return "skipped"
+                if self.policy == "error":
+                    raise OutputConflictError(f"{rel_path} emitted with different content by {claim[1]} and {owner}")
+                self.conflicts.append(rel_path)
+                if not self._wins(rank, claim[0]):
+                    print(f"⚠️  Keeping {rel_path} from {claim[1]}; ignoring the version from {owner} ({self.policy} wins)")
+                    return "conflict"
+                print(f"⚠️  Replacing {rel_path} from {claim[1]} with the version from {owner} ({self.policy} wins)")
+            self._claims[rel_path] = (rank, owner, digest)
+            if self._unchanged_on_disk(abs_path, data, digest):
+                self.skipped.append(rel_path)
+                return "skipped"
+            self._replace(abs_path, data)
+            self.written.append(rel_path)
+            return "written"
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "written": len(set(self.written)),
+                "skipped": len(set(self.skipped) - set(self.written)),
+                "conflicts": len(set(self.conflicts)),
+            }
+
+    def format_stats(self) -> str:
+        stats = self.stats()
+        return f"{stats['written']} written, {stats['skipped']} unchanged, {stats['conflicts']} conflicting paths"
+
+
+_writers: Dict[str, OutputWriter] = {}
+_writers_lock = threading.Lock()
+
+
+def open_output_writer(output_dir: str, owner_order: Optional[List[str]] = None) -> OutputWriter:
+    """Starts a fresh writer for one generation run over output_dir."""
+    writer = OutputWriter(output_dir, owner_order)
+    with _writers_lock:
+        _writers[os.path.abspath(output_dir)] = writer
+    return writer
+
+
+def get_output_writer(output_dir: str) -> OutputWriter:
+    """Returns the writer of the current run over output_dir, starting one if needed."""
+    with _writers_lock:
+        writer = _writers.get(os.path.abspath(output_dir))
+        if writer is None:
+            writer = _writers[os.path.abspath(output_dir)] = OutputWriter(output_dir)
+        return writer
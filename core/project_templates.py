@@ -0,0 +1,174 @@
+import re
+from string import Template
+from typing import Any, Dict, List
+
+# Owner of rendered files in the OutputWriter; listed first so templates win over model output
+SCAFFOLD_OWNER = "scaffold"
+
+HEADER = "//\n//  $path\n//  Generated from the Figma design by code-generator templates. Do not edit.\n//\n\n"
+
+APP_DELEGATE = Template(HEADER + """import UIKit
+
+@main
+final class AppDelegate: UIResponder, UIApplicationDelegate {
+    func application(_ application: UIApplication,
+                     didFinishLaunchingWithOptions launchOptions: [UIApplication.LaunchOptionsKey: Any]?) -> Bool {
+        true
+    }
+
+    func application(_ application: UIApplication,
+                     configurationForConnecting connectingSceneSession: UISceneSession,
+                     options: UIScene.ConnectionOptions) -> UISceneConfiguration {
+        let configuration = UISceneConfiguration(name: "Default Configuration", sessionRole: connectingSceneSession.role)
+        configuration.delegateClass = SceneDelegate.self
+        return configuration
+    }
+}
+""")
+
+SCENE_DELEGATE = Template(HEADER + """import UIKit
+
+final class SceneDelegate: UIResponder, UIWindowSceneDelegate {
+    var window: UIWindow?
+    private let container = AppContainer()
+
+    func scene(_ scene: UIScene, willConnectTo session: UISceneSession, options connectionOptions: UIScene.ConnectionOptions) {
+        guard let windowScene = scene as? UIWindowScene else { return }
+        let window = UIWindow(windowScene: windowScene)
+        window.rootViewController = UINavigationController(rootViewController: $root)
+        window.makeKeyAndVisible()
+        self.window = window
+    }
+}
+""")
+
+APP_CONTAINER = Template(HEADER + """import UIKit
+
+/// Dependency injection container: owns the services and builds every screen with its view model.
+final class AppContainer {
+$services$factories}
+""")
+
+CONTAINER_SERVICE = Template("    lazy var $property: ${service}Protocol = $service()\n")
+
+CONTAINER_FACTORY = Template("""
+    func make${screen}ViewController() -> ${screen}ViewController {
+        ${screen}ViewController(viewModel: ${screen}ViewModel(container: self))
+    }
+""")
+
+SERVICE = Template(HEADER + """import Foundation
+
+/// Screens add the methods they call in Services/${service}+<Screen>.swift protocol extensions.
+protocol ${service}Protocol: AnyObject {}
+
+final class $service: ${service}Protocol {}
+""")
+
+VIEW_CONTROLLER = Template(HEADER + """import Combine
+import UIKit
+
+/// Screen "$title". Layout and bindings live in ${screen}ViewController+Layout.swift.
+final class ${screen}ViewController: UIViewController {
+    let viewModel: ${screen}ViewModel
+    var cancellables = Set<AnyCancellable>()
+
+    init(viewModel: ${screen}ViewModel) {
+        self.viewModel = viewModel
+        super.init(nibName: nil, bundle: nil)
+    }
+
+    @available(*, unavailable)
+    required init?(coder: NSCoder) {
+        fatalError("init(coder:) is not supported")
+    }
+
+    override func viewDidLoad() {
+        super.viewDidLoad()
+        view.backgroundColor = .systemBackground
+        setupUI()
+        bindViewModel()
+    }
+}
+""")
+
+VIEW_MODEL = Template(HEADER + """import Combine
+import Foundation
+
+/// View model of "$title". Its state is ${screen}State; actions live in ${screen}ViewModel+Actions.swift.
+final class ${screen}ViewModel: ObservableObject {
+    @Published var state = ${screen}State()
+    let container: AppContainer
+
+    init(container: AppContainer) {
+        self.container = container
+    }
+}
+""")
+
+
+def swift_type_name(name: str) -> str:
+    """Swift type name for a screen or service, e.g. "Login - Step 1" -> "LoginStep1"."""
+    words = re.findall(r"[A-Za-z0-9]+", name or "")
+    type_name = "".join(word[:1].upper() + word[1:] for word in words) or "Screen"
+    return "Screen" + type_name if type_name[0].isdigit() else type_name
+
+
+def swift_property_name(name: str) -> str:
+    """Property name for a service in AppContainer, e.g. "AuthService" -> "authService"."""
+    type_name = swift_type_name(name)
+    return type_name[:1].lower() + type_name[1:]
+
+
+def screen_files(screen_name: str) -> Dict[str, str]:
+    """The model-written files of one screen: path -> what the file holds (used in the prompt)."""
+    screen = swift_type_name(screen_name)
+    return {
+        f"Models/{screen}State.swift": f"`struct {screen}State` with the screen's displayed data and default values",
+        f"Views/{screen}ViewController+Layout.swift": f"`extension {screen}ViewController` implementing `func setupUI()` and `func bindViewModel()`",
+        f"ViewModels/{screen}ViewModel+Actions.swift": f"`extension {screen}ViewModel` with the screen's user actions and business logic",
+    }
+
+
+def render_screen_skeleton(screen_name: str) -> Dict[str, str]:
+    screen = swift_type_name(screen_name)
+    files = {
+        f"Views/{screen}ViewController.swift": VIEW_CONTROLLER,
+        f"ViewModels/{screen}ViewModel.swift": VIEW_MODEL,
+    }
+    return {path: template.substitute(path=path, screen=screen, title=screen_name) for path, template in files.items()}
+
+
+def render_app_shell(screen_names: List[str], services: List[str]) -> Dict[str, str]:
+    """AppDelegate, SceneDelegate, the DI container and one protocol plus default implementation per service."""
+    screens = [swift_type_name(name) for name in screen_names]
+    service_types = list(dict.fromkeys(swift_type_name(service) for service in services))
+    root = f"container.make{screens[0]}ViewController()" if screens else "UIViewController()"
+
+    files = {
+        "App/AppDelegate.swift": APP_DELEGATE.substitute(path="App/AppDelegate.swift"),
+        "App/SceneDelegate.swift": SCENE_DELEGATE.substitute(path="App/SceneDelegate.swift", root=root),
+        "Core/AppContainer.swift": APP_CONTAINER.substitute(
+            path="Core/AppContainer.swift",
+            services="".join(CONTAINER_SERVICE.substitute(property=swift_property_name(service), service=service)
+                             for service in service_types),
+            factories="".join(CONTAINER_FACTORY.substitute(screen=screen) for screen in screens),
+        ),
+    }
+    for service in service_types:
+        path = f"Services/{service}.swift"
+        files[path] = SERVICE.substitute(path=path, service=service)
+    return files
+
+
+def render_project(structure_plan: Dict[str, Any]):
+    """
+    Renders every deterministic file of the MVVM project described by structure_plan.
+    Returns (app-level files, {screen name: skeleton files}), both as path -> content.
+    The app shell covers app_screens / app_services when the plan has them (partial runs).
+    """
+    screen_names = [screen["name"] if isinstance(screen, dict) and "name" in screen else str(screen)
+                    for screen in structure_plan.get("screens", [])]
+    app_files = render_app_shell(structure_plan.get("app_screens") or screen_names,
+                                 structure_plan.get("app_services") or structure_plan.get("services", []))
+    return app_files, {name: render_screen_skeleton(name) for name in screen_names}
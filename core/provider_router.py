@@ -0,0 +1,232 @@
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Callable, Dict, List, Optional
+
+from core.rate_limiter import estimate_tokens
+from core.retry import RETRY_LIMIT, call_with_retry
+from core.telemetry import get_tracer, percentile
+
+# Latencies kept per provider; percentiles follow recent behaviour rather than the whole run
+LATENCY_WINDOW = 100
+# Below this many samples a provider's p95 is not trusted and the fixed hedge delay applies
+HEDGE_MIN_SAMPLES = 5
+# Default prompt size limits per provider (0 = no limit); the local model only gets small frames
+DEFAULT_MAX_PROMPT_TOKENS = {"ollama": 1500}
+# Seconds a provider that failed is passed over while another provider is available
+FAILURE_COOLDOWN = 30.0
+
+
+class RequestCancelled(Exception):
+    """Raised inside a provider call once another provider has answered the same request."""
+
+
+_call_state = threading.local()
+
+
+def check_cancelled():
+    """
+    Called by provider functions at points where giving up is cheap (before waiting on a rate
+    limiter, between streamed chunks); raises RequestCancelled when the router no longer needs the
+    reply. Outside a routed call it does nothing.
+    """
+    cancelled = getattr(_call_state, "cancelled", None)
+    if cancelled is not None and cancelled.is_set():
+        raise RequestCancelled()
+
+
+class LatencyStats:
+    """Thread-safe sliding window of successful call latencies (seconds) per provider."""
+
+    def __init__(self, window: int = LATENCY_WINDOW):
+        self.window = window
+        self._latencies: Dict[str, deque] = {}
+        self._lock = threading.Lock()
+
+    def record(self, provider: str, seconds: float):
+        with self._lock:
+            self._latencies.setdefault(provider, deque(maxlen=self.window)).append(seconds)
+
+    def samples(self, provider: str) -> int:
+        with self._lock:
+            return len(self._latencies.get(provider, ()))
+
+    def percentile(self, provider: str, pct: float) -> Optional[float]:
+        """pct-th percentile of the provider's recent latencies, or None before its first sample."""
+        with self._lock:
+            values = list(self._latencies.get(provider, ()))
+        return percentile(values, pct) if values else None
+
+
+_stats = LatencyStats()
+
+
+def get_latency_stats() -> LatencyStats:
+    return _stats
+
+
+def record_latency(provider: str, seconds: float):
+    """Called by provider calls after a successful, uncached response (rate-limit waits excluded)."""
+    _stats.record(provider, seconds)
+
+
+def max_prompt_tokens(provider: str) -> int:
+    """Largest prompt routed to a provider, from <PROVIDER>_MAX_PROMPT_TOKENS (0 = no limit)."""
+    default = DEFAULT_MAX_PROMPT_TOKENS.get(provider.lower(), 0)
+    return int(os.getenv(f"{provider.upper()}_MAX_PROMPT_TOKENS", str(default)))
+
+
+class ProviderRouter:
+    """
+    Sends each prompt to one of several providers (name -> completion function taking the prompt).
+    Providers whose prompt limit the prompt exceeds are skipped, and so are providers that failed in
+    the last failure_cooldown seconds while another one is available; the others are ranked by their
+    observed median latency, with the configured order deciding ties and providers not measured yet.
+
+    Provider functions make a single attempt: the router owns retries. A provider that fails hands
+    the request to the next one right away; once every candidate has failed with a retryable error,
+    the round is repeated after a backoff, up to retry_limit rounds.
+
+    With hedge enabled, a request still running after the chosen provider's p95 latency (or
+    hedge_delay until enough samples exist) is also sent to the next provider, and the first
+    accepted answer wins. The losing calls are cancelled: calls not started yet never run, and
+    running ones stop at their next check_cancelled().
+    """
+
+    def __init__(self, providers: Dict[str, Callable[[str], str]], hedge: bool = False, hedge_delay: float = 10.0,
+                 accept: Callable[[Optional[str]], bool] = bool, stats: Optional[LatencyStats] = None,
+                 max_workers: int = 8, retry_limit: int = RETRY_LIMIT, failure_cooldown: float = FAILURE_COOLDOWN):
+        if not providers:
+            raise ValueError("ProviderRouter needs at least one provider")
+        self.providers = providers
+        self.order = list(providers)
+        self.hedge = hedge
+        self.hedge_delay = hedge_delay
+        self.accept = accept
+        self.stats = stats or get_latency_stats()
+        self.max_workers = max_workers
+        self.retry_limit = max(1, retry_limit)
+        self.failure_cooldown = failure_cooldown
+        self._failed_at: Dict[str, float] = {}
+        self._executor = None
+        self._lock = threading.Lock()
+
+    def candidates(self, prompt: str) -> List[str]:
+        """Providers that take a prompt of this size, fastest first, recently failed ones left out."""
+        tokens = estimate_tokens(prompt)
+        eligible = [name for name in self.order if not max_prompt_tokens(name) or tokens <= max_prompt_tokens(name)]
+        if not eligible:
+            # Nothing takes a prompt this large; the unrestricted fallback is the last configured provider
+            eligible = self.order[-1:]
+        healthy = [name for name in eligible if not self.cooling_down(name)]
+        return sorted(healthy or eligible, key=lambda name: (self.stats.percentile(name, 50) or 0.0, self.order.index(name)))
+
+    def cooling_down(self, provider: str) -> bool:
+        with self._lock:
+            failed_at = self._failed_at.get(provider)
+        return failed_at is not None and time.monotonic() - failed_at < self.failure_cooldown
+
+    def _record_outcome(self, provider: str, failed: bool):
+        with self._lock:
+            if failed:
+                self._failed_at[provider] = time.monotonic()
+            else:
+                self._failed_at.pop(provider, None)
+
+    def hedge_after(self, provider: str) -> float:
+        if self.stats.samples(provider) >= HEDGE_MIN_SAMPLES:
+            return self.stats.percentile(provider, 95)
+        return self.hedge_delay
+
+    def _submit(self, name: str, prompt: str, cancelled: threading.Event):
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="provider-router")
+        tracer = get_tracer()
+        context = tracer.current_context()
+        # A retry of the round is recorded on the first call of the next round, which runs on a worker thread
+        retries = tracer.take_pending_retries()
+
+        def run():
+            _call_state.cancelled = cancelled
+            try:
+                check_cancelled()
+                for _ in range(retries):
+                    tracer.record_retry()
+                with tracer.context(**context):
+                    return self.providers[name](prompt)
+            finally:
+                _call_state.cancelled = None
+                tracer.take_pending_retries()
+        return self._executor.submit(run)
+
+    def complete(self, prompt: str, label: str = "request") -> Optional[str]:
+        """Retries whole rounds over the candidates when the last error of a round is retryable."""
+        return call_with_retry(lambda: self._complete_once(prompt, label), label, retry_limit=self.retry_limit)
+
+    def _complete_once(self, prompt: str, label: str) -> Optional[str]:
+        """One attempt per candidate provider; raises the last error when none of them answered."""
+        candidates = self.candidates(prompt)
+        if len(candidates) == 1:
+            return self._call(candidates[0], prompt)
+
+        pending = {}  # future -> provider
+        remaining = list(candidates)
+        fallback, last_error = None, None
+        cancelled = threading.Event()
+
+        def launch():
+            name = remaining.pop(0)
+            pending[self._submit(name, prompt, cancelled)] = name
+
+        launch()
+        try:
+            while pending:
+                timeout = None
+                if self.hedge and remaining and len(pending) == 1:
+                    timeout = self.hedge_after(next(iter(pending.values())))
+                done, _ = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+                if not done:
+                    slow = next(iter(pending.values()))
+                    print(f"🏁 {label}: {slow} slower than {timeout:.1f}s, hedging with {remaining[0]}")
+                    launch()
+                    continue
+                for future in done:
+                    name = pending.pop(future)
+                    try:
+                        reply = future.result()
+                    except Exception as err:
+                        last_error = err
+                        self._record_outcome(name, failed=True)
+                        print(f"⚠️ {label}: {name} failed ({err})" + (f", trying {remaining[0]}" if remaining and not pending else ""))
+                    else:
+                        self._record_outcome(name, failed=False)
+                        if self.accept(reply):
+                            if pending:
+                                print(f"🏁 {label}: answered by {name}, cancelling {', '.join(pending.values())}")
+                            return reply
+                        fallback = fallback or reply
+                        print(f"⚠️ {label}: unusable reply from {name}" + (f", trying {remaining[0]}" if remaining and not pending else ""))
+                if not pending and remaining:
+                    launch()
+        finally:
+            # Losing hedges: queued calls never start, running ones stop at their next check_cancelled()
+            cancelled.set()
+            for future in pending:
+                future.cancel()
+        if fallback is not None:
+            return fallback
+        raise last_error or RuntimeError(f"❌ No provider answered {label}")
+
+    def _call(self, name: str, prompt: str) -> Optional[str]:
+        try:
+            reply = self.providers[name](prompt)
+        except Exception:
+            self._record_outcome(name, failed=True)
+            raise
+        finally:
+            get_tracer().take_pending_retries()
+        self._record_outcome(name, failed=False)
+        return reply
@@ -0,0 +1,103 @@
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Optional
+
+# Requests in flight at once per API for the whole process, so a batch of files running their own
+# worker pools cannot open more connections than this (<API>_MAX_IN_FLIGHT, 0 = no limit)
+DEFAULT_MAX_IN_FLIGHT = {"OPENAI": 8, "ANTHROPIC": 4, "OLLAMA": 2, "FIGMA": 6, "FIGMA_DOWNLOAD": 16}
+
+
+class RateLimiter:
+    """
+    Thread-safe sliding-window limiter for requests-per-minute and tokens-per-minute, plus an
+    optional cap on concurrent requests (see request()). A limit of 0 (or None) disables that dimension.
+    """
+
+    WINDOW = 60.0
+
+    def __init__(self, requests_per_minute: Optional[int] = None, tokens_per_minute: Optional[int] = None,
+                 max_in_flight: Optional[int] = None):
+        self.requests_per_minute = requests_per_minute or 0
+        self.tokens_per_minute = tokens_per_minute or 0
+        self.max_in_flight = max_in_flight or 0
+        self._slots = threading.BoundedSemaphore(self.max_in_flight) if self.max_in_flight else None
+        self._events = []  # (timestamp, tokens)
+        self._lock = threading.Lock()
+
+    def _prune(self, now: float):
+        cutoff = now - self.WINDOW
+        while self._events and self._events[0][0] <= cutoff:
+            self._events.pop(0)
+
+    def _wait_time(self, now: float, tokens: int) -> float:
+        wait = 0.0
+        if self.requests_per_minute and len(self._events) >= self.requests_per_minute:
+            oldest = self._events[len(self._events) - self.requests_per_minute][0]
+            wait = max(wait, oldest + self.WINDOW - now)
+        if self.tokens_per_minute and self._events:
+            used = sum(t for _, t in self._events)
+            # A single request larger than the budget is let through once the window is empty
+            if used + tokens > self.tokens_per_minute:
+                freed = 0
+                for ts, t in self._events:
+                    freed += t
+                    if used - freed + tokens <= self.tokens_per_minute:
+                        wait = max(wait, ts + self.WINDOW - now)
+                        break
+                else:
+                    wait = max(wait, self._events[-1][0] + self.WINDOW - now)
+        return wait
+
+    def acquire(self, tokens: int = 0):
+        """Blocks until a request of the given estimated token size fits in the current window."""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._prune(now)
+                wait = self._wait_time(now, tokens)
+                if wait <= 0:
+                    self._events.append((now, tokens))
+                    return
+            time.sleep(min(wait, 1.0))
+
+    @contextmanager
+    def request(self, tokens: int = 0):
+        """
+        Holds one of the max_in_flight slots while the request (including a streamed body) runs,
+        then waits for the request to fit the per-minute limits as acquire() does.
+        """
+        if self._slots is not None:
+            self._slots.acquire()
+        try:
+            self.acquire(tokens)
+            yield
+        finally:
+            if self._slots is not None:
+                self._slots.release()
+
+
+_limiters: Dict[str, RateLimiter] = {}
+_limiters_lock = threading.Lock()
+
+
+def get_rate_limiter(provider: str) -> RateLimiter:
+    """
+    Returns the process-wide limiter for a provider (or API), configured from
+    <PROVIDER>_REQUESTS_PER_MINUTE, <PROVIDER>_TOKENS_PER_MINUTE and <PROVIDER>_MAX_IN_FLIGHT.
+    """
+    key = provider.upper()
+    with _limiters_lock:
+        if key not in _limiters:
+            _limiters[key] = RateLimiter(
+                requests_per_minute=int(os.getenv(f"{key}_REQUESTS_PER_MINUTE", "0")),
+                tokens_per_minute=int(os.getenv(f"{key}_TOKENS_PER_MINUTE", "0")),
+                max_in_flight=int(os.getenv(f"{key}_MAX_IN_FLIGHT", str(DEFAULT_MAX_IN_FLIGHT.get(key, 0)))),
+            )
+        return _limiters[key]
+
+
+def estimate_tokens(text: str) -> int:
+    # Rough heuristic (~4 characters per token) good enough for budgeting
+    return max(1, len(text) // 4)
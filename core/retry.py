@@ -0,0 +1,93 @@
+import random
+import time
+from email.utils import parsedate_to_datetime
+from typing import Any, Callable, Optional
+
+import requests
+
+from core.telemetry import get_tracer
+
+RETRY_LIMIT = 3
+BACKOFF_BASE = 1.0
+BACKOFF_MAX = 30.0
+# Statuses worth another attempt besides 5xx; any other 4xx fails right away
+RETRYABLE_STATUS_CODES = {408, 429}
+# Network-level errors of the OpenAI and Anthropic SDKs (no HTTP status), matched by name so the SDKs stay lazily imported
+SDK_CONNECTION_ERRORS = {"APIConnectionError", "APITimeoutError"}
+
+
+class RetryableHTTPError(Exception):
+    """Raised for HTTP responses worth retrying; carries the response so Retry-After can be honored."""
+
+    def __init__(self, message: str, response: Any = None):
+        super().__init__(message)
+        self.response = response
+
+
+def retry_after_seconds(error: Exception) -> Optional[float]:
+    """Extracts a Retry-After delay (seconds or HTTP-date) from an SDK or requests error, if any."""
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None)
+    if not headers:
+        return None
+
+    retry_after_ms = headers.get("retry-after-ms")
+    if retry_after_ms:
+        try:
+            return float(retry_after_ms) / 1000.0
+        except ValueError:
+            pass
+
+    retry_after = headers.get("retry-after")
+    if not retry_after:
+        return None
+    try:
+        return max(0.0, float(retry_after))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(retry_after).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def is_retryable(error: Exception) -> bool:
+    """True for rate limits, server errors, timeouts and connection failures; False for other client errors."""
+    if isinstance(error, RetryableHTTPError):
+        return True
+    status = getattr(error, "status_code", None)
+    if status is None:
+        status = getattr(getattr(error, "response", None), "status_code", None)
+    if status is not None:
+        return status in RETRYABLE_STATUS_CODES or status >= 500
+    if isinstance(error, (ConnectionError, TimeoutError, requests.ConnectionError, requests.Timeout,
+                          requests.exceptions.ChunkedEncodingError)):
+        return True
+    return any(cls.__name__ in SDK_CONNECTION_ERRORS for cls in type(error).__mro__)
+
+
+def backoff_delay(attempt: int, base: float = BACKOFF_BASE, cap: float = BACKOFF_MAX) -> float:
+    # Full jitter: uniform in [0, min(cap, base * 2^attempt)]
+    return random.uniform(0, min(cap, base * (2 ** attempt)))
+
+
+def call_with_retry(fn: Callable[[], Any], label: str, retry_limit: int = RETRY_LIMIT, failure_message: Optional[str] = None) -> Any:
+    """
+    Calls fn() up to retry_limit times with exponential backoff and jitter, honoring Retry-After
+    when the server provides one. Only errors is_retryable accepts are retried; the others fail on
+    the first attempt. The SDK clients are built without retries of their own (see core.clients).
+    """
+    for attempt in range(retry_limit):
+        try:
+            return fn()
+        except Exception as e:
+            print(f"⚠️ Error calling {label} (attempt {attempt+1}/{retry_limit}): {type(e).__name__} - {e}")
+            if not is_retryable(e):
+                raise RuntimeError(failure_message or f"❌ Failed to call {label}: {type(e).__name__} - {e}") from e
+            if attempt + 1 >= retry_limit:
+                raise RuntimeError(failure_message or f"❌ Failed to call {label} after {retry_limit} attempts.") from e
+            get_tracer().record_retry()
+            delay = retry_after_seconds(e)
+            if delay is None:
+                delay = backoff_delay(attempt)
+            time.sleep(min(delay, BACKOFF_MAX))
@@ -0,0 +1,123 @@
+import json
+import os
+import sqlite3
+import threading
+import uuid
+from datetime import datetime
+from typing import Any, Dict, Optional
+
+RUNS_DIRNAME = "runs"
+
+
+class IncompleteStageError(Exception):
+    """
+    A stage finished but left work undone (failed frames, screens or assets). The stage is not
+    marked done, so resuming the run retries the failed items; durations holds the stage times so far.
+    """
+
+    def __init__(self, message: str, stages=None, durations: Optional[Dict[str, float]] = None):
+        super().__init__(message)
+        self.stages = list(stages or [])
+        self.durations = durations or {}
+
+
+class RunJournal:
+    """
+    Append-only JSONL journal of completed work items (frames, screens) for one run.
+    Each record is flushed as soon as it is written, so an interrupted run loses at most the
+    items that were still in flight. Later records for the same key win.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._records = self._load()
+
+    def _load(self) -> Dict[str, Dict[str, Any]]:
+        records = {}
+        if not os.path.exists(self.path):
+            return records
+        with open(self.path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    # A torn last line from a crash mid-write is expected; skip it
+                    continue
+                records[record["key"]] = record
+        return records
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            return self._records.get(key)
+
+    def append(self, key: str, **fields):
+        record = {"key": key, **fields}
+        line = json.dumps(record, ensure_ascii=False) + "\n"
+        with self._lock:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(line)
+                f.flush()
+                os.fsync(f.fileno())
+            self._records[key] = record
+
+    def __len__(self):
+        with self._lock:
+            return len(self._records)
+
+
+class PipelineRun:
+    """
+    A run directory under <output_dir>/runs/<run_id> holding run.json (arguments and completed
+    stages), the per-frame spec journal, the per-screen codegen journal and the LangGraph
+    checkpoint database.
+    """
+
+    def __init__(self, output_dir: str, run_id: Optional[str] = None):
+        self.run_id = run_id or datetime.now().strftime("%Y%m%d-%H%M%S-") + uuid.uuid4().hex[:6]
+        self.directory = os.path.join(output_dir, RUNS_DIRNAME, self.run_id)
+        self.meta_path = os.path.join(self.directory, "run.json")
+        self.spec_journal_path = os.path.join(self.directory, "spec_journal.jsonl")
+        self.codegen_journal_path = os.path.join(self.directory, "codegen_journal.jsonl")
+        self.checkpoint_path = os.path.join(self.directory, "checkpoints.sqlite")
+        self.meta = {"run_id": self.run_id, "args": {}, "completed_stages": []}
+        if os.path.exists(self.meta_path):
+            with open(self.meta_path, "r", encoding="utf-8") as f:
+                self.meta = json.load(f)
+
+    @classmethod
+    def resume(cls, output_dir: str, run_id: str) -> "PipelineRun":
+        run = cls(output_dir, run_id)
+        if not os.path.exists(run.meta_path):
+            raise FileNotFoundError(f"❌ No run '{run_id}' found under {os.path.join(output_dir, RUNS_DIRNAME)}")
+        return run
+
+    def save(self):
+        os.makedirs(self.directory, exist_ok=True)
+        tmp_path = self.meta_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.meta, f, indent=2)
+        os.replace(tmp_path, self.meta_path)
+
+    def is_done(self, stage: str) -> bool:
+        return stage in self.meta["completed_stages"]
+
+    def mark_done(self, stage: str):
+        if stage not in self.meta["completed_stages"]:
+            self.meta["completed_stages"].append(stage)
+            self.save()
+
+
+def open_checkpointer(path: str):
+    """
+    Returns a SQLite-backed LangGraph checkpointer, or None when langgraph-checkpoint-sqlite
+    is not installed (per-frame and per-screen journals still make the run resumable).
+    """
+    try:
+        from langgraph.checkpoint.sqlite import SqliteSaver
+    except ImportError:
+        print("⚠️ langgraph-checkpoint-sqlite not installed; LangGraph node checkpoints disabled.")
+        return None
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    return SqliteSaver(sqlite3.connect(path, check_same_thread=False))
@@ -0,0 +1,113 @@
+import json
+import os
+import re
+import tempfile
+from typing import Any, Dict, List, Optional
+
+# Components the spec leaves out (status bar and other system UI), matched on the Figma layer name
+SYSTEM_UI_PATTERN = re.compile(r"status\s*bar|battery|wi-?fi|signal|home\s*indicator|notch|time\s*bar", re.IGNORECASE)
+
+# Schema of the structured reply the spec step asks each frame for (see core.markdown_generator)
+FRAME_SPEC_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "markdown": {"type": "string"},
+        "components": {"type": "array", "items": {"type": "string"}},
+        "services": {"type": "array", "items": {"type": "string"}},
+    },
+    "required": ["markdown", "components", "services"],
+    "additionalProperties": False,
+}
+
+
+def parse_frame_spec(raw: Optional[str]):
+    """
+    Splits a spec reply into (markdown, structure). Replies that are not a FRAME_SPEC_SCHEMA object
+    (plain Markdown from older caches or models without structured output) give structure None.
+    """
+    if raw is None:
+        return None, None
+    text = raw.strip()
+    if text.startswith("```"):
+        text = re.sub(r"^```(?:json)?\s*|\s*```$", "", text)
+    try:
+        data = json.loads(text)
+    except ValueError:
+        return raw, None
+    if not isinstance(data, dict) or not isinstance(data.get("markdown"), str):
+        return raw, None
+    structure = {
+        "components": _unique(data.get("components")),
+        "services": _unique(data.get("services")),
+    }
+    return data["markdown"], structure
+
+
+def build_json_spec(summary: Dict[str, Any], structures: Optional[Dict[str, Dict[str, Any]]] = None,
+                    shared_components: Optional[List[Dict[str, Any]]] = None) -> Dict[str, Any]:
+    """
+    Builds the codegen JSON spec (screens, components and node count per screen, services) without an LLM call.
+    Screens and their order come from the analyzer summary; components and services come from the
+    structured spec of each frame (keyed by frame id or name), falling back to the frame's top-level
+    layers when a frame has no structured spec. shared_components (see
+    markdown_generator.describe_shared_components) are passed through for code generation.
+    """
+    structures = structures or {}
+    screens, components, services, sizes = [], {}, [], {}
+    for page in summary.get("pages", {}).values():
+        for screen in page.get("screens", []):
+            name = screen.get("name")
+            if not name or name in components:
+                continue
+            structure = structures.get(screen.get("id")) or structures.get(name)
+            if structure:
+                screen_components = structure.get("components", [])
+                services.extend(structure.get("services", []))
+            else:
+                screen_components = screen.get("components", [])
+            screens.append(name)
+            sizes[name] = (screen.get("stats") or {}).get("node_count")
+            components[name] = [c for c in _unique(screen_components) if not SYSTEM_UI_PATTERN.search(c)]
+    return {
+        "screens": screens,
+        "components": components,
+        "services": _unique(services),
+        "shared_components": shared_components or [],
+        "screen_sizes": sizes,
+        "ci": True,
+        "docs": True,
+    }
+
+
+def save_json_spec(json_spec: Dict[str, Any], path: str):
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    with os.fdopen(fd, "w", encoding="utf-8") as f:
+        json.dump(json_spec, f, indent=2, ensure_ascii=False)
+    os.replace(tmp_path, path)
+
+
+def load_json_spec(path: Optional[str], markdown_path: Optional[str] = None) -> Optional[Dict[str, Any]]:
+    """
+    Returns the JSON spec written by the spec stage, or None when it is missing, unreadable or
+    older than the Markdown spec (edited by hand since), in which case the caller falls back
+    to converting the Markdown.
+    """
+    if not path or not os.path.exists(path):
+        return None
+    if markdown_path and os.path.exists(markdown_path) and os.path.getmtime(markdown_path) > os.path.getmtime(path):
+        return None
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            json_spec = json.load(f)
+    except (OSError, ValueError):
+        return None
+    return json_spec if isinstance(json_spec, dict) and json_spec.get("screens") else None
+
+
+def _unique(values) -> List[str]:
+    seen = []
+    for value in values or []:
+        if isinstance(value, str) and value.strip() and value.strip() not in seen:
+            seen.append(value.strip())
+    return seen
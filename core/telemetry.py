@@ -0,0 +1,244 @@
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, List, Optional
+
+
+def percentile(values: List[float], pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100.0 * (len(ordered) - 1))))]
+
+
+class Tracer:
+    """
+    Process-wide sidecar collecting timing spans (stages, DAG nodes, frames, screens) and
+    per-call LLM records (tokens, retries, cache status, screen). Exports a Chrome trace
+    (chrome://tracing / Perfetto) and a summary table.
+    """
+
+    def __init__(self):
+        self.spans: List[Dict[str, Any]] = []
+        self.llm_calls: List[Dict[str, Any]] = []
+        self._origin = time.perf_counter()
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._thread_ids: Dict[int, int] = {}
+
+    def _tid(self) -> int:
+        ident = threading.get_ident()
+        with self._lock:
+            return self._thread_ids.setdefault(ident, len(self._thread_ids) + 1)
+
+    def _context(self) -> Dict[str, Any]:
+        if not hasattr(self._local, "context"):
+            self._local.context = {}
+        return self._local.context
+
+    @contextmanager
+    def context(self, **attrs):
+        """Attaches attributes (e.g. screen=...) to every span and LLM call made by this thread inside the block."""
+        ctx = self._context()
+        previous = dict(ctx)
+        ctx.update(attrs)
+        try:
+            yield
+        finally:
+            ctx.clear()
+            ctx.update(previous)
+
+    def current_context(self) -> Dict[str, Any]:
+        """Copy of this thread's context attributes, to carry them over to a worker thread."""
+        return dict(self._context())
+
+    @contextmanager
+    def span(self, name: str, category: str = "stage", **attrs):
+        start = time.perf_counter()
+        record = {"name": name, "cat": category, "tid": self._tid(), "args": {**self._context(), **attrs}}
+        try:
+            yield record
+        except BaseException as e:
+            record["args"]["error"] = f"{type(e).__name__}: {e}"
+            raise
+        finally:
+            record["start"] = start - self._origin
+            record["duration"] = time.perf_counter() - start
+            with self._lock:
+                self.spans.append(record)
+
+    @contextmanager
+    def llm_call(self, provider: str, model: str):
+        """Times one provider call; record_usage/record_retry called from inside fill in the rest."""
+        record = {
+            "provider": provider, "model": model, "screen": self._context().get("screen"),
+            "prompt_tokens": 0, "completion_tokens": 0, "retries": self.take_pending_retries(), "cache": None,
+        }
+        previous = getattr(self._local, "call", None)
+        self._local.call = record
+        start = time.perf_counter()
+        try:
+            yield record
+        finally:
+            self._local.call = previous
+            record["start"] = start - self._origin
+            record["duration"] = time.perf_counter() - start
+            record["tid"] = self._tid()
+            with self._lock:
+                self.llm_calls.append(record)
+
+    def record_usage(self, prompt_tokens: Optional[int], completion_tokens: Optional[int]):
+        call = getattr(self._local, "call", None)
+        if call is not None:
+            call["prompt_tokens"] += prompt_tokens or 0
+            call["completion_tokens"] += completion_tokens or 0
+
+    def record_retry(self):
+        """Counts a retry on the open call; outside one (a router retry round) it goes to the next call opened."""
+        call = getattr(self._local, "call", None)
+        if call is not None:
+            call["retries"] += 1
+        else:
+            self._local.pending_retries = getattr(self._local, "pending_retries", 0) + 1
+
+    def take_pending_retries(self) -> int:
+        pending = getattr(self._local, "pending_retries", 0)
+        self._local.pending_retries = 0
+        return pending
+
+    def durations(self, category: str = "stage") -> Dict[str, float]:
+        return {span["name"]: round(span["duration"], 4) for span in self.spans if span["cat"] == category}
+
+    def summary(self) -> Dict[str, Any]:
+        providers = {}
+        for call in self.llm_calls:
+            entry = providers.setdefault(call["provider"], {
+                "calls": 0, "cache_hits": 0, "prompt_tokens": 0, "completion_tokens": 0,
+                "retries": 0, "latencies": [],
+            })
+            entry["calls"] += 1
+            entry["prompt_tokens"] += call["prompt_tokens"]
+            entry["completion_tokens"] += call["completion_tokens"]
+            entry["retries"] += call["retries"]
+            if call["cache"] == "hit":
+                entry["cache_hits"] += 1
+            else:
+                entry["latencies"].append(call["duration"])
+        for entry in providers.values():
+            latencies = entry.pop("latencies")
+            entry["p50_s"] = round(percentile(latencies, 50), 3)
+            entry["p95_s"] = round(percentile(latencies, 95), 3)
+            entry["total_s"] = round(sum(latencies), 3)
+
+        nodes = {}
+        for span in self.spans:
+            if span["cat"] in ("stage", "node"):
+                nodes[span["name"]] = round(nodes.get(span["name"], 0.0) + span["duration"], 4)
+        return {"spans": nodes, "providers": providers}
+
+    def format_summary(self) -> str:
+        summary = self.summary()
+        lines = ["", "📊 Pipeline timing", f"{'stage / node':<24} {'seconds':>9}"]
+        for name, seconds in summary["spans"].items():
+            lines.append(f"{name:<24} {seconds:>9.2f}")
+        if summary["providers"]:
+            lines.append("")
+            lines.append(f"{'provider':<10} {'calls':>6} {'hits':>6} {'prompt tok':>11} {'compl tok':>10} {'retries':>8} {'p50 s':>7} {'p95 s':>7}")
+            for provider, entry in summary["providers"].items():
+                lines.append(
+                    f"{provider:<10} {entry['calls']:>6} {entry['cache_hits']:>6} {entry['prompt_tokens']:>11} "
+                    f"{entry['completion_tokens']:>10} {entry['retries']:>8} {entry['p50_s']:>7.2f} {entry['p95_s']:>7.2f}"
+                )
+        return "\n".join(lines)
+
+    def to_chrome_trace(self) -> Dict[str, Any]:
+        pid = os.getpid()
+        events = []
+        for span in self.spans:
+            events.append({
+                "name": span["name"], "cat": span["cat"], "ph": "X", "pid": pid, "tid": span["tid"],
+                "ts": round(span["start"] * 1e6), "dur": round(span["duration"] * 1e6), "args": span["args"],
+            })
+        for call in self.llm_calls:
+            events.append({
+                "name": f"{call['provider']}:{call['model']}", "cat": "llm", "ph": "X", "pid": pid, "tid": call["tid"],
+                "ts": round(call["start"] * 1e6), "dur": round(call["duration"] * 1e6),
+                "args": {key: call[key] for key in ("screen", "prompt_tokens", "completion_tokens", "retries", "cache")},
+            })
+        events.sort(key=lambda event: event["ts"])
+        return {
+            "traceEvents": events,
+            "displayTimeUnit": "ms",
+            "otherData": {"summary": self.summary(), "llm_calls": self.llm_calls},
+        }
+
+    def export(self, path: str):
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.to_chrome_trace(), f, indent=2)
+
+
+_tracer = Tracer()
+
+
+def get_tracer() -> Tracer:
+    return _tracer
+
+
+def traced_node(name: str, fn):
+    """Wraps a LangGraph node function so each invocation is recorded as a span."""
+    def node(state):
+        with _tracer.span(name, category="node"):
+            return fn(state)
+    node.__name__ = getattr(fn, "__name__", name)
+    return node
+
+
+class ThreadProfiler:
+    """
+    cProfile for the whole pipeline: cProfile.Profile only sees the thread that enabled it, so
+    while this is enabled every new thread (frame and screen workers, LangGraph branches, asset
+    downloads, provider calls) runs under its own profile, and stats() merges them all.
+    """
+
+    def __init__(self):
+        self._profiles = []
+        self._lock = threading.Lock()
+        self._thread_run = None
+
+    def enable(self):
+        import cProfile
+        main = cProfile.Profile()
+        self._profiles = [main]
+        self._thread_run = thread_run = threading.Thread.run
+        profiles, lock = self._profiles, self._lock
+
+        def run(thread):
+            profile = cProfile.Profile()
+            try:
+                profile.enable()
+            except ValueError:
+                # Python 3.12+ profiles through sys.monitoring, where the main profile already sees every thread
+                return thread_run(thread)
+            with lock:
+                profiles.append(profile)
+            try:
+                return thread_run(thread)
+            finally:
+                profile.disable()
+
+        threading.Thread.run = run
+        main.enable()
+
+    def disable(self):
+        self._profiles[0].disable()
+        if self._thread_run is not None:
+            threading.Thread.run, self._thread_run = self._thread_run, None
+
+    def stats(self):
+        """pstats.Stats over the main thread and every worker thread profiled so far."""
+        import pstats
+        with self._lock:
+            profiles = list(self._profiles)
+        return pstats.Stats(*profiles)
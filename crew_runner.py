@@ -2,12 +2,87 @@ import os
 import json
 from dotenv import load_dotenv
 from agents.spec_to_json_agent import markdown_to_json
+from agents.code_generator_agent import CODEGEN_MAX_CONCURRENCY
 from dag_flow import build_project_graph
+from core.run_journal import open_checkpointer
+from core.spec_builder import load_json_spec
 
-def run_codegen_pipeline(markdown_path: str):
+def load_frame_hashes(summary_path: str):
+    """Maps frame name -> structural hash from the analyzer summary."""
+    if not summary_path or not os.path.exists(summary_path):
+        return {}
+    with open(summary_path, "r", encoding="utf-8") as f:
+        summary = json.load(f)
+    frame_hashes = {}
+    for page in summary.get("pages", {}).values():
+        for screen in page.get("screens", []):
+            if screen.get("name") and screen.get("hash"):
+                frame_hashes[screen["name"]] = screen["hash"]
+    return frame_hashes
+
+def run_codegen_pipeline(markdown_path: str, manifest_path: str = None, summary_path: str = None, run=None, project_dir: str = None,
+                         json_spec_path: str = None, partial_fetch: bool = False):
+    """
+    Runs the LangGraph DAG on the JSON spec written by the spec stage (json_spec_path); the Markdown
+    spec is converted to JSON by the LLM only when that file is missing or stale. With a PipelineRun, the JSON
+    spec, every completed node (SQLite checkpointer) and every completed screen are persisted,
+    so calling this again for the same run resumes where it stopped. project_dir overrides
+    PROJECT_GENERATED_PATH for this project. partial_fetch (only some frames fetched) keeps the screens of
+    earlier runs in the project and the app shell. Returns the screens and components that failed.
+    """
     load_dotenv()
 
-    # Load Markdown file
+    checkpointer = open_checkpointer(run.checkpoint_path) if run else None
+    # SCREEN branches run in parallel up to CODEGEN_MAX_CONCURRENCY, next to CI_DOCS
+    config = {"max_concurrency": CODEGEN_MAX_CONCURRENCY + 1}
+    if run:
+        config["configurable"] = {"thread_id": codegen_thread_id(run)}
+    workflow = build_project_graph(checkpointer)
+
+    if checkpointer:
+        snapshot = workflow.get_state(config)
+        if snapshot.next:
+            print(f"⏯️  Resuming LangGraph DAG at: {', '.join(snapshot.next)}\n")
+            result = workflow.invoke(None, config)
+            print("🏁 Code generation complete.")
+            return result.get("failed_screens") or []
+        if snapshot.values.get("status"):
+            # The DAG finished but the stage was not marked done (some screens failed): run it again on a
+            # fresh thread; screens that completed are taken from the codegen journal
+            run.meta["codegen_attempt"] = run.meta.get("codegen_attempt", 0) + 1
+            run.save()
+            config["configurable"] = {"thread_id": codegen_thread_id(run)}
+            print(f"🔁 Retrying screens that failed in the previous attempt ({len(snapshot.values.get('failed_screens') or [])}).")
+
+    parsed_json = load_json_spec(json_spec_path, markdown_path)
+    if parsed_json is not None:
+        print(f"⚡ Using structured JSON spec: {json_spec_path}")
+    else:
+        parsed_json = convert_markdown_spec(markdown_path, run)
+
+    print("✅ Parsed JSON structure:")
+    print(json.dumps(parsed_json, indent=2))
+
+    # Run LangGraph pipeline
+    print("\n🔁 Running LangGraph DAG to generate the project...\n")
+    result = workflow.invoke(input={
+        "json_spec": parsed_json,
+        "manifest_path": manifest_path,
+        "frame_hashes": load_frame_hashes(summary_path),
+        "codegen_journal_path": run.codegen_journal_path if run else None,
+        "output_dir": project_dir,
+        "partial": partial_fetch,
+    }, config=config)
+    print("🏁 Code generation complete.")
+    return result.get("failed_screens") or []
+
+def codegen_thread_id(run):
+    """LangGraph thread of the run's current codegen attempt."""
+    attempt = run.meta.get("codegen_attempt", 0)
+    return f"{run.run_id}-{attempt}" if attempt else run.run_id
+
+def convert_markdown_spec(markdown_path: str, run=None):
+    """Fallback: converts the Markdown spec to the JSON spec with the LLM (cached in the run directory)."""
     with open(markdown_path, "r", encoding="utf-8") as f:
         markdown = f.read()
 
@@ -15,21 +90,21 @@ def run_codegen_pipeline(markdown_path: str):
     print(markdown[:300] + "...\n")
 
     # Convert to JSON spec using AI agent
-    json_spec = markdown_to_json(markdown)
+    run_spec_path = os.path.join(run.directory, "json_spec.json") if run else None
+    if run_spec_path and os.path.exists(run_spec_path):
+        with open(run_spec_path, "r", encoding="utf-8") as f:
+            json_spec = f.read()
+    else:
+        json_spec = markdown_to_json(markdown)
     try:
         parsed_json = json.loads(json_spec)
     except json.JSONDecodeError as e:
         print("❌ LLM returned invalid JSON:\n", json_spec)
         raise e
-
-    print("✅ Parsed JSON structure:")
-    print(json.dumps(parsed_json, indent=2))
-
-    # Run LangGraph pipeline
-    print("\n🔁 Running LangGraph DAG to generate the project...\n")
-    workflow = build_project_graph()
-    workflow.invoke(input={"json_spec": parsed_json})
-    print("🏁 Code generation complete.")
+    if run_spec_path:
+        with open(run_spec_path, "w", encoding="utf-8") as f:
+            f.write(json_spec)
+    return parsed_json
 
 # Tests for run_codegen_pipeline
 if __name__ == "__main__":
@@ -1,31 +1,104 @@
+import operator
+
 from langgraph.graph import StateGraph, END
-from typing import TypedDict, List, Dict, Any
+from langgraph.types import Send
+from typing import Annotated, TypedDict, List, Dict, Any
+
+from core.component_catalog import components_by_screen
+from core.telemetry import traced_node
+
+def merge_dicts(left: Dict[str, Any], right: Dict[str, Any]) -> Dict[str, Any]:
+    """Reducer for per-screen results: each SCREEN branch contributes its own keys."""
+    return {**(left or {}), **(right or {})}
 
 class ProjectState(TypedDict):
     json_spec: Dict[str, Any]
     structure_plan: Dict[str, Any]
-    generated_files: Dict[str, str]
+    generated_files: Annotated[Dict[str, str], merge_dicts]
+    written_files: Annotated[Dict[str, List[str]], merge_dicts]
+    failed_screens: Annotated[List[str], operator.add]
+    pending_screens: List[str]
+    pending_components: List[str]
+    pending_packs: List[List[str]]
+    scaffold_files: Dict[str, List[str]]
+    manifest_path: str
+    frame_hashes: Dict[str, str]
+    screen_hashes: Dict[str, str]
+    reused_screens: List[str]
+    codegen_journal_path: str
+    output_dir: str
+    partial: bool
+    docs_status: str
     status: str
 
-def build_project_graph():
+def route_screens(state: ProjectState):
+    """
+    Fans out one COMPONENT branch per pending shared component and one SCREEN branch per pack of
+    pending screens (see code_generator_agent.pack_screens); with nothing to generate, goes
+    straight to assembly. Screens only reference component views by name, so both kinds of
+    branches run at once.
+    """
+    pending = state.get("pending_screens") or []
+    packs = state.get("pending_packs") or [[name] for name in pending]
+    pending_components = set(state.get("pending_components") or [])
+    if not pending and not pending_components:
+        return "ASSEMBLE_PROJECT"
+    plan = state.get("structure_plan") or {}
+    components = plan.get("components") or []
+    used_by = components_by_screen(components)
+    common = {"output_dir": state.get("output_dir"), "codegen_journal_path": state.get("codegen_journal_path")}
+    sends = [Send("COMPONENT", {**common, "component": c}) for c in components if c["name"] in pending_components]
+    sizes = plan.get("screen_sizes") or {}
+    sends += [
+        Send("SCREEN", {
+            **common,
+            "services": plan.get("services") or [],
+            "screens": [
+                {
+                    "screen_name": name,
+                    "node_count": sizes.get(name),
+                    "components": [{"name": c["name"], "layer": c.get("layer")} for c in used_by.get(name, [])],
+                }
+                for name in pack
+            ],
+        })
+        for pack in packs
+    ]
+    return sends
+
+def build_project_graph(checkpointer=None):
+    """
+    PLAN_STRUCTURE -> PLAN_SCREENS -> SCAFFOLD_PROJECT (templates, milliseconds), which fans out one
+    COMPONENT branch per shared component and one SCREEN branch per screen (generate, then write
+    its files) alongside CI_DOCS; ASSEMBLE_PROJECT joins the branches. The critical path is the
+    slowest screen rather than the sum of all screens.
+    """
     builder = StateGraph(ProjectState)
 
-    # Add nodes and logic as before
     from agents.ios_structure_planner_agent import plan_structure
-    from agents.code_generator_agent import generate_code
+    from agents.code_generator_agent import plan_screens, build_screen, build_component
     from agents.project_assembler_agent import assemble_project
+    from agents.project_scaffold_agent import scaffold_project
     from agents.ci_docs_agent import generate_ci_and_docs
 
-    builder.add_node("PLAN_STRUCTURE", plan_structure)
-    builder.add_node("GENERATE_CODE", generate_code)
-    builder.add_node("ASSEMBLE_PROJECT", assemble_project)
-    builder.add_node("CI_DOCS", generate_ci_and_docs)
+    builder.add_node("PLAN_STRUCTURE", traced_node("PLAN_STRUCTURE", plan_structure))
+    builder.add_node("PLAN_SCREENS", traced_node("PLAN_SCREENS", plan_screens))
+    builder.add_node("SCAFFOLD_PROJECT", traced_node("SCAFFOLD_PROJECT", scaffold_project))
+    builder.add_node("SCREEN", traced_node("SCREEN", build_screen))
+    builder.add_node("COMPONENT", traced_node("COMPONENT", build_component))
+    builder.add_node("ASSEMBLE_PROJECT", traced_node("ASSEMBLE_PROJECT", assemble_project))
+    builder.add_node("CI_DOCS", traced_node("CI_DOCS", generate_ci_and_docs))
 
     builder.set_entry_point("PLAN_STRUCTURE")
 
-    builder.add_edge("PLAN_STRUCTURE", "GENERATE_CODE")
-    builder.add_edge("GENERATE_CODE", "ASSEMBLE_PROJECT")
-    builder.add_edge("ASSEMBLE_PROJECT", "CI_DOCS")
+    builder.add_edge("PLAN_STRUCTURE", "PLAN_SCREENS")
+    builder.add_edge("PLAN_SCREENS", "SCAFFOLD_PROJECT")
+    builder.add_conditional_edges("SCAFFOLD_PROJECT", route_screens, ["SCREEN", "COMPONENT", "ASSEMBLE_PROJECT"])
+    # CI/docs do not depend on generated code, so they run next to the screen branches
+    builder.add_edge("SCAFFOLD_PROJECT", "CI_DOCS")
+    builder.add_edge("SCREEN", "ASSEMBLE_PROJECT")
+    builder.add_edge("COMPONENT", "ASSEMBLE_PROJECT")
+    builder.add_edge("ASSEMBLE_PROJECT", END)
     builder.add_edge("CI_DOCS", END)
 
-    return builder.compile()
\ No newline at end of file
+    return builder.compile(checkpointer=checkpointer)
@@ -0,0 +1,178 @@
+# run_batch.py
+"""
+Runs the full pipeline for many Figma files in one process.
+
+Files are scheduled on a shared worker pool, and the LLM cache, rate limiters and SDK clients are
+shared across them, so per-provider limits hold globally. Each file gets its own output directory
+and run, and a consolidated report is written at the end.
+
+    python run_batch.py --keys KEY1,KEY2 --output-root ./output/batch
+    python run_batch.py --keys-file nightly.json --max-files 8
+"""
+import os
+import json
+import time
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from dotenv import load_dotenv
+
+from core.llm_cache import configure_llm_cache
+from core.frame_manifest import invalidate_manifest
+from core.run_journal import IncompleteStageError, PipelineRun
+from core.telemetry import get_tracer
+from run_pipeline import STAGES, run_figma_pipeline
+
+BATCH_MAX_CONCURRENCY = int(os.getenv("BATCH_MAX_CONCURRENCY", "4"))
+
+
+def load_jobs(keys=None, keys_file=None):
+    """
+    Reads jobs from a comma-separated key list and/or a keys file. The file is either plain text
+    (one key per line, # comments allowed) or JSON: a list of keys or of
+    {"key", "name", "node_ids", "depth"} objects.
+    """
+    entries = [key.strip() for key in (keys or "").split(",") if key.strip()]
+    if keys_file:
+        with open(keys_file, "r", encoding="utf-8") as f:
+            text = f.read()
+        if keys_file.endswith(".json"):
+            entries.extend(json.loads(text))
+        else:
+            entries.extend(line.split("#")[0].strip() for line in text.splitlines() if line.split("#")[0].strip())
+
+    jobs = []
+    names = set()
+    for entry in entries:
+        job = {"key": entry} if isinstance(entry, str) else dict(entry)
+        name = job.get("name") or job["key"]
+        # Keep output directories distinct when the same key is listed twice (e.g. with different node ids)
+        suffix = 2
+        while name in names:
+            name = f"{job.get('name') or job['key']}-{suffix}"
+            suffix += 1
+        names.add(name)
+        job["name"] = name
+        if isinstance(job.get("node_ids"), str):
+            job["node_ids"] = [node_id.strip() for node_id in job["node_ids"].split(",") if node_id.strip()]
+        jobs.append(job)
+    return jobs
+
+
+def run_job(job, output_root, batch_id, use_figma_cache, full):
+    output_dir = os.path.join(output_root, job["name"])
+    run = PipelineRun(output_dir, batch_id)
+    if not run.meta["args"]:
+        if full:
+            invalidate_manifest(os.path.join(output_dir, "frame_manifest.json"))
+        run.meta["args"] = {"figma_key": job["key"], "node_ids": job.get("node_ids"), "depth": job.get("depth")}
+        run.save()
+
+    result = {"key": job["key"], "name": job["name"], "output_dir": output_dir, "run_id": run.run_id}
+    start = time.perf_counter()
+    try:
+        result["stages_s"] = run_figma_pipeline(
+            job["key"], output_dir, run, node_ids=job.get("node_ids"), depth=job.get("depth"),
+            use_figma_cache=use_figma_cache, project_dir=os.path.join(output_dir, "generated-project"),
+        )
+        result["status"] = "ok"
+    except IncompleteStageError as e:
+        print(f"⚠️ [{job['name']}] {e}")
+        result["status"] = "partial"
+        result["error"] = str(e)
+        result["stages_s"] = e.durations
+        result["failed_stage"] = ", ".join(e.stages)
+    except Exception as e:
+        print(f"❌ [{job['name']}] {type(e).__name__}: {e}")
+        result["status"] = "failed"
+        result["error"] = f"{type(e).__name__}: {e}"
+        result["failed_stage"] = next(
+            (stage for stage in STAGES if not run.is_done(stage)), None
+        )
+    result["wall_s"] = round(time.perf_counter() - start, 3)
+    return result
+
+
+def print_report(report):
+    print(f"\n{'file':<32} {'status':<7} {'wall s':>8} {'fetch':>7} {'analyze':>8} {'assets':>7} {'spec':>8} {'codegen':>8}")
+    for r in report["files"]:
+        stages = r.get("stages_s") or {}
+        line = (f"{r['name'][:32]:<32} {r['status']:<7} {r['wall_s']:>8.2f} {stages.get('fetch', 0):>7.2f} "
+                f"{stages.get('analyze', 0):>8.2f} {stages.get('assets', 0):>7.2f} {stages.get('spec', 0):>8.2f} {stages.get('codegen', 0):>8.2f}")
+        if r["status"] != "ok":
+            line += f"  {r.get('failed_stage')}: {r.get('error', '').splitlines()[0]}"
+        print(line)
+    totals = report["totals"]
+    print(f"\n📦 {totals['ok']}/{totals['files']} files succeeded in {totals['wall_s']:.2f}s "
+          f"({totals['files_per_minute']:.1f} files/min)")
+
+
+def main():
+    load_dotenv()
+
+    parser = argparse.ArgumentParser(description="Run the Figma to iOS pipeline for many Figma files")
+    parser.add_argument("--keys", help="Comma-separated Figma file keys")
+    parser.add_argument("--keys-file", help="Text file with one key per line, or a JSON list of keys / {key, name, node_ids, depth}")
+    parser.add_argument("--output-root", default="./output/batch", help="Each file is written to <output-root>/<name>")
+    parser.add_argument("--max-files", type=int, default=BATCH_MAX_CONCURRENCY, help="Files processed concurrently")
+    parser.add_argument("--no-figma-cache", action="store_true", help="Always re-download the Figma files")
+    parser.add_argument("--full", action="store_true", help="Regenerate every frame instead of only changed ones")
+    parser.add_argument("--run-id", help="Id shared by every file's run (default: timestamp)")
+    parser.add_argument("--resume", metavar="RUN_ID", help="Resume an interrupted batch; finished files and stages are skipped")
+    parser.add_argument("--report", help="Consolidated report path (default: <output-root>/batch-<run-id>.json)")
+    parser.add_argument("--trace-out", help="Write a Chrome trace covering every file")
+    cache_group = parser.add_mutually_exclusive_group()
+    cache_group.add_argument("--no-cache", action="store_true", help="Bypass the LLM response cache entirely")
+    cache_group.add_argument("--refresh-cache", action="store_true", help="Ignore cached LLM responses but store fresh ones")
+    args = parser.parse_args()
+
+    jobs = load_jobs(args.keys, args.keys_file)
+    if not jobs:
+        parser.error("no Figma keys given (use --keys and/or --keys-file)")
+
+    cache_mode = "bypass" if args.no_cache else "refresh" if args.refresh_cache else None
+    llm_cache = configure_llm_cache(mode=cache_mode)
+    batch_id = args.resume or args.run_id or datetime.now().strftime("%Y%m%d-%H%M%S")
+    print(f"🆔 Batch {batch_id}: {len(jobs)} files, {args.max_files} at a time (resume with --resume {batch_id})")
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=max(1, args.max_files)) as executor:
+        futures = [
+            executor.submit(run_job, job, args.output_root, batch_id, not args.no_figma_cache, args.full and not args.resume)
+            for job in jobs
+        ]
+        results = [future.result() for future in futures]
+    wall = time.perf_counter() - start
+
+    tracer = get_tracer()
+    ok = sum(1 for r in results if r["status"] == "ok")
+    report = {
+        "batch_id": batch_id,
+        "max_files": args.max_files,
+        "totals": {
+            "files": len(results),
+            "ok": ok,
+            "failed": len(results) - ok,
+            "wall_s": round(wall, 3),
+            "files_per_minute": round(len(results) / wall * 60, 2) if wall else 0.0,
+        },
+        "llm": tracer.summary()["providers"],
+        "llm_cache": llm_cache.stats(),
+        "files": results,
+    }
+
+    report_path = args.report or os.path.join(args.output_root, f"batch-{batch_id}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(report_path)), exist_ok=True)
+    with open(report_path, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    if args.trace_out:
+        tracer.export(args.trace_out)
+        print(f"🧭 Trace written to: {args.trace_out}")
+
+    print_report(report)
+    print(f"✅ Batch report saved to: {report_path}")
+    if ok < len(results):
+        raise SystemExit(1)
+
+if __name__ == "__main__":
+    main()
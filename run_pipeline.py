@@ -1,34 +1,264 @@
 # run_pipeline.py
+"""
+Figma to iOS pipeline CLI.
+
+    python run_pipeline.py all --figma-key KEY       # every stage (also the default without a subcommand)
+    python run_pipeline.py fetch --figma-key KEY
+    python run_pipeline.py analyze
+    python run_pipeline.py assets --figma-key KEY
+    python run_pipeline.py spec
+    python run_pipeline.py codegen
+
+Stages import their dependencies (LLM SDKs, LangGraph) only when they run, so fetch and
+analyze start without loading them.
+"""
 import os
+import sys
+import json
 import argparse
 from dotenv import load_dotenv
 
-from core.figma_fetcher import download_figma_file
-from core.figma_analyzer import analyze_and_save
-from core.markdown_generator import generate_spec
-from crew_runner import run_codegen_pipeline
+from core.run_journal import IncompleteStageError, PipelineRun
+from core.telemetry import ThreadProfiler, get_tracer
 
-def main():
-    load_dotenv()
+STAGES = ("fetch", "analyze", "assets", "spec", "codegen")
+COMMANDS = STAGES + ("all",)
+# Stages whose output no later stage reads; when they leave work undone the later stages still run
+SIDE_STAGES = ("assets",)
+
+def stage_paths(output_dir):
+    return {
+        "figma_json": os.path.join(output_dir, "figma_design.json"),
+        "summary_json": os.path.join(output_dir, "summary_report.json"),
+        "markdown_md": os.path.join(output_dir, "figma_markdown.md"),
+        "json_spec": os.path.join(output_dir, "figma_spec.json"),
+        "manifest_json": os.path.join(output_dir, "frame_manifest.json"),
+        "asset_manifest_json": os.path.join(output_dir, "asset_manifest.json"),
+        "fetch_scope_json": os.path.join(output_dir, "fetch_scope.json"),
+    }
+
+def is_partial_fetch(paths):
+    """True when the last fetch only downloaded some nodes (--node-ids), as recorded in fetch_scope.json."""
+    try:
+        with open(paths["fetch_scope_json"], "r", encoding="utf-8") as f:
+            return bool(json.load(f).get("node_ids"))
+    except (OSError, ValueError):
+        return False
+
+def run_stage(name, output_dir, figma_key=None, node_ids=None, depth=None, use_figma_cache=True, run=None, project_dir=None, shared=None):
+    """
+    Runs one pipeline stage over the files in output_dir, importing only what that stage needs.
+    shared carries in-process results between stages of one run (the parsed FigmaDocument and the
+    summary) so later stages do not re-read them from disk. Raises IncompleteStageError when the
+    stage failed some of its frames, assets or screens.
+    """
+    paths = stage_paths(output_dir)
+    shared = shared if shared is not None else {}
+    if name == "fetch":
+        from core.figma_fetcher import download_figma_file
+        download_figma_file(figma_key, paths["figma_json"], node_ids=node_ids, depth=depth, use_cache=use_figma_cache)
+        shared.pop("document", None)
+        # Later stages (also when run on their own) merge a partial fetch into the previous output
+        with open(paths["fetch_scope_json"], "w", encoding="utf-8") as f:
+            json.dump({"figma_key": figma_key, "node_ids": node_ids or None, "depth": depth}, f, indent=2)
+    elif name == "analyze":
+        from core.figma_analyzer import analyze_and_save
+        from core.figma_document import FigmaDocument
+        if "document" not in shared:
+            shared["document"] = FigmaDocument.load(paths["figma_json"])
+        shared["summary"] = analyze_and_save(paths["figma_json"], paths["summary_json"], shared["document"])
+    elif name == "assets":
+        from agents.project_assembler_agent import get_output_dir
+        from core.asset_exporter import export_assets
+        from core.figma_analyzer import load_figma_json
+        if "summary" not in shared:
+            shared["summary"] = load_figma_json(paths["summary_json"])
+        stats = export_assets(figma_key, shared["summary"], get_output_dir({"output_dir": project_dir}),
+                              paths["asset_manifest_json"], use_cache=use_figma_cache, partial_fetch=is_partial_fetch(paths))
+        if stats["failed"]:
+            raise IncompleteStageError(f"assets: {stats['failed']} asset files failed to export", [name])
+    elif name == "spec":
+        from core.markdown_generator import generate_spec
+        failed = generate_spec(paths["summary_json"], paths["figma_json"], paths["markdown_md"], paths["manifest_json"],
+                               run.spec_journal_path if run else None, shared.get("document"), shared.get("summary"),
+                               paths["json_spec"], partial_fetch=is_partial_fetch(paths))
+        # Codegen only needs the specs; let the document go before the LLM-heavy phase
+        shared.pop("document", None)
+        if failed:
+            raise IncompleteStageError(f"spec: {len(failed)} frames failed ({', '.join(failed)})", [name])
+    elif name == "codegen":
+        from crew_runner import run_codegen_pipeline
+        failed = run_codegen_pipeline(paths["markdown_md"], paths["manifest_json"], paths["summary_json"], run, project_dir,
+                                      paths["json_spec"], partial_fetch=is_partial_fetch(paths))
+        if failed:
+            raise IncompleteStageError(f"codegen: {len(failed)} screens and components failed ({', '.join(failed)})", [name])
+    else:
+        raise ValueError(f"Unknown stage: {name}")
+
+def run_figma_pipeline(figma_key, output_dir, run, node_ids=None, depth=None, use_figma_cache=True, project_dir=None):
+    """
+    Runs fetch, analyze, assets, spec and codegen for one Figma file into output_dir, skipping stages the
+    run has already completed. Returns the wall time of each stage run, in seconds.
+
+    A stage that leaves work undone is not marked done, so resuming the run retries it, and the
+    stages after it do not run (except after SIDE_STAGES); IncompleteStageError is raised at the end.
+    """
+    tracer = get_tracer()
+    os.makedirs(output_dir, exist_ok=True)
+    durations = {}
+    shared = {}
+    incomplete = []
+    for name in STAGES:
+        if run.is_done(name):
+            continue
+        if any(stage not in SIDE_STAGES for stage in incomplete):
+            break
+        with tracer.context(figma_key=figma_key), tracer.span(name) as span:
+            try:
+                run_stage(name, output_dir, figma_key, node_ids, depth, use_figma_cache, run, project_dir, shared)
+            except IncompleteStageError as err:
+                print(f"⚠️ {err}")
+                incomplete.append(name)
+        durations[name] = round(span["duration"], 4)
+        if name not in incomplete:
+            run.mark_done(name)
+    if incomplete:
+        raise IncompleteStageError(f"Incomplete stages: {', '.join(incomplete)}", incomplete, durations)
+    return durations
+
+def build_parser():
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument("--output-dir", default="./output", help="Directory to save all output files")
+    common.add_argument("--timings-out", help="Write per-stage wall times (seconds) to this JSON file")
+    common.add_argument("--trace-out", help="Write a Chrome trace (chrome://tracing, Perfetto) with stage, node and LLM call timings")
+    common.add_argument("--profile", help="Run under cProfile and write the stats to this file")
+
+    fetch_options = argparse.ArgumentParser(add_help=False)
+    fetch_options.add_argument("--figma-key", help="Figma file key (taken from the run when resuming)")
+    fetch_options.add_argument("--node-ids", help="Comma-separated Figma node ids (pages or top-level frames) to fetch instead of the whole file")
+    fetch_options.add_argument("--depth", type=int, help="Limit the depth of the fetched Figma tree")
+    fetch_options.add_argument("--no-figma-cache", action="store_true", help="Always re-download the Figma file")
+
+    llm_options = argparse.ArgumentParser(add_help=False)
+    llm_options.add_argument("--full", action="store_true", help="Regenerate every frame instead of only changed ones")
+    cache_group = llm_options.add_mutually_exclusive_group()
+    cache_group.add_argument("--no-cache", action="store_true", help="Bypass the LLM response cache entirely")
+    cache_group.add_argument("--refresh-cache", action="store_true", help="Ignore cached LLM responses but store fresh ones")
 
     parser = argparse.ArgumentParser(description="End-to-end Figma to iOS code generator")
-    parser.add_argument("--figma-key", required=True, help="Figma file key")
-    parser.add_argument("--output-dir", default="./output", help="Directory to save all output files")
-    args = parser.parse_args()
+    commands = parser.add_subparsers(dest="command", metavar="{fetch,analyze,assets,spec,codegen,all}")
+    subparsers = [
+        commands.add_parser("fetch", parents=[common, fetch_options], help="Download the Figma file"),
+        commands.add_parser("analyze", parents=[common], help="Index the downloaded file and write the summary report"),
+        commands.add_parser("assets", parents=[common, fetch_options], help="Export image fills and icons into the project's asset catalog"),
+        commands.add_parser("spec", parents=[common, llm_options], help="Generate the Markdown spec from the summary"),
+        commands.add_parser("codegen", parents=[common, llm_options], help="Generate the iOS project from the Markdown spec"),
+        commands.add_parser("all", parents=[common, fetch_options, llm_options], help="Run every stage (default)"),
+    ]
+    subparsers[-1].add_argument("--run-id", help="Id for this run's checkpoint directory (default: timestamp)")
+    subparsers[-1].add_argument("--resume", metavar="RUN_ID", help="Resume an interrupted run, skipping completed stages, frames and screens")
+    for subparser in subparsers:
+        # Lets main() report argument errors against the subcommand's own usage line
+        subparser.set_defaults(error=subparser.error)
+    return parser
 
-    os.makedirs(args.output_dir, exist_ok=True)
+def main(argv=None):
+    load_dotenv()
 
-    figma_json = os.path.join(args.output_dir, "figma_design.json")
-    summary_json = os.path.join(args.output_dir, "summary_report.json")
-    markdown_md = os.path.join(args.output_dir, "figma_markdown.md")
+    argv = list(sys.argv[1:] if argv is None else argv)
+    # Without a subcommand the whole pipeline runs, as before subcommands existed
+    if not argv or (argv[0] not in COMMANDS and argv[0] not in ("-h", "--help")):
+        argv.insert(0, "all")
+    parser = build_parser()
+    args = parser.parse_args(argv)
+
+    run = None
+    if args.command == "all":
+        if args.resume:
+            run = PipelineRun.resume(args.output_dir, args.resume)
+            saved = run.meta["args"]
+            args.figma_key = args.figma_key or saved.get("figma_key")
+            args.node_ids = args.node_ids or saved.get("node_ids")
+            args.depth = args.depth if args.depth is not None else saved.get("depth")
+            print(f"⏯️  Resuming run {run.run_id} (completed stages: {', '.join(run.meta['completed_stages']) or 'none'})")
+        else:
+            if not args.figma_key:
+                args.error("--figma-key is required unless --resume is given")
+            run = PipelineRun(args.output_dir, args.run_id)
+            run.meta["args"] = {"figma_key": args.figma_key, "node_ids": args.node_ids, "depth": args.depth}
+            run.save()
+            print(f"🆔 Run id: {run.run_id} (resume with --resume {run.run_id})")
+    elif args.command == "fetch":
+        if not args.figma_key:
+            args.error("--figma-key is required")
+    else:
+        if args.command == "assets" and not args.figma_key:
+            args.error("--figma-key is required")
+        required = {"analyze": "figma_json", "assets": "summary_json", "spec": "summary_json", "codegen": "markdown_md"}[args.command]
+        path = stage_paths(args.output_dir)[required]
+        if not os.path.exists(path):
+            args.error(f"{path} not found; run the previous stage first")
+
+    uses_llm = args.command in ("spec", "codegen", "all")
+    llm_cache = None
+    if uses_llm:
+        from core.llm_cache import configure_llm_cache
+        from core.frame_manifest import invalidate_manifest
+        cache_mode = "bypass" if args.no_cache else "refresh" if args.refresh_cache else None
+        llm_cache = configure_llm_cache(mode=cache_mode)
+        if args.full and not getattr(args, "resume", None):
+            invalidate_manifest(stage_paths(args.output_dir)["manifest_json"])
+
+    os.makedirs(args.output_dir, exist_ok=True)
+    tracer = get_tracer()
+    profiler = None
+    if args.profile:
+        profiler = ThreadProfiler()
+        profiler.enable()
+    incomplete = None
+    try:
+        if args.command == "all":
+            node_ids = [node_id.strip() for node_id in args.node_ids.split(",") if node_id.strip()] if args.node_ids else None
+            run_figma_pipeline(args.figma_key, args.output_dir, run, node_ids=node_ids, depth=args.depth,
+                               use_figma_cache=not args.no_figma_cache)
+        else:
+            fetch_args = {}
+            if args.command == "assets":
+                fetch_args = {"figma_key": args.figma_key, "use_figma_cache": not args.no_figma_cache}
+            elif args.command == "fetch":
+                fetch_args = {
+                    "figma_key": args.figma_key,
+                    "node_ids": [node_id.strip() for node_id in args.node_ids.split(",") if node_id.strip()] if args.node_ids else None,
+                    "depth": args.depth,
+                    "use_figma_cache": not args.no_figma_cache,
+                }
+            with tracer.span(args.command):
+                run_stage(args.command, args.output_dir, **fetch_args)
+    except IncompleteStageError as err:
+        incomplete = err
+    finally:
+        if profiler:
+            profiler.disable()
+            stats = profiler.stats()
+            stats.dump_stats(args.profile)
+            print(f"🔬 Profile written to: {args.profile} (main and worker threads)")
+            stats.sort_stats("cumulative").print_stats(15)
+        if args.timings_out:
+            with open(args.timings_out, "w", encoding="utf-8") as f:
+                json.dump(tracer.durations(), f, indent=2)
+        if args.trace_out:
+            tracer.export(args.trace_out)
+            print(f"🧭 Trace written to: {args.trace_out}")
+        print(tracer.format_summary())
 
-    # PHASE 1
-    download_figma_file(args.figma_key, figma_json)
-    analyze_and_save(figma_json, summary_json)
-    generate_spec(summary_json, figma_json, markdown_md)
+    if llm_cache:
+        stats = llm_cache.stats()
+        print(f"🗄️  LLM cache ({stats['mode']}): {stats['hits']} hits, {stats['misses']} misses")
 
-    # PHASE 2
-    run_codegen_pipeline(markdown_md) 
+    if incomplete:
+        retry = f"resume with --resume {run.run_id}" if run else f"run {args.command} again"
+        print(f"❌ {incomplete}; {retry} to retry the failed items.")
+        sys.exit(1)
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,94 @@
+import json
+
+from core.asset_catalog import AssetCatalog, icon_hash
+from core.asset_exporter import keep_previous_names, plan_asset_files, write_imageset
+from core.output_writer import OutputWriter
+
+ASSETS = {
+    "images": {"ref1": {"name": "hero", "layer": "Hero", "node_id": "1:2"}},
+    "icons": {
+        "h1": {"name": "icon-arrow", "layer": "Icon/Arrow", "node_id": "1:3", "format": "pdf"},
+        "h2": {"name": "logo", "layer": "Logo", "node_id": "1:4", "format": "png"},
+    },
+}
+
+
+def test_plan_asset_files():
+    plan = {imageset["name"]: imageset for imageset in plan_asset_files(ASSETS)}
+    assert plan["hero"]["group"] == "Images" and plan["hero"]["files"][0]["source"] == "image:ref1"
+    assert plan["icon-arrow"]["vector"]
+    assert [file["scale"] for file in plan["icon-arrow"]["files"]] == [None]
+    assert not plan["logo"]["vector"]
+    assert [file["scale"] for file in plan["logo"]["files"]] == [1, 2, 3]
+    assert {file["key"] for file in plan["logo"]["files"]} == {"1:4"}
+
+
+def write(tmp_path, name):
+    plan = {imageset["name"]: imageset for imageset in plan_asset_files(ASSETS)}
+    files = []
+    for file in plan[name]["files"]:
+        cached = tmp_path / f"cache-{name}-{file['scale']}.{file['format'] or 'png'}"
+        cached.write_bytes(b"data")
+        files.append((file, str(cached)))
+    write_imageset(OutputWriter(str(tmp_path / "project")), f"{name}.imageset", plan[name], files)
+    set_path = tmp_path / "project" / f"{name}.imageset"
+    return set_path, json.loads((set_path / "Contents.json").read_text())
+
+
+def test_vector_imageset_contents(tmp_path):
+    set_path, contents = write(tmp_path, "icon-arrow")
+    assert contents["images"] == [{"idiom": "universal", "filename": "icon-arrow.pdf"}]
+    assert contents["properties"] == {"preserves-vector-representation": True}
+    assert contents["info"] == {"author": "xcode", "version": 1}
+    assert sorted(path.name for path in set_path.iterdir()) == ["Contents.json", "icon-arrow.pdf"]
+
+
+def test_raster_imageset_contents(tmp_path):
+    set_path, contents = write(tmp_path, "logo")
+    assert contents["images"] == [
+        {"idiom": "universal", "filename": "logo.png", "scale": "1x"},
+        {"idiom": "universal", "filename": "logo@2x.png", "scale": "2x"},
+        {"idiom": "universal", "filename": "logo@3x.png", "scale": "3x"},
+    ]
+    assert "properties" not in contents
+
+
+def test_partial_export_keeps_previous_names():
+    previous = {"imagesets": {"logo": "Icons/logo.imageset", "hero": "Images/hero.imageset"},
+                "keys": {"logo": "icon:h1", "hero": "image:other"}}
+    names = {imageset["key"]: imageset["name"] for imageset in keep_previous_names(plan_asset_files(ASSETS), previous)}
+    # icon:h1 was exported as "logo"; the new logo and hero must not take existing imagesets
+    assert names["icon:h1"] == "logo"
+    assert names["icon:h2"] == "logo-2"
+    assert names["image:ref1"] == "hero-2"
+
+
+def icon(x, y, size, offset=0.25):
+    return {
+        "id": "1", "type": "GROUP", "name": "Icon/Star",
+        "absoluteBoundingBox": {"x": x, "y": y, "width": size, "height": size},
+        "children": [{
+            "id": "2", "type": "VECTOR", "name": "Star",
+            "absoluteBoundingBox": {"x": x + size * offset, "y": y + size / 4, "width": size / 2, "height": size / 2},
+        }],
+    }
+
+
+def test_scaled_copies_of_an_icon_share_one_asset():
+    assert icon_hash(icon(0, 0, 24)) == icon_hash(icon(300, 40, 32))
+    assert icon_hash(icon(0, 0, 24)) != icon_hash(icon(0, 0, 24, offset=0.1))
+    catalog = AssetCatalog()
+    catalog.add_frame("Home", {"id": "0", "type": "FRAME", "children": [icon(0, 0, 24), icon(100, 0, 32)]})
+    assert len(catalog.icons) == 1
+    assert next(iter(catalog.icons.values()))["occurrences"] == 2
+
+
+def test_renamed_copies_of_an_icon_share_one_asset():
+    arrow, copy = icon(0, 0, 24), icon(100, 0, 24)
+    arrow["name"], copy["name"] = "Arrow", "Arrow copy"
+    copy["children"][0]["name"] = "Vector copy"
+    assert icon_hash(arrow) == icon_hash(copy)
+    catalog = AssetCatalog()
+    catalog.add_frame("Home", {"id": "0", "type": "FRAME", "children": [arrow, copy]})
+    assert len(catalog.icons) == 1
+    assert next(iter(catalog.icons.values()))["occurrences"] == 2
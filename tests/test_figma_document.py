@@ -0,0 +1,75 @@
+import json
+import os
+
+import pytest
+
+from benchmarks.stub_servers import StubServer
+from benchmarks.synthetic_figma import generate_document
+from core.figma_analyzer import analyze_document, analyze_figma_json
+from core import figma_fetcher
+from core.figma_document import FigmaDocument, cache_path_for
+from core.frame_manifest import frame_hash
+
+
+@pytest.fixture
+def figma_json(tmp_path):
+    path = tmp_path / "figma.json"
+    path.write_text(json.dumps(generate_document(5, "deep")), encoding="utf-8")
+    return str(path)
+
+
+def frames(document):
+    return [node for _, node in document.iter_frames()]
+
+
+def test_cache_round_trip(figma_json):
+    parsed = FigmaDocument.load(figma_json, use_cache=True)
+    assert os.path.exists(cache_path_for(figma_json))
+    cached = FigmaDocument.load_cache(cache_path_for(figma_json), figma_json)
+    assert cached is not None
+    assert [node.to_dict() for node in frames(cached)] == [node.to_dict() for node in frames(parsed)]
+    assert set(cached.nodes) == set(parsed.nodes)
+
+
+def test_stale_cache_is_ignored(figma_json):
+    FigmaDocument.load(figma_json, use_cache=True)
+    with open(figma_json, "a", encoding="utf-8") as f:
+        f.write(" ")
+    assert FigmaDocument.load_cache(cache_path_for(figma_json), figma_json) is None
+
+
+def test_hashes_match_the_plain_json(figma_json):
+    with open(figma_json, encoding="utf-8") as f:
+        raw = json.load(f)
+    raw_frames = [node for page in raw["document"]["children"] for node in page["children"]]
+    FigmaDocument.load(figma_json, use_cache=True)
+    cached = FigmaDocument.load_cache(cache_path_for(figma_json), figma_json)
+    assert [frame_hash(node) for node in frames(cached)] == [frame_hash(node) for node in raw_frames]
+
+
+def test_summary_matches_the_plain_json(figma_json):
+    with open(figma_json, encoding="utf-8") as f:
+        raw = json.load(f)
+    FigmaDocument.load(figma_json, use_cache=True)
+    cached = FigmaDocument.load_cache(cache_path_for(figma_json), figma_json)
+    summary = analyze_document(cached)
+    assert summary == analyze_figma_json(raw)
+    assert [screen["hash"] for page in summary["pages"].values() for screen in page["screens"]] == [
+        frame_hash(node) for node in frames(cached)
+    ]
+
+
+def test_refetching_the_same_version_keeps_the_cache(tmp_path, monkeypatch, capsys):
+    output = str(tmp_path / "figma_design.json")
+    with StubServer({"KEY": generate_document(3, "shallow")}) as server:
+        monkeypatch.setenv("FIGMA_ACCESS_TOKEN", "stub")
+        monkeypatch.setattr(figma_fetcher, "FIGMA_API_BASE", server.url)
+        monkeypatch.setattr(figma_fetcher, "FIGMA_CACHE_DIR", str(tmp_path / "figma_cache"))
+        figma_fetcher.download_figma_file("KEY", output)
+        FigmaDocument.load(output, use_cache=True)
+        # The version cache is copied over the JSON again, with a new mtime
+        os.utime(output, (1_000_000, 1_000_000))
+        figma_fetcher.download_figma_file("KEY", output)
+    capsys.readouterr()
+    FigmaDocument.load(output, use_cache=True)
+    assert "Loaded parsed Figma document from cache" in capsys.readouterr().out
@@ -0,0 +1,54 @@
+import random
+
+import pytest
+
+from agents.project_assembler_agent import FileBlockParser, extract_file_blocks
+
+REPLY = """Here is the code.
+
+--- file: Models/LoginState.swift
+struct LoginState {
+    var email = ""
+}
+
+--- file: Views/LoginViewController+Layout.swift
+extension LoginViewController {
+    // A comment mentioning --- file in passing
+    func setupUI() {}
+}
+--- file: ViewModels/LoginViewModel+Actions.swift
+extension LoginViewModel {}
+"""
+
+
+def parse_in_chunks(text, sizes):
+    parser = FileBlockParser()
+    blocks, position = [], 0
+    for size in sizes:
+        blocks += parser.feed(text[position:position + size])
+        position += size
+    blocks += parser.feed(text[position:])
+    return blocks + parser.close()
+
+
+def test_extracts_every_block():
+    assert [path for path, _ in extract_file_blocks(REPLY)] == [
+        "Models/LoginState.swift",
+        "Views/LoginViewController+Layout.swift",
+        "ViewModels/LoginViewModel+Actions.swift",
+    ]
+
+
+@pytest.mark.parametrize("seed", range(50))
+def test_streamed_parser_matches_extract_file_blocks(seed):
+    rng = random.Random(seed)
+    sizes = [rng.randint(1, 12) for _ in range(len(REPLY))]
+    assert parse_in_chunks(REPLY, sizes) == extract_file_blocks(REPLY)
+
+
+def test_one_character_at_a_time():
+    assert parse_in_chunks(REPLY, [1] * len(REPLY)) == extract_file_blocks(REPLY)
+
+
+def test_reply_without_blocks():
+    assert parse_in_chunks("No files here.", [3, 3, 3]) == extract_file_blocks("No files here.") == []
@@ -0,0 +1,57 @@
+import os
+import time
+
+from core.llm_cache import LLMCache
+
+
+def test_hit_after_put(tmp_path):
+    cache = LLMCache(str(tmp_path))
+    calls = []
+    compute = lambda: calls.append(1) or "reply"
+    assert cache.cached_completion("openai", "m", 0.2, "prompt", compute) == "reply"
+    assert cache.cached_completion("openai", "m", 0.2, "prompt", compute) == "reply"
+    assert len(calls) == 1
+    assert cache.stats() == {"hits": 1, "misses": 1, "mode": "use"}
+
+
+def test_expired_entry_is_removed(tmp_path, monkeypatch):
+    cache = LLMCache(str(tmp_path), ttl=60)
+    key = cache.make_key("openai", "m", 0.2, "prompt")
+    cache.put(key, "reply")
+    assert cache.get(key) == "reply"
+    now = time.time()
+    monkeypatch.setattr("core.llm_cache.time.time", lambda: now + 61)
+    assert cache.get(key) is None
+    assert not os.path.exists(cache._path(key))
+
+
+def test_evicts_least_recently_used_over_the_size_cap(tmp_path):
+    cache = LLMCache(str(tmp_path), max_bytes=10 ** 6)
+    keys = [cache.make_key("openai", "m", 0.2, f"prompt {i}") for i in range(3)]
+    for age, key in zip((300, 200, 100), keys):
+        cache.put(key, "x" * 1000)
+        past = time.time() - age
+        os.utime(cache._path(key), (past, past))
+    # Reading the oldest entry makes it the most recently used
+    assert cache.get(keys[0])
+    entry_size = os.path.getsize(cache._path(keys[0]))
+    # Room for three entries but not four; slack because the "created" timestamp varies in length
+    cache.max_bytes = entry_size * 3 + entry_size // 2
+    cache.put(cache.make_key("openai", "m", 0.2, "new"), "x" * 1000)
+    assert cache.get(keys[1]) is None
+    assert cache.get(keys[0]) and cache.get(keys[2])
+
+
+def test_rejected_reply_is_not_cached(tmp_path):
+    cache = LLMCache(str(tmp_path))
+    replies = iter(["not json", "{}"])
+    validate = lambda reply: reply.startswith("{")
+    assert cache.cached_completion("openai", "m", 0.2, "prompt", lambda: next(replies), validate) == "not json"
+    assert cache.cached_completion("openai", "m", 0.2, "prompt", lambda: next(replies), validate) == "{}"
+    assert cache.cached_completion("openai", "m", 0.2, "prompt", lambda: "unused", validate) == "{}"
+
+
+def test_bypass_never_writes(tmp_path):
+    cache = LLMCache(str(tmp_path), mode="bypass")
+    cache.cached_completion("openai", "m", 0.2, "prompt", lambda: "reply")
+    assert not any(files for _, _, files in os.walk(tmp_path))
@@ -0,0 +1,35 @@
+import json
+
+import pytest
+
+from benchmarks.synthetic_figma import generate_document
+from core.node_compactor import compact_frame, tree_depth
+from core.rate_limiter import estimate_tokens
+
+
+def frame(profile):
+    return generate_document(1, profile)["document"]["children"][0]["children"][0]
+
+
+@pytest.mark.parametrize("budget", [200, 500, 1000])
+def test_deep_frame_fits_the_budget_as_valid_json(budget):
+    text, stats = compact_frame(frame("deep"), budget)
+    assert estimate_tokens(text) <= budget
+    assert stats["compact_tokens"] == estimate_tokens(text)
+    assert stats["depth_limit"] is not None
+    assert json.loads(text)["frame"]["type"] == "FRAME"
+
+
+def test_frame_within_budget_is_not_truncated():
+    node = frame("shallow")
+    text, stats = compact_frame(node, 10 ** 6)
+    assert stats["depth_limit"] is None
+    assert stats["saved_tokens"] > 0
+    assert tree_depth(json.loads(text)["frame"]) == tree_depth(node)
+
+
+def test_larger_budget_keeps_more_depth():
+    node = frame("deep")
+    small = compact_frame(node, 300)[1]["depth_limit"]
+    large = compact_frame(node, 3000)[1]["depth_limit"]
+    assert large is None or large >= small
@@ -0,0 +1,43 @@
+import os
+
+import pytest
+
+from core.output_writer import OutputConflictError, OutputWriter
+
+ORDER = ["Login", "Home", "Settings"]
+
+
+def read(tmp_path, rel_path):
+    return (tmp_path / rel_path).read_text(encoding="utf-8")
+
+
+@pytest.mark.parametrize("arrival", [["Login", "Home", "Settings"], ["Settings", "Home", "Login"], ["Home", "Settings", "Login"]])
+@pytest.mark.parametrize("policy, winner", [("first", "Login"), ("last", "Settings")])
+def test_duplicate_winner_does_not_depend_on_arrival_order(tmp_path, policy, winner, arrival):
+    writer = OutputWriter(str(tmp_path), ORDER, policy)
+    for owner in arrival:
+        writer.write("Utils/Theme.swift", f"// {owner}", owner)
+    assert read(tmp_path, "Utils/Theme.swift") == f"// {winner}"
+    assert writer.stats()["conflicts"] == 1
+
+
+def test_error_policy_raises(tmp_path):
+    writer = OutputWriter(str(tmp_path), ORDER, "error")
+    writer.write("Utils/Theme.swift", "// Login", "Login")
+    with pytest.raises(OutputConflictError):
+        writer.write("Utils/Theme.swift", "// Home", "Home")
+
+
+def test_identical_duplicates_are_not_conflicts(tmp_path):
+    writer = OutputWriter(str(tmp_path), ORDER, "error")
+    assert writer.write("App/AppDelegate.swift", "same", "Login") == "written"
+    assert writer.write("App/AppDelegate.swift", "same", "Home") == "skipped"
+    assert writer.stats() == {"written": 1, "skipped": 0, "conflicts": 0}
+
+
+def test_unchanged_file_keeps_its_mtime(tmp_path):
+    OutputWriter(str(tmp_path)).write("Models/State.swift", "struct State {}", "Login")
+    path = tmp_path / "Models/State.swift"
+    os.utime(path, (1_000_000, 1_000_000))
+    assert OutputWriter(str(tmp_path)).write("Models/State.swift", "struct State {}", "Login") == "skipped"
+    assert path.stat().st_mtime == 1_000_000
@@ -0,0 +1,113 @@
+import threading
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from core.provider_router import LatencyStats, ProviderRouter, check_cancelled
+from core.retry import RetryableHTTPError
+from core.telemetry import get_tracer
+
+# Retry-After: 0 keeps the router's retry rounds from sleeping
+RATE_LIMITED = SimpleNamespace(headers={"retry-after": "0"}, status_code=429)
+
+
+def router(providers, **options):
+    return ProviderRouter(providers, stats=LatencyStats(), **options)
+
+
+def test_fails_over_to_the_next_provider():
+    calls = []
+
+    def broken(prompt):
+        calls.append("a")
+        raise ValueError("bad request")
+
+    r = router({"a": broken, "b": lambda prompt: calls.append("b") or "from b"})
+    assert r.complete("prompt") == "from b"
+    assert calls == ["a", "b"]
+    assert r.cooling_down("a") and not r.cooling_down("b")
+
+
+def test_failed_provider_is_skipped_while_cooling_down():
+    r = router({"a": lambda prompt: "a", "b": lambda prompt: "b"}, failure_cooldown=60)
+    r._record_outcome("a", failed=True)
+    assert r.candidates("prompt") == ["b"]
+    r._record_outcome("b", failed=True)
+    # With every provider cooling down, all of them are tried again
+    assert r.candidates("prompt") == ["a", "b"]
+
+
+def test_non_retryable_error_is_not_retried():
+    attempts = []
+
+    def broken(prompt):
+        attempts.append(1)
+        raise ValueError("bad request")
+
+    with pytest.raises(RuntimeError):
+        router({"a": broken}, retry_limit=3).complete("prompt")
+    assert len(attempts) == 1
+
+
+def test_retryable_errors_repeat_the_round():
+    attempts = []
+
+    def flaky(prompt):
+        attempts.append(1)
+        if len(attempts) < 3:
+            raise RetryableHTTPError("rate limited", RATE_LIMITED)
+        return "done"
+
+    assert router({"a": flaky}, retry_limit=3, failure_cooldown=0).complete("prompt") == "done"
+    assert len(attempts) == 3
+
+
+@pytest.mark.parametrize("providers", [["a"], ["a", "b"]])
+def test_retry_round_is_recorded_on_the_next_call(providers):
+    tracer = get_tracer()
+    before = len(tracer.llm_calls)
+    attempts = []
+
+    def flaky(prompt):
+        with tracer.llm_call("a", "model"):
+            attempts.append(1)
+            if len(attempts) == 1:
+                raise RetryableHTTPError("rate limited", RATE_LIMITED)
+            return "done"
+
+    def rate_limited(prompt):
+        with tracer.llm_call("b", "model"):
+            raise RetryableHTTPError("rate limited", RATE_LIMITED)
+
+    calls = {"a": flaky, "b": rate_limited}
+    r = router({name: calls[name] for name in providers}, retry_limit=3, failure_cooldown=0)
+    assert r.complete("prompt") == "done"
+    retries = [(call["provider"], call["retries"]) for call in tracer.llm_calls[before:]]
+    assert sum(count for _, count in retries) == 1
+    assert retries[-1] == ("a", 1)
+
+
+def test_unusable_reply_falls_back_to_the_next_provider():
+    r = router({"a": lambda prompt: "", "b": lambda prompt: "usable"})
+    assert r.complete("prompt") == "usable"
+
+
+def test_hedge_answers_from_the_faster_provider_and_cancels_the_slow_one():
+    stopped = threading.Event()
+
+    def slow(prompt):
+        for _ in range(200):
+            time.sleep(0.01)
+            try:
+                check_cancelled()
+            except Exception:
+                stopped.set()
+                raise
+        return "slow"
+
+    r = router({"slow": slow, "fast": lambda prompt: "fast"}, hedge=True, hedge_delay=0.05)
+    started = time.monotonic()
+    assert r.complete("prompt") == "fast"
+    assert time.monotonic() - started < 1.5
+    assert stopped.wait(2)
@@ -0,0 +1,53 @@
+from agents.code_generator_agent import estimate_screen_tokens, pack_output_complete, pack_screens, split_pack
+from core.project_templates import screen_files
+
+NAMES = [f"Screen {i}" for i in range(1, 8)]
+
+
+def test_small_screens_are_packed_in_order():
+    packs = pack_screens(NAMES, {name: 5 for name in NAMES}, budget=10 ** 6, max_screens=3)
+    assert packs == [NAMES[:3], NAMES[3:6], NAMES[6:]]
+
+
+def test_packs_stay_within_the_budget():
+    sizes = {name: 20 * (i + 1) for i, name in enumerate(NAMES)}
+    budget = 3 * estimate_screen_tokens(60)
+    packs = pack_screens(NAMES, sizes, budget=budget, max_screens=10)
+    assert [name for pack in packs for name in pack] == NAMES
+    for pack in packs:
+        assert len(pack) == 1 or sum(estimate_screen_tokens(sizes[name]) for name in pack) <= budget
+
+
+def test_zero_budget_sends_one_screen_per_request():
+    assert pack_screens(NAMES[:3], budget=0) == [[name] for name in NAMES[:3]]
+
+
+def reply_for(names, skip=()):
+    blocks = []
+    for name in names:
+        type_name = name.replace(" ", "")
+        for path in screen_files(name):
+            if path not in skip:
+                blocks.append(f"--- file: {path}\n// {type_name}\n")
+    return "".join(blocks)
+
+
+def test_pack_reply_is_split_per_screen():
+    names = ["Login", "Home Feed"]
+    content = reply_for(names) + "--- file: Models/HomeFeedItem.swift\nstruct HomeFeedItem {}\n"
+    blocks = split_pack(names, content)
+    assert [path for path, _ in blocks["Login"]] == list(screen_files("Login"))
+    assert "Models/HomeFeedItem.swift" in [path for path, _ in blocks["Home Feed"]]
+    assert all(pack_output_complete(name, blocks[name]) for name in names)
+
+
+def test_screen_with_a_missing_file_is_incomplete():
+    missing = next(iter(screen_files("Home Feed")))
+    blocks = split_pack(["Login", "Home Feed"], reply_for(["Login", "Home Feed"], skip={missing}))
+    assert pack_output_complete("Login", blocks["Login"])
+    assert not pack_output_complete("Home Feed", blocks["Home Feed"])
+
+
+def test_file_not_declaring_the_screen_type_is_incomplete():
+    content = "".join(f"--- file: {path}\n// something else\n" for path in screen_files("Login"))
+    assert not pack_output_complete("Login", split_pack(["Login"], content)["Login"])